@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from dataclasses import dataclass, field
+
+from selenium.webdriver.common.by import By
+
+from benchmarks.replay import ReplayServer
+from tools.ad_buffer import AdBuffer
+from tools.driver_pool import build_chrome_driver
+from tools.fb_scrape_bot import FacebookAdsCrawler, PAGE_ADS
+from tools.proc_utils import driver_rss
+
+# strategy -> crawler engine
+STRATEGIES = {
+    "dom": "dom",                  # scrape_current_page_ads: one batched script per page
+    "dom-element": "dom",          # process_ad_element per card (one round trip per ad)
+    "network": "network",          # parse the page's JSON/GraphQL payloads
+}
+
+
+@dataclass
+class StrategyResult:
+    strategy: str
+    page_seconds: list[float] = field(default_factory=list)
+    ads: int = 0
+    states: dict = field(default_factory=dict)
+    rss_bytes: list[int] = field(default_factory=list)
+    filters_seconds: float | None = None
+    filters_rows: int = 0
+
+
+def _extract(crawler: FacebookAdsCrawler, strategy: str) -> None:
+    if strategy == "dom-element":
+        css_selector = "." + crawler.ad_card_class.replace(" ", ".")
+        elements = crawler.driver.find_elements(By.CSS_SELECTOR, css_selector)
+        crawler._add_records(crawler.process_ad_element(el) for el in elements)
+    else:
+        crawler.scrape_current_page_ads()
+
+
+def run_strategy(server: ReplayServer, strategy: str, runs: int, block_profile: str) -> StrategyResult:
+    """Load every recorded advertiser query `runs` times and time load + extraction."""
+    fixture = server.fixture
+    result = StrategyResult(strategy)
+    crawler = FacebookAdsCrawler(fixture.keyword, chat_id=None)
+    crawler.ads_library_url = server.ads_library_url
+    crawler.engine = STRATEGIES[strategy]
+    crawler.paginate = False
+    crawler.driver = build_chrome_driver(block_profile=block_profile,
+                                         performance_log=crawler.engine == "network")
+    try:
+        # The keyword page is recorded with the advertiser filter open
+        crawler.fetch_ads_page()
+        started = time.perf_counter()
+        result.filters_rows = len(crawler.scrape_advertiser_list_from_filters(max_seconds=5, quiet_ms=300))
+        result.filters_seconds = time.perf_counter() - started
+
+        for _ in range(runs):
+            for page in fixture.advertisers:
+                crawler.ads_data, crawler._seen_library_ids = AdBuffer(), set()
+                started = time.perf_counter()
+                state = crawler.fetch_ads_page_by_id(page)
+                if state == PAGE_ADS:
+                    _extract(crawler, strategy)
+                result.page_seconds.append(time.perf_counter() - started)
+                result.ads += len(crawler.ads_data)
+                result.states[state] = result.states.get(state, 0) + 1
+            result.rss_bytes.append(driver_rss(crawler.driver))
+    finally:
+        crawler.driver.quit()
+        crawler.driver = None
+    return result
+
+
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def print_report(results: list[StrategyResult]) -> None:
+    print(f"{'strategy':<12} {'pages':>5} {'ads':>5} {'ads/s':>7} {'p50 s':>6} {'p95 s':>6} "
+          f"{'empty':>5} {'error':>5} {'chrome RSS MB':>13} {'filters s':>9} {'advertisers':>11}")
+    for r in results:
+        busy = sum(r.page_seconds)
+        rss = statistics.median(r.rss_bytes) / 1e6 if r.rss_bytes else float("nan")
+        filters = r.filters_seconds if r.filters_seconds is not None else float("nan")
+        print(f"{r.strategy:<12} {len(r.page_seconds):>5} {r.ads:>5} {r.ads / busy if busy else 0:>7.1f} "
+              f"{_percentile(r.page_seconds, 50):>6.2f} {_percentile(r.page_seconds, 95):>6.2f} "
+              f"{r.states.get('empty', 0):>5} {r.states.get('error', 0):>5} {rss:>13.1f} "
+              f"{filters:>9.2f} {r.filters_rows:>11}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ad extraction strategies against a recorded fixture")
+    parser.add_argument("fixture", help="Directory written by `python -m benchmarks.replay record`")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="Comma-separated strategies")
+    parser.add_argument("--profile", default="strict", help="Block profile for the benchmark browser")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay the replay server adds per response")
+    args = parser.parse_args()
+
+    results = []
+    with ReplayServer(args.fixture, latency_ms=args.latency_ms) as server:
+        for strategy in [s.strip() for s in args.strategies.split(",") if s.strip()]:
+            if strategy not in STRATEGIES:
+                parser.error(f"unknown strategy {strategy!r} (choose from {', '.join(STRATEGIES)})")
+            results.append(run_strategy(server, strategy, args.runs, args.profile))
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
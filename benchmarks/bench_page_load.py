@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from dataclasses import dataclass, field
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from tools.driver_pool import build_chrome_driver
+from tools.fb_scrape_bot import FacebookAdsCrawler
+from tools.proc_utils import driver_rss
+
+SEARCH_URL = ("https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&"
+              "is_targeted_country=false&media_type=all&q={q}&search_type=keyword_unordered")
+
+_TRANSFER_JS = """
+return performance.getEntriesByType('navigation')
+    .concat(performance.getEntriesByType('resource'))
+    .reduce((s, e) => s + (e.transferSize || 0), 0);
+"""
+
+
+@dataclass
+class ProfileResult:
+    profile: str
+    strategy: str
+    load_seconds: list[float] = field(default_factory=list)
+    transfer_bytes: list[int] = field(default_factory=list)
+    rss_bytes: list[int] = field(default_factory=list)
+    failures: int = 0
+
+
+def run_profile(url: str, profile: str, strategy: str, runs: int, timeout: int) -> ProfileResult:
+    """Load `url` `runs` times in a fresh driver and time until the first ad card exists."""
+    result = ProfileResult(profile, strategy)
+    css_selector = "." + FacebookAdsCrawler.AD_CARD_CLASS.replace(" ", ".")
+    driver = build_chrome_driver(block_profile=profile, page_load_strategy=strategy)
+    try:
+        for _ in range(runs):
+            driver.delete_all_cookies()
+            started = time.perf_counter()
+            try:
+                driver.get(url)
+                WebDriverWait(driver, timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
+            except Exception:
+                result.failures += 1
+                continue
+            result.load_seconds.append(time.perf_counter() - started)
+            result.transfer_bytes.append(int(driver.execute_script(_TRANSFER_JS) or 0))
+            result.rss_bytes.append(driver_rss(driver))
+            driver.get("about:blank")
+    finally:
+        driver.quit()
+    return result
+
+
+def _median(values):
+    return statistics.median(values) if values else float("nan")
+
+
+def print_report(results: list[ProfileResult]) -> None:
+    print(f"{'profile':<8} {'strategy':<8} {'runs':>4} {'fail':>4} "
+          f"{'load p50 s':>10} {'transfer MB':>11} {'chrome RSS MB':>13}")
+    for r in results:
+        print(f"{r.profile:<8} {r.strategy:<8} {len(r.load_seconds):>4} {r.failures:>4} "
+              f"{_median(r.load_seconds):>10.2f} {_median(r.transfer_bytes) / 1e6:>11.2f} "
+              f"{_median(r.rss_bytes) / 1e6:>13.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare crawler page loads with and without request blocking")
+    parser.add_argument("--query", default="shopee.ph")
+    parser.add_argument("--url", default=None, help="Override the page URL (e.g. a local replay server)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=int, default=20)
+    parser.add_argument("--profiles", default="none,strict", help="Comma-separated block profiles to compare")
+    parser.add_argument("--strategies", default="normal,eager", help="Comma-separated page load strategies")
+    args = parser.parse_args()
+
+    url = args.url or SEARCH_URL.format(q=args.query)
+    results = []
+    for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        for strategy in [s.strip() for s in args.strategies.split(",") if s.strip()]:
+            results.append(run_profile(url, profile, strategy, args.runs, args.timeout))
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
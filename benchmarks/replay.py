@@ -0,0 +1,266 @@
+"""
+Record Ads Library pages once, then serve them to headless Chrome offline.
+
+Recording (needs Facebook) snapshots, per search query, the rendered DOM with
+page scripts stripped plus the JSON/GraphQL payloads the page loaded:
+
+    python -m benchmarks.replay record --keyword shopee.ph --out benchmarks/fixtures/shopee --advertisers 10
+
+Replaying serves a fixture on localhost; point FacebookAdsCrawler.ads_library_url
+(or bench_page_load --url) at it:
+
+    python -m benchmarks.replay serve benchmarks/fixtures/shopee --port 8765
+
+For the browser-free HTTP path, FixtureAdapter is a requests transport that
+answers from a fixture without any socket:
+
+    AdsLibraryHttpClient().session.mount("https://", FixtureAdapter("benchmarks/fixtures/shopee"))
+
+Fixture layout: manifest.json ({"keyword", "advertisers", "pages": {query:
+{"html", "responses"}}}), pages/<n>.html and responses/<n>_<i>.json. The
+keyword page is snapshotted with the advertiser filter open, so
+scrape_advertiser_list_from_filters works against it too. Queries missing
+from the manifest get an Ads Library style "no results" page.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+_PAGE_SCRIPT_RE = re.compile(r'<script\b(?![^>]*application/json)[^>]*>.*?</script>', re.S | re.I)
+_EMPTY_PAGE = "<html><body><div>No ads match your search criteria.</div></body></html>"
+
+
+def _query_key(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+def strip_page_scripts(html: str) -> str:
+    """Drop executable scripts (keeps embedded JSON) so the snapshot stays static offline."""
+    return _PAGE_SCRIPT_RE.sub("", html or "")
+
+
+class Fixture:
+    def __init__(self, root: str):
+        self.root = root
+        with open(os.path.join(root, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.pages = {_query_key(q): entry for q, entry in self.manifest.get("pages", {}).items()}
+
+    @property
+    def keyword(self) -> str:
+        return self.manifest["keyword"]
+
+    @property
+    def advertisers(self) -> list[str]:
+        return self.manifest.get("advertisers", [])
+
+    def read(self, relpath: str) -> bytes:
+        path = os.path.normpath(os.path.join(self.root, relpath))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise FileNotFoundError(relpath)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def search_page(self, q: str) -> str:
+        """Recorded page for a search query, or a no-results page."""
+        entry = self.pages.get(_query_key(q))
+        if entry is None:
+            return _EMPTY_PAGE
+        return self.read(entry["html"]).decode("utf-8")
+
+
+class FixtureAdapter(BaseAdapter):
+    """requests transport serving Ads Library search pages from a fixture (offline test double)."""
+
+    def __init__(self, fixture_dir: str):
+        super().__init__()
+        self.fixture = Fixture(fixture_dir)
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        if url.path.startswith("/ads/library"):
+            response.status_code = 200
+            response.headers["Content-Type"] = "text/html; charset=utf-8"
+            response._content = self.fixture.search_page(parse_qs(url.query).get("q", [""])[0]).encode("utf-8")
+        else:
+            response.status_code = 404
+            response._content = b""
+        return response
+
+    def close(self):
+        pass
+
+
+def _make_handler(fixture: Fixture, latency: float):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            if latency:
+                time.sleep(latency)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            try:
+                if url.path.startswith("/ads/library"):
+                    entry = fixture.pages.get(_query_key(params.get("q", [""])[0]))
+                    html = fixture.search_page(params.get("q", [""])[0])
+                    if entry is None:
+                        self._send(200, html.encode(), "text/html; charset=utf-8")
+                        return
+                    # Replay the recorded payloads as real requests so the network
+                    # engine sees them in the performance log
+                    urls = [f"/api/graphql/?r={r}" for r in entry.get("responses", [])]
+                    if urls:
+                        html += f"<script>{json.dumps(urls)}.forEach(u=>fetch(u));</script>"
+                    self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+                elif url.path.startswith("/api/graphql"):
+                    self._send(200, fixture.read(params.get("r", [""])[0]), "application/json")
+                else:
+                    self._send(404, b"", "text/plain")
+            except FileNotFoundError:
+                self._send(404, b"", "text/plain")
+
+    return ReplayHandler
+
+
+class ReplayServer:
+    """Serves a recorded fixture on 127.0.0.1 from a background thread."""
+
+    def __init__(self, fixture_dir: str, port: int = 0, latency_ms: int = 0):
+        self.fixture = Fixture(fixture_dir)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self.fixture, latency_ms / 1000))
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ads_library_url(self) -> str:
+        return self.url + "/ads/library/"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def record(keyword: str, out: str, advertisers: int, timeout: int) -> None:
+    """Crawl `keyword` live and write a replayable fixture to `out`."""
+    from tools.driver_pool import build_chrome_driver
+    from tools.fb_scrape_bot import FacebookAdsCrawler, PAGE_ADS
+    from tools.network_capture import PayloadCapture
+
+    os.makedirs(os.path.join(out, "pages"), exist_ok=True)
+    os.makedirs(os.path.join(out, "responses"), exist_ok=True)
+    manifest = {"keyword": keyword, "recorded_at": time.time(), "advertisers": [], "pages": {}}
+
+    crawler = FacebookAdsCrawler(keyword, chat_id=None)
+    crawler.driver = build_chrome_driver(block_profile="media", performance_log=True)
+    capture = PayloadCapture(crawler.driver)
+
+    def snapshot(query: str, n: int, state: str) -> None:
+        responses = []
+        for i, body in enumerate(capture.drain_bodies()):
+            rel = f"responses/{n}_{i}.json"
+            with open(os.path.join(out, rel), "w", encoding="utf-8") as f:
+                f.write(body)
+            responses.append(rel)
+        rel = f"pages/{n}.html"
+        with open(os.path.join(out, rel), "w", encoding="utf-8") as f:
+            f.write(strip_page_scripts(crawler.driver.page_source))
+        manifest["pages"][query] = {"html": rel, "responses": responses, "state": state}
+        print(f"recorded {query!r}: {state}, {len(responses)} payload(s)")
+
+    try:
+        capture.reset()
+        crawler.driver.get(crawler._search_url(keyword))
+        state = crawler._wait_for_page_state(timeout)
+        if state != PAGE_ADS:
+            raise SystemExit(f"Keyword page did not load ads ({state})")
+
+        # Snapshot with the advertiser filter open so the filter scrape can be replayed
+        dim = crawler.scrape_advertiser_list_from_filters()
+        snapshot(keyword, 0, state)
+        names = dim["name"].dropna().astype(str).str.split(" ").str[0].str.strip().unique().tolist()
+        manifest["advertisers"] = [n for n in names if "All" not in n][:advertisers]
+
+        for n, page in enumerate(manifest["advertisers"], start=1):
+            capture.reset()
+            crawler.driver.get(crawler._search_url(f"{keyword} {page}"))
+            state = crawler._wait_for_page_state(timeout)
+            time.sleep(0.5)  # let follow-up payloads land
+            snapshot(f"{keyword} {page}", n, state)
+    finally:
+        crawler.driver.quit()
+        crawler.driver = None
+
+    with open(os.path.join(out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record and replay Ads Library pages for offline benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    rec = sub.add_parser("record", help="Snapshot live pages into a fixture directory")
+    rec.add_argument("--keyword", required=True)
+    rec.add_argument("--out", required=True)
+    rec.add_argument("--advertisers", type=int, default=10, help="Advertiser queries to record")
+    rec.add_argument("--timeout", type=int, default=20)
+
+    serve = sub.add_parser("serve", help="Serve a fixture on localhost until interrupted")
+    serve.add_argument("fixture")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency-ms", type=int, default=0, help="Delay added to every response")
+
+    args = parser.parse_args()
+    if args.cmd == "record":
+        record(args.keyword, args.out, args.advertisers, args.timeout)
+        return
+
+    with ReplayServer(args.fixture, args.port, args.latency_ms) as server:
+        print(f"Serving {server.fixture.keyword} at {server.ads_library_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
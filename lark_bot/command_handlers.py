@@ -1,7 +1,14 @@
 from .state_managers import state_manager
 from .lark_api import LarkAPI
 from .file_processor import generate_excel_report, build_media_zip
+from .result_cache import ResultCache, CachedResult, InflightSearches, SearchFollower
+from .config import CRAWL_MAX_RSS_MB, CRAWL_MAX_CPU_SECONDS
 from tools import *
+from tools.crawl_metrics import MetricsLog, summarize
+from tools.driver_pool import DriverPool
+from tools.fb_scrape_bot import CrawlerQueue
+from tools.job_store import JobStore, JOB_FAILED
+from io import BytesIO
 import threading
 import logging
 import re
@@ -22,6 +29,19 @@ from zoneinfo import ZoneInfo
 TIME_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})(?:\s*(?:GMT)?([+\-]\d{1,2}))?\s*$", re.I)
 DOMAIN_RE = re.compile(r"^([a-zA-Z0-9-]{2,}\.)+[a-zA-Z]{2,}$")
 DEFAULT_TZ = ZoneInfo("Asia/Ho_Chi_Minh")  # GMT+7
+# Why an isolated crawl was killed (FacebookAdsCrawler.kill_reason), as told to the user
+KILL_REASONS = {
+    "memory": f"it used more than {CRAWL_MAX_RSS_MB} MB of memory",
+    "cpu": f"it used more than {CRAWL_MAX_CPU_SECONDS}s of CPU time",
+    "timeout": "it ran past its time limit",
+}
+# crawler.outcome of a crawl that failed before it could tell whether there are ads
+CRAWL_FAILURES = {
+    "page_error": "the Ads Library search page could not be loaded",
+    "no_advertisers": "the advertiser list could not be read",
+    "no_driver": "no browser was available",
+    "error": "the crawler hit an unexpected error",
+}
 logger = logging.getLogger(__name__)
 
 def clean_url(url):
@@ -52,6 +72,9 @@ def now_str(tz_offset_hours: int | None = None) -> str:
 class CommandHandler:
     def __init__(self):
         self.lark_api = LarkAPI()
+        self.result_cache = ResultCache()
+        self.inflight = InflightSearches()
+        self.job_store = JobStore()
         self.start_reponse = {
             "help": self.show_help_menu,
             "hi": self.show_help_menu,
@@ -80,6 +103,9 @@ class CommandHandler:
         elif text == "list":
             self.handle_list_crawl(chat_id, message_id)
 
+        elif text == "metrics" or text.startswith("metrics "):  # e.g. metrics 100 / metrics a.com
+            self.handle_metrics(message_id, text[len("metrics"):].strip())
+
         elif text.startswith("add_schedule "):   # e.g. add_schedule 18:00GMT+7
             when = text[len("add_schedule "):].strip()
             self.handle_add_schedule(chat_id, message_id, when)
@@ -93,6 +119,9 @@ class CommandHandler:
             self.handle_remove_domain(chat_id, message_id, domains_str)
 
         
+        elif text.startswith("search! "):  # bypass the result cache
+            domain = text[8:].strip()
+            self.handle_search_term(user_id, domain, force=True)
         elif text.startswith("search "):
             domain = text[7:].strip()  # More efficient slicing
             self.handle_search_term(user_id, domain)
@@ -464,7 +493,57 @@ class CommandHandler:
         }
         self.lark_api.reply_to_message(message_id=message_id, card=card, reply_in_thread=True)
 
-    def handle_search_term(self, user_id, search_term):
+    def handle_metrics(self, message_id, arg: str):
+        """Summarize recent crawl telemetry: last N crawls, or the last 50 of one domain."""
+        limit, domain = 50, None
+        if arg.isdigit():
+            limit = max(1, min(int(arg), 1000))
+        elif arg:
+            domain = clean_url(arg)
+
+        summary = summarize(MetricsLog().recent(limit, keyword=domain))
+        scope = f" for {domain}" if domain else ""
+        if not summary["crawls"]:
+            self.lark_api.reply_to_message(message_id, f"No crawl metrics recorded{scope} yet.\n\n"
+                                                       f"{self._format_live_stats()}")
+            return
+
+        outcomes = ", ".join(f"{k} {v}" for k, v in summary["outcomes"].items())
+        phases = " · ".join(f"{k} {v}s" for k, v in summary["phase_mean_seconds"].items())
+        self.lark_api.reply_to_message(message_id, (
+            f"📊 Crawl metrics (last {summary['crawls']} crawls{scope})\n"
+            f"Outcomes: {outcomes}\n"
+            f"Duration p50 / p95: {summary['p50_seconds']}s / {summary['p95_seconds']}s\n"
+            f"Mean per phase: {phases}\n"
+            f"Pages: {summary['pages']} ({summary['empty_pages']} empty, {summary['timeouts']} timeouts)\n"
+            f"Ads: {summary['ads']} · Downloaded: {summary['mb_downloaded']} MB · "
+            f"Peak Chrome RSS: {summary['peak_rss_mb']} MB\n\n"
+            f"{self._format_live_stats()}"
+        ))
+
+    def _format_live_stats(self):
+        """Current queue, per-worker and browser pool accounting for /metrics."""
+        queue = CrawlerQueue().get_stats()
+        pool = DriverPool().stats()
+        waiting = ", ".join(f"{name} {n}" for name, n in queue["waiting_by_class"].items())
+        lines = [
+            f"⚙️ Queue: {queue['running']}/{queue['workers']} workers busy "
+            f"({queue['interactive_workers']} reserved for /search), "
+            f"{queue['waiting']} waiting ({waiting}), avg crawl {queue['avg_duration']}s",
+            f"Browser pool: {pool['size']} slots, {pool['idle']} idle, {pool['leased']} leased",
+        ]
+        for worker_id, stats in queue["per_worker"].items():
+            state = f"on {stats['keyword']}" if stats["keyword"] else "idle"
+            first_load = (f" · first load {stats['first_load_s']}s ({stats['profile']})"
+                          if stats["first_load_s"] is not None else "")
+            lines.append(
+                f"Worker {worker_id}: {state} · {stats['jobs']} jobs, {stats['failed']} failed · "
+                f"busy {round(stats['busy_seconds'])}s, CPU {round(stats['cpu_seconds'])}s · "
+                f"Chrome {stats['browser_rss_mb']} MB{first_load}"
+            )
+        return "\n".join(lines)
+
+    def handle_search_term(self, user_id, search_term, force=False):
         message_info = state_manager.get_message_info(user_id)
         message_id = message_info["message_id"]
         chat_id = state_manager.get_chat_id(user_id)
@@ -498,24 +577,162 @@ class CommandHandler:
             reply_in_thread=True
         )
         
+        # Recorded durably so a restart replays the search instead of dropping it
+        job_id = None
+        try:
+            job_id = self.job_store.enqueue(user_id, chat_id, message_id, reply_message_id, search_term, force)
+        except Exception as e:
+            logger.warning("Could not record search job term=%s: %s", search_term, e)
+
         # Start background thread
         threading.Thread(
             target=self.process_search_async,
-            args=(user_id, search_term, reply_message_id),
+            args=(user_id, search_term, reply_message_id, force, job_id),
+            daemon=True
+        ).start()
+
+    def resume_job(self, job):
+        """Replay a search job left behind by a restarted process, on its original card."""
+        user_id, chat_id, search_term = job["user_id"], job["chat_id"], job["keyword"]
+        if job["state"] == JOB_FAILED:
+            logger.warning("Dropping search job id=%s term=%s: %s", job["id"], search_term, job["error"])
+            self.lark_api.reply_to_message(job["message_id"],
+                                           f"❌ Search for {search_term} failed after a restart. Please search again.")
+            return
+        if state_manager.get_state(user_id) == "IN_PROGRESS":
+            self._finish_job(job["id"], "superseded by a newer search")
+            return
+
+        logger.info("Resuming search job id=%s user_id=%s term=%s", job["id"], user_id, search_term)
+        state_manager.set_state(user_id, "IN_PROGRESS", chat_id, job["message_id"], job["message_id"])
+        card = domain_processing_card(search_word=search_term, progress_percent=0)
+        self.lark_api.update_card_message(job["card_id"], card=card)
+        threading.Thread(
+            target=self.process_search_async,
+            args=(user_id, search_term, job["card_id"], bool(job["force"]), job["id"]),
             daemon=True
         ).start()
+
+    def _finish_job(self, job_id, error=None):
+        if job_id is None:
+            return
+        try:
+            self.job_store.finish(job_id, ok=error is None, error=error)
+        except Exception as e:
+            logger.warning("Could not finish search job id=%s: %s", job_id, e)
     
-    def process_search_async(self, user_id, search_term, bot_reply_id):
+    def _send_cached_result(self, message_id, bot_reply_id, search_term, cached, link, show_cached=True):
+        cached_at = datetime.fromtimestamp(cached.cached_at, DEFAULT_TZ).strftime("%H:%M") if show_cached else None
+        card = search_complete_card(
+            search_word=search_term,
+            num_results=cached.df.shape[0],
+            href=link,
+            num_new=cached.num_new,
+            cached_at=cached_at,
+            page_stats=cached.page_stats
+        )
+        self.lark_api.update_card_message(message_id=bot_reply_id, card=card)
+        self.lark_api.send_file(message_id, BytesIO(cached.excel), cached.filename, content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        if cached.media is None:
+            # The leader's zips were too large to keep; download the media again from the rows
+            self._send_media_zips(message_id, cached.df, search_term)
+            return
+        for zip_name, zip_bytes in cached.media:
+            self.lark_api.send_file(
+                message_id=message_id,
+                file_buffer=BytesIO(zip_bytes),
+                filename=zip_name,
+                content_type="application/zip",
+            )
+
+    def _send_media_zips(self, message_id, df, search_term, keep=None, media_kwargs=None):
+        """Build and send the ad_url then thumbnail_url zip packs of `df`, part by part."""
+        base = search_term.replace(".", "-").replace(" ", "_") or "results"
+        for col in ("ad_url", "thumbnail_url"):
+            for zip_name, zip_buf in build_media_zip(
+                df=df,
+                col=col,
+                zip_basename_prefix=base,
+                max_workers=2,
+                max_zip_bytes= 28 * 1024 * 1024,
+                **(media_kwargs(col) if media_kwargs else {}),
+            ):
+                if keep is not None:
+                    keep(zip_name, zip_buf)
+                self.lark_api.send_file(
+                    message_id=message_id,
+                    file_buffer=zip_buf,
+                    filename=zip_name,
+                    content_type="application/zip",
+                )
+
+    def _lead_or_follow(self, user_id, chat_id, message_id, bot_reply_id, search_term, link):
+        """
+        Join the in-flight crawl of `search_term` if there is one.
+
+        Returns the flight this request must lead, or None once the request
+        was answered (or cancelled) as a follower. A follower whose leader
+        ended without a result tries again, usually becoming the leader.
+        """
+        while True:
+            flight, leading = self.inflight.join(search_term)
+            if leading:
+                return flight
+
+            logger.info("Coalescing search user_id=%s term=%s", user_id, search_term)
+            flight.attach(bot_reply_id)
+            state_manager.register_process(user_id, SearchFollower(flight, bot_reply_id), chat_id)
+            while not flight.done.wait(1):
+                if state_manager.should_cancel(user_id):
+                    flight.detach(bot_reply_id)
+                    self.lark_api.reply_to_message(message_id, "Process cancelled successfully!")
+                    return None
+            flight.detach(bot_reply_id)
+
+            if flight.result is not None:
+                self._send_cached_result(message_id, bot_reply_id, search_term, flight.result, link,
+                                         show_cached=False)
+                return None
+            if flight.empty:
+                card = search_no_result_card(search_word=search_term, href=link, page_stats=flight.page_stats)
+                self.lark_api.update_card_message(bot_reply_id, card=card)
+                return None
+
+    def process_search_async(self, user_id, search_term, bot_reply_id, force=False, job_id=None):
         message_info = state_manager.get_message_info(user_id)
         message_id = message_info["message_id"]
         chat_id = state_manager.get_chat_id(user_id)
         
         if not chat_id:
             logger.warning("No chat_id found for user_id=%s", user_id)
+            self._finish_job(job_id, "no chat_id")
             return
         
+        # Scheduled runs always crawl and only ship media not delivered by an earlier run
+        scheduled = str(user_id).startswith("schedule:")
+        encoded_term = urllib.parse.quote(search_term)
+        link = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&is_targeted_country=false&media_type=all&q={encoded_term}&search_type=keyword_unordered"
+
+        flight, result, error = None, None, None
+        crawler, df, file_buffer = None, None, None
         try:
-            crawler = FacebookAdsCrawler(search_term, chat_id, bot_reply_id)
+            # Repeat searches within RESULT_CACHE_TTL reuse the previous result
+            cached = None if (force or scheduled) else self.result_cache.get(search_term)
+            if cached is not None:
+                logger.info("Serving cached result term=%s", search_term)
+                self._send_cached_result(message_id, bot_reply_id, search_term, cached, link)
+                return
+
+            # Concurrent interactive searches of one domain share a single crawl
+            if not scheduled:
+                flight = self._lead_or_follow(user_id, chat_id, message_id, bot_reply_id, search_term, link)
+                if flight is None:
+                    return
+
+            crawler = FacebookAdsCrawler(search_term, chat_id, bot_reply_id, scheduled=scheduled)
+            crawler.job_id = job_id
+            if flight is not None:
+                flight.set_crawler(crawler)
             state_manager.register_process(user_id, crawler, chat_id)
             
             # Check cancellation before starting
@@ -524,70 +741,112 @@ class CommandHandler:
                 return
                     
             file_buffer, filename, df = generate_excel_report(crawler)
-            encoded_term = urllib.parse.quote(search_term)
-            link = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&is_targeted_country=false&media_type=all&q={encoded_term}&search_type=keyword_unordered"
             
             # Handle results if not cancelled
+            stopped = KILL_REASONS.get(crawler.kill_reason)
+            failed = CRAWL_FAILURES.get(crawler.outcome)
             if not state_manager.should_cancel(user_id):
-                if df.empty:
-                    card = search_no_result_card(search_word=search_term, href=link)
+                if crawler.outcome == "duplicate":
+                    # Not queued: start() already pointed the user at the identical waiting request
+                    pass
+                elif df.empty and stopped:
+                    error = f"crawl killed: {crawler.kill_reason}"
+                    self.lark_api.reply_to_message(
+                        message_id,
+                        f"❌ The search for {search_term} was stopped because {stopped}, "
+                        f"before any ads were collected. Please try again later."
+                    )
+                elif df.empty and failed:
+                    error = f"crawl failed: {crawler.outcome}"
+                    self.lark_api.reply_to_message(
+                        message_id,
+                        f"❌ The search for {search_term} failed because {failed}. Please try again later."
+                    )
+                elif df.empty:
+                    card = search_no_result_card(search_word=search_term, href=link,
+                                                 page_stats=crawler.page_stats)
                     self.lark_api.update_card_message(bot_reply_id, card=card)
                 else:
+                    num_new = int((df["ad_status"] == "new").sum()) if "ad_status" in df.columns else None
                     card = search_complete_card(
                         search_word=search_term,
                         num_results=df.shape[0],
-                        href=link
+                        href=link,
+                        num_new=num_new,
+                        page_stats=crawler.page_stats
                     )
                     self.lark_api.update_card_message(message_id=bot_reply_id, card=card)
+                    if stopped:
+                        self.lark_api.reply_to_message(
+                            message_id,
+                            f"⚠️ The search for {search_term} was stopped early because {stopped}. "
+                            f"The report holds the {df.shape[0]} ads collected until then."
+                        )
                     self.lark_api.send_file(message_id, file_buffer, filename, content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
-                    base = search_term.replace(".", "-").replace(" ", "_") or "results"
-
                     # After ensuring crawler.df is not empty
                     crawler.df = crawler.df.reset_index(drop=True)
                     if "No" not in crawler.df.columns:
                         crawler.df.insert(0, "No", range(1, len(crawler.df) + 1))
 
-                    # 1) ad_url packs
-                    for zip_name, zip_buf in build_media_zip(
-                        df=crawler.df,
-                        col="ad_url",
-                        zip_basename_prefix=base,
-                        max_workers=2,
-                        max_zip_bytes= 28 * 1024 * 1024,
-                    ):
-                        self.lark_api.send_file(
-                            message_id=message_id,
-                            file_buffer=zip_buf,
-                            filename=zip_name,
-                            content_type="application/zip",
-                        )
-
-                    # 2) thumbnail_url packs
-                    for zip_name, zip_buf in build_media_zip(
-                        df=crawler.df,
-                        col="thumbnail_url",
-                        zip_basename_prefix=base,
-                        max_workers=2,
-                        max_zip_bytes= 28 * 1024 * 1024,
-                    ):
-                        self.lark_api.send_file(
-                            message_id=message_id,
-                            file_buffer=zip_buf,
-                            filename=zip_name,
-                            content_type="application/zip",
-                        )
+                    # Zips are kept for the result cache only while they fit in it;
+                    # large result sets are sent part by part and not cached
+                    media_parts = []
+                    media_budget = self.result_cache.max_bytes
+
+                    def keep_media(zip_name, zip_buf):
+                        nonlocal media_parts, media_budget
+                        if media_parts is None:
+                            return
+                        with zip_buf.getbuffer() as view:
+                            media_budget -= view.nbytes
+                        if media_budget < 0:
+                            media_parts = None
+                        else:
+                            media_parts.append((zip_name, zip_buf.getvalue()))
+
+                    def media_kwargs(col):
+                        if not scheduled:
+                            return {}
+                        return {
+                            "skip_library_ids": crawler.ad_store.media_fetched(search_term, col),
+                            "on_fetched": lambda ids: crawler.ad_store.mark_media(search_term, col, ids),
+                        }
+
+                    self._send_media_zips(message_id, crawler.df, search_term, keep_media, media_kwargs)
+
+                    # Scheduled media packs are incremental and killed crawls partial, so only full
+                    # results are reused. Followers always get the result; media=None makes them
+                    # rebuild the zips from the rows instead of re-crawling.
+                    if not scheduled and not stopped and not state_manager.should_cancel(user_id):
+                        result = CachedResult(crawler.df, filename, file_buffer.getvalue(), media_parts, num_new,
+                                              dict(crawler.page_stats))
+                        if media_parts is not None:
+                            self.result_cache.put(search_term, result)
 
             else:
                 self.lark_api.reply_to_message(message_id, "Process cancelled successfully!")
         except Exception as e:
+            error = str(e) or type(e).__name__
             if not state_manager.should_cancel(user_id):
                 self.lark_api.reply_to_message(message_id, f"Error processing request: {str(e)}")
             else:
                 self.lark_api.reply_to_message(message_id, "Process cancelled due to error!")
         finally:
+            # Cancelled searches are closed too, so a restart does not bring them back
+            if error is None and state_manager.should_cancel(user_id):
+                error = "cancelled"
+            self._finish_job(job_id, error)
+            # Hand the result (or the lack of one) to coalesced requests
+            if flight is not None:
+                # Only a crawl that finished and found nothing is "empty"; failures let followers retry
+                empty = (result is None and df is not None and df.empty and crawler.kill_reason is None
+                         and crawler.outcome not in CRAWL_FAILURES and crawler.outcome != "duplicate"
+                         and not state_manager.should_cancel(user_id))
+                self.inflight.finish(flight, result, empty,
+                                     crawler.page_stats if crawler is not None else None)
             # Cleanup resources
-            if 'file_buffer' in locals() and file_buffer:
+            if file_buffer:
                 try:
                     file_buffer.close()
                 except:
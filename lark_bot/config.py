@@ -9,3 +9,102 @@ APP_SECRET = os.getenv("LARK_APP_SECRET")
 VERIFICATION_TOKEN = os.getenv("VERIFICATION_TOKEN")
 DATE_NOW = datetime.now().strftime("%d %b %Y")
 # THREAD_ID = os.getenv("THREAD_ID")
+
+# Crawler browser pool
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "1"))
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", "20"))       # recycle after N crawls
+DRIVER_MAX_AGE = int(os.getenv("DRIVER_MAX_AGE", "3600"))       # seconds
+DRIVER_POOL_PREWARM = os.getenv("DRIVER_POOL_PREWARM", "1") == "1"
+
+# Crawl queue
+CRAWLER_WORKERS = int(os.getenv("CRAWLER_WORKERS", str(DRIVER_POOL_SIZE)))
+CRAWL_ETA_DEFAULT = int(os.getenv("CRAWL_ETA_DEFAULT", "180"))  # seconds, until real durations are known
+# Waiting crawls run interactive > scheduled > background, fair-shared across
+# chats by weight ("chat_id:weight,..."); the first N workers only take
+# interactive jobs (kept below CRAWLER_WORKERS)
+QUEUE_CHAT_WEIGHTS = os.getenv("QUEUE_CHAT_WEIGHTS", "")
+QUEUE_INTERACTIVE_WORKERS = int(os.getenv("QUEUE_INTERACTIVE_WORKERS", "0"))
+QUEUE_NOTIFY_INTERVAL = float(os.getenv("QUEUE_NOTIFY_INTERVAL", "0.5"))  # seconds; queue card updates within it are batched
+
+# Extraction engine: "dom" scrapes rendered ad cards, "network" reads the
+# Ads Library JSON/GraphQL responses from Chrome's performance log
+CRAWLER_ENGINE = os.getenv("CRAWLER_ENGINE", "dom").lower()
+
+# Scroll pagination of the result feed (one page load -> full result set)
+PAGINATE_SCROLL = os.getenv("PAGINATE_SCROLL", "0") == "1"
+PAGINATE_MAX_ADS = int(os.getenv("PAGINATE_MAX_ADS", "300"))          # per page load
+PAGINATE_TIME_BUDGET = float(os.getenv("PAGINATE_TIME_BUDGET", "60"))  # seconds per page load
+PAGINATE_IDLE_ROUNDS = int(os.getenv("PAGINATE_IDLE_ROUNDS", "2"))     # scrolls without growth before stopping
+
+# Crawler browser network profile: "none", "media" (images/video/fonts) or
+# "strict" (media + tracking/telemetry). DOM src attributes stay intact.
+BLOCK_PROFILE = os.getenv("BLOCK_PROFILE", "strict").lower()
+PAGE_LOAD_STRATEGY = os.getenv("PAGE_LOAD_STRATEGY", "eager").lower()  # "normal" or "eager"
+
+# Persistent Chrome profile per pool slot (opt-in): keeps Facebook's JS/CSS in
+# the HTTP disk cache across crawls and driver restarts. Empty disables.
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR", "")
+CHROME_DISK_CACHE_MB = int(os.getenv("CHROME_DISK_CACHE_MB", "200"))
+CHROME_PROFILE_MAX_AGE_HOURS = float(os.getenv("CHROME_PROFILE_MAX_AGE_HOURS", "24"))  # reset after, 0 never
+
+# Per-crawl telemetry (one JSON line per crawl, read by /metrics)
+METRICS_PATH = os.getenv("METRICS_PATH", "logs/crawl_metrics.jsonl")
+METRICS_MAX_MB = float(os.getenv("METRICS_MAX_MB", "10"))
+METRICS_BACKUPS = int(os.getenv("METRICS_BACKUPS", "5"))
+
+# Tabs per browser used to pipeline advertiser queries (DOM engine only)
+CRAWLER_TABS = int(os.getenv("CRAWLER_TABS", "1"))
+
+# Advertiser dimension cache (ref_data/dim_keyword_<keyword>.csv)
+DIM_TTL_HOURS = float(os.getenv("DIM_TTL_HOURS", "72"))
+
+# Persistent ad store (first/last seen + media status per library_id)
+AD_STORE_PATH = os.getenv("AD_STORE_PATH", "logs/ad_store.sqlite3")
+# Stored rows are reused instead of re-extracting a card only while younger than
+# this: their fbcdn image/video URLs are signed and expire
+AD_DETAIL_TTL_HOURS = float(os.getenv("AD_DETAIL_TTL_HOURS", "24"))
+
+# Durable search jobs (survive restarts): a process holds a lease on its
+# queued/running jobs and renews it every JOB_LEASE_SECONDS / 3; jobs whose
+# lease expired (or whose process died on this host) are replayed, at most
+# JOB_MAX_ATTEMPTS times. Finished jobs are kept JOB_RETENTION_HOURS
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "logs/jobs.sqlite3")
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "30"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+
+# Finished search results reused for repeat /search of the same domain
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "600"))        # seconds, 0 disables
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "16"))       # entries
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+
+# Crawl rows beyond this many are spilled to a temporary SQLite file
+# (AD_BUFFER_DIR, default system temp) so large ad sets stay out of RAM;
+# kept below CRAWL_MAX_ADS_INTERACTIVE so interactive crawls spill too
+AD_BUFFER_MEMORY_ROWS = int(os.getenv("AD_BUFFER_MEMORY_ROWS", "500"))  # 0 = never spill
+AD_BUFFER_DIR = os.getenv("AD_BUFFER_DIR", "")
+# Rows past this get no embedded thumbnail in the Excel report (link column stays)
+EXCEL_MAX_IMAGES = int(os.getenv("EXCEL_MAX_IMAGES", "1500"))
+
+# Crawl budgets: interactive searches answer fast, scheduled runs go wider
+CRAWL_TIME_BUDGET_INTERACTIVE = float(os.getenv("CRAWL_TIME_BUDGET_INTERACTIVE", "240"))  # seconds, 0 = none
+CRAWL_TIME_BUDGET_SCHEDULED = float(os.getenv("CRAWL_TIME_BUDGET_SCHEDULED", "1200"))
+CRAWL_MAX_ADS_INTERACTIVE = int(os.getenv("CRAWL_MAX_ADS_INTERACTIVE", "2000"))  # 0 = no cap
+# The report DataFrame, Excel workbook and cached result still hold every row, so
+# scheduled runs keep a cap too
+CRAWL_MAX_ADS_SCHEDULED = int(os.getenv("CRAWL_MAX_ADS_SCHEDULED", "10000"))
+CRAWL_PAGE_RETRIES = int(os.getenv("CRAWL_PAGE_RETRIES", "2"))           # per failed advertiser page
+CRAWL_RETRY_BACKOFF = float(os.getenv("CRAWL_RETRY_BACKOFF", "2"))      # seconds, doubled per retry
+
+# Crawl execution: "thread" runs crawls inside this process, "process" runs
+# each crawl in a child process killed (with its Chrome) past these limits
+CRAWLER_ISOLATION = os.getenv("CRAWLER_ISOLATION", "thread").lower()
+CRAWL_MAX_RSS_MB = int(os.getenv("CRAWL_MAX_RSS_MB", "1500"))           # child + Chrome tree
+CRAWL_MAX_CPU_SECONDS = int(os.getenv("CRAWL_MAX_CPU_SECONDS", "900"))  # child + Chrome tree
+CRAWL_WALL_GRACE = int(os.getenv("CRAWL_WALL_GRACE", "180"))            # seconds past the crawl time budget
+
+# Opt-in: try a plain HTTP fetch of the search page before starting a browser;
+# falls back to Selenium unless the page is a no-results page or says
+# has_next_page: false
+HTTP_FAST_PATH = os.getenv("HTTP_FAST_PATH", "0") == "1"
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # seconds
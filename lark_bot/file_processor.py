@@ -17,6 +17,8 @@ import hashlib
 from urllib.parse import urlparse
 import os
 
+from .config import EXCEL_MAX_IMAGES
+
 class ExcelImageExporter:
     """Optimized Excel exporter with parallel image processing."""
 
@@ -25,7 +27,8 @@ class ExcelImageExporter:
                     row_height: int = 80,
                     image_col_width: int = 18,
                     timeout: int = 10,
-                    max_workers: int = 2):
+                    max_workers: int = 2,
+                    max_images: Optional[int] = None):
         """
         Initialize the Excel exporter.
         
@@ -35,12 +38,14 @@ class ExcelImageExporter:
             image_col_width: Width of the image column
             timeout: Request timeout in seconds
             max_workers: Max threads for parallel image downloads
+            max_images: Embed thumbnails for at most this many rows (None = all)
         """
         self.image_size = image_size
         self.row_height = row_height
         self.image_col_width = image_col_width
         self.timeout = timeout
         self.max_workers = max_workers
+        self.max_images = max_images
         self.logger = logging.getLogger(__name__)
 
     def _download_and_process_image(self, url: str) -> Optional[bytes]:
@@ -80,23 +85,15 @@ class ExcelImageExporter:
             cell.font = header_font
             cell.alignment = header_alignment
 
-    def _auto_adjust_column_widths(self, ws, df: pd.DataFrame):
-        """Auto-adjust column widths based on content."""
-        # --- MODIFIED ---
-        # This function now uses the final column order for adjusting width.
-        # We also need to skip the 'Image' column which has a fixed width.
-        for col_idx, column in enumerate(df.columns, 1):
-            if column == 'Image':
+    def _auto_adjust_column_widths(self, ws, columns, max_lengths: dict):
+        """Auto-adjust column widths based on the longest value seen per column."""
+        # This function uses the final column order for adjusting width and
+        # skips the 'Image' column which has a fixed width.
+        for col_idx, column in enumerate(columns, 1):
+            if column == 'Image' or column not in max_lengths:
                 continue
-            
-            # Check if the column exists in the DataFrame before trying to access it
-            if column in df:
-                max_length = max(
-                    len(str(column)),
-                    df[column].astype(str).str.len().max()
-                )
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
+            adjusted_width = min(max_lengths[column] + 2, 50)
+            ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
 
     def export_to_excel(self, 
                         df: pd.DataFrame, 
@@ -111,21 +108,26 @@ class ExcelImageExporter:
         if "No" not in df.columns:
             df.insert(0, "No", range(1, len(df) + 1))
 
-        # --- ADD ---
-        # Define the desired final column order for the Excel file.
-        # This is the key change to control the layout.
-        original_columns = list(df.columns)
-        
-        # We will insert 'Image' before 'primary_text' and 'headline_text'.
-        # Let's build the new column list.
-        final_excel_columns = []
+        return self.export_rows(df.to_dict("records"), list(df.columns), image_column)
+
+    def export_rows(self, rows, columns, image_column: str) -> BytesIO:
+        """
+        Export an iterable of row dicts to Excel with images (in-memory only).
+
+        Rows are written as they arrive and their thumbnails start downloading
+        immediately, so a generator fed by a running crawl overlaps crawling
+        with export. Images are placed once the iterable is exhausted.
+        """
+        columns = list(columns)
+        if image_column not in columns:
+            raise ValueError(f"Image column '{image_column}' not found in columns")
+        if "No" not in columns:
+            columns.insert(0, "No")
+
+        # Define the desired final column order for the Excel file:
+        # 'Image' goes before 'primary_text' and 'headline_text'.
         text_columns_to_move = ['primary_text', 'headline_text']
-        
-        for col in original_columns:
-            if col not in text_columns_to_move:
-                final_excel_columns.append(col)
-        
-        # Now, add the 'Image' column and the text columns at the desired position.
+        final_excel_columns = [col for col in columns if col not in text_columns_to_move]
         final_excel_columns.append('Image')
         final_excel_columns.extend(text_columns_to_move)
 
@@ -133,48 +135,51 @@ class ExcelImageExporter:
         ws = wb.active
         ws.title = "Data with Images"
         
-        # --- MODIFIED ---
-        # Write headers based on our new `final_excel_columns` list.
+        # Write headers based on `final_excel_columns`
         for col_idx, col_name in enumerate(final_excel_columns, 1):
             ws.cell(row=1, column=col_idx, value=col_name)
         
-        # --- REMOVE ---
-        # We no longer need this part because the 'Image' header is already in our list.
-        # image_col_idx = len(df.columns) + 1
-        # ws.cell(row=1, column=image_col_idx, value="Image")
-        
         # Apply header styling based on the final number of columns
         self._setup_header_styling(ws, len(final_excel_columns))
-        
-        # Phase 1: Write data and collect image URLs
-        download_tasks = {}
-        for row_idx, (_, row) in enumerate(df.iterrows(), start=2):
-            # --- MODIFIED ---
-            # Write data cell by cell from the original 'row' object,
-            # but into the correct column positions defined by 'final_excel_columns'.
-            for col_idx, col_name in enumerate(final_excel_columns, 1):
-                if col_name != 'Image' and col_name in row:
-                    ws.cell(row=row_idx, column=col_idx, value=row[col_name])
-            
-            if pd.notna(row[image_column]) and str(row[image_column]).strip():
-                download_tasks[row_idx] = str(row[image_column])
 
-        # Phase 2: Parallel image downloads (This part is unchanged)
+        hyperlink_columns = ["destination_url", "ad_url", "thumbnail_url"]
+        hyperlink_font = Font(color="0563C1", underline="single")
+        # Widths of the manually sized text columns are not auto-adjusted
+        max_lengths = {col: len(str(col)) for col in columns if col not in text_columns_to_move}
+        
+        # Phase 1: Write data as rows arrive and start their image downloads
         image_data = {}
-        if download_tasks:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                future_to_row = {
-                    executor.submit(self._download_and_process_image, url): row_idx
-                    for row_idx, url in download_tasks.items()
-                }
-                
-                for future in as_completed(future_to_row):
-                    row_idx = future_to_row[future]
-                    image_data[row_idx] = future.result()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_row = {}
+            for row_idx, row in enumerate(rows, start=2):
+                if "No" not in row:
+                    row = {"No": row_idx - 1, **row}
+
+                for col_idx, col_name in enumerate(final_excel_columns, 1):
+                    if col_name == 'Image' or col_name not in row:
+                        continue
+                    value = row[col_name]
+                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
+                    if col_name in max_lengths:
+                        max_lengths[col_name] = max(max_lengths[col_name], len(str(value)))
+                    if col_name in hyperlink_columns and pd.notna(value) and str(value).strip():
+                        cell.value = "Click here"
+                        cell.hyperlink = str(value)
+                        cell.font = hyperlink_font
+
+                url = row.get(image_column)
+                if self.max_images is not None and len(future_to_row) >= self.max_images:
+                    continue
+                if pd.notna(url) and str(url).strip():
+                    future_to_row[executor.submit(self._download_and_process_image, str(url))] = row_idx
+
+            # Phase 2: Collect the downloads still in flight
+            for future in as_completed(future_to_row):
+                image_data[future_to_row[future]] = future.result()
 
-        # --- ADD ---
-        # Get the new 1-based index for the 'Image' column for placing images.
+        # Get the 1-based index for the 'Image' column for placing images.
         image_col_idx = final_excel_columns.index('Image') + 1
+        image_col_letter = get_column_letter(image_col_idx)
 
         # Phase 3: Insert images into worksheet
         successful_images = 0
@@ -184,10 +189,6 @@ class ExcelImageExporter:
                 try:
                     img_buffer = BytesIO(img_bytes)
                     img = OpenPyxlImage(img_buffer)
-                    
-                    # --- MODIFIED ---
-                    # The anchor position now correctly uses the new image_col_idx.
-                    image_col_letter = get_column_letter(image_col_idx)
                     img.anchor = f"{image_col_letter}{row_idx}"
                     
                     ws.add_image(img)
@@ -200,8 +201,7 @@ class ExcelImageExporter:
             else:
                 failed_images += 1
         
-        # --- MODIFIED ---
-        # The logic for wrapping text columns now uses the correct indices from the final layout.
+        # Wrap the text columns using their indices in the final layout.
         for col_name in ("primary_text", "headline_text"):
             if col_name in final_excel_columns:
                 col_idx = final_excel_columns.index(col_name) + 1
@@ -215,32 +215,16 @@ class ExcelImageExporter:
                     cell = ws.cell(row=row_idx, column=col_idx)
                     cell.alignment = Alignment(wrap_text=True, vertical="top")
 
-        # --- MODIFIED & IMPROVED ---
-        # First, auto-adjust widths for all columns EXCEPT the ones we want to size manually.
-        # Create a temporary DataFrame without the manually sized columns.
-        cols_to_auto_adjust = [c for c in df.columns if c not in ('primary_text', 'headline_text')]
-        df_for_auto_adjust = df[cols_to_auto_adjust]
-        self._auto_adjust_column_widths(ws, df_for_auto_adjust)
+        # Auto-adjust widths for all columns EXCEPT the manually sized ones.
+        self._auto_adjust_column_widths(ws, final_excel_columns, max_lengths)
         
-        # Process hyperlinks (This logic remains largely the same but uses the final column indices)
-        hyperlink_columns = ["destination_url", "ad_url", "thumbnail_url"]
+        # Hyperlink columns get a fixed width (cells were linked while writing)
         for col_name in hyperlink_columns:
             if col_name in final_excel_columns:
-                # --- MODIFIED ---
-                # Get index from the final list
                 col_idx = final_excel_columns.index(col_name) + 1
-                for row_idx, (_, row) in enumerate(df.iterrows(), start=2):
-                    url = row.get(col_name) # Use .get() for safety
-                    if pd.notna(url) and str(url).strip():
-                        cell = ws.cell(row=row_idx, column=col_idx)
-                        cell.value = "Click here"
-                        cell.hyperlink = str(url)
-                        cell.font = Font(color="0563C1", underline="single")
-                
                 ws.column_dimensions[get_column_letter(col_idx)].width = 15
 
         # Set image column width
-        image_col_letter = get_column_letter(image_col_idx)
         ws.column_dimensions[image_col_letter].width = self.image_col_width
 
         self.logger.info(f"Export completed: {successful_images} images added, {failed_images} failed")
@@ -296,44 +280,43 @@ def build_media_zip(
     zip_basename_prefix: str,
     max_workers: int = 2,
     max_zip_bytes: int = 28 * 1024 * 1024,  # ~28MB safe under 30MB
-) -> list[tuple[str, BytesIO]]:
+    skip_library_ids: set | None = None,
+    on_fetched=None,
+    batch_size: int = 40,
+):
+    """
+    Download the media URLs in `col` and yield (filename, BytesIO) zips, each
+    size-capped, as soon as they fill up.
+
+    URLs are downloaded `batch_size` at a time, so memory holds one batch of
+    downloads plus the zip being written however many rows there are.
+    Rows whose library_id is in `skip_library_ids` (media already delivered
+    earlier) are left out. `on_fetched(library_ids)` is called per batch with
+    the library_ids whose media was downloaded successfully.
+    """
     if col not in df.columns:
-        return []
-
-    # Collect (No, url) pairs
-    rows = []
-    for _, row in df.iterrows():
-        val = str(row[col]).strip() if pd.notna(row[col]) else ""
-        if val:
-            no_val = None
-            if "No" in df.columns:
-                try:
-                    no_val = int(row["No"])
-                except Exception:
-                    no_val = None
-            rows.append((no_val, val))
+        return
 
-    # Deduplicate by URL string
-    seen = set()
+    # Collect (No, url) pairs, deduplicated by URL string
+    urls = df[col]
+    library_ids = df["library_id"] if "library_id" in df.columns else pd.Series([None] * len(df), index=df.index)
+    numbers = df["No"] if "No" in df.columns else pd.Series([None] * len(df), index=df.index)
     unique_rows = []
-    for no_val, u in rows:
-        if u not in seen:
-            seen.add(u)
-            unique_rows.append((no_val, u))
-
-    # Parallel download
-    blobs: list[tuple[int | None, str, bytes | None]] = []
-    if unique_rows:
-        with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futs = {ex.submit(_download_bytes, u): (no_val, u) for no_val, u in unique_rows}
-            for fut in as_completed(futs):
-                no_val, u = futs[fut]
-                data = fut.result()
-                blobs.append((no_val, u, data))
+    url_library_ids: dict[str, list] = {}
+    for url, library_id, no in zip(urls, library_ids, numbers):
+        val = str(url).strip() if pd.notna(url) else ""
+        if not val or (skip_library_ids and library_id in skip_library_ids):
+            continue
+        if val not in url_library_ids:
+            try:
+                no_val = int(no) if no is not None else None
+            except Exception:
+                no_val = None
+            unique_rows.append((no_val, val))
+        url_library_ids.setdefault(val, []).append(library_id)
 
-    parts: list[tuple[str, BytesIO]] = []
-    if not blobs:
-        return parts
+    if not unique_rows:
+        return
 
     part_idx = 1
     current = BytesIO()
@@ -341,41 +324,54 @@ def build_media_zip(
     written_bytes = 0
     manifest_rows = []
 
-    def _close_and_push():
-        nonlocal current, zf, manifest_rows, written_bytes, part_idx, parts
+    def _close_part():
+        nonlocal current, zf, manifest_rows, written_bytes, part_idx
         zf.writestr("manifest.csv", "No,column,url\n".encode("utf-8") +
                     "\n".join([f"{no},{col},{u}" for no, u in manifest_rows]).encode("utf-8"))
         zf.close()
         current.seek(0)
-        fname = f"{zip_basename_prefix}_{col}_media_part{part_idx}.zip"
-        parts.append((fname, current))
+        part = (f"{zip_basename_prefix}_{col}_media_part{part_idx}.zip", current)
         part_idx += 1
         current = BytesIO()
         zf = ZipFile(current, "w", compression=ZIP_DEFLATED)
         manifest_rows = []
         written_bytes = 0
+        return part
 
-    for no_val, u, data in blobs:
-        if not data:
-            continue
-        # build filename
-        base_fname = _filename_from_url(u, prefix=col)
-        if no_val is not None:
-            fname = f"{no_val}_{base_fname}"
-        else:
-            fname = base_fname
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for start in range(0, len(unique_rows), batch_size):
+            batch = unique_rows[start:start + batch_size]
+            futs = {ex.submit(_download_bytes, u): (no_val, u) for no_val, u in batch}
+            blobs = []
+            for fut in as_completed(futs):
+                no_val, u = futs[fut]
+                blobs.append((no_val, u, fut.result()))
 
-        estimated_added = len(data) + 2048
-        if written_bytes + estimated_added > max_zip_bytes and written_bytes > 0:
-            _close_and_push()
-        zf.writestr(fname, data)
-        manifest_rows.append((no_val, u))
-        written_bytes += estimated_added
+            if on_fetched is not None:
+                fetched = [lid for _, u, data in blobs if data for lid in url_library_ids.get(u, []) if pd.notna(lid)]
+                if fetched:
+                    on_fetched(fetched)
 
-    if written_bytes > 0 or not parts:
-        _close_and_push()
+            for no_val, u, data in blobs:
+                if not data:
+                    continue
+                # build filename
+                base_fname = _filename_from_url(u, prefix=col)
+                if no_val is not None:
+                    fname = f"{no_val}_{base_fname}"
+                else:
+                    fname = base_fname
+
+                estimated_added = len(data) + 2048
+                if written_bytes + estimated_added > max_zip_bytes and written_bytes > 0:
+                    yield _close_part()
+                zf.writestr(fname, data)
+                manifest_rows.append((no_val, u))
+                written_bytes += estimated_added
+            del blobs
 
-    return parts
+    if written_bytes > 0 or part_idx == 1:
+        yield _close_part()
 
 
 def export_dataframe_with_images(df: pd.DataFrame, 
@@ -396,43 +392,52 @@ def export_dataframe_with_images(df: pd.DataFrame,
     return exporter.export_to_excel(df, image_column)
 
 def generate_excel_report(crawler):
-    """Generate Excel report from crawler data with robust error handling."""
+    """
+    Generate Excel report from crawler data with robust error handling.
+
+    Rows are exported while the crawl is still running: the workbook consumes
+    the crawler's record stream, so thumbnail downloads overlap with crawling.
+    """
     today = datetime.now().strftime("%Y-%m-%d")
+    filename = f"{crawler.keyword.replace('.', '-')}_{today}_results.xlsx"
     time.sleep(1)  # Reduced sleep time
     
-    # Process crawler data
-    crawler.start()
-    
-    # Wait for processing to complete
-    while crawler.queue_manager.get_queue_position(crawler.chat_id) is not None:
-        time.sleep(0.5)
-    
-    crawler.data_to_dataframe()
-
-    if crawler.df.empty:
-        return None, f"{crawler.keyword.replace('.', '-')}_{today}_results.xlsx", crawler.df
+    # Process crawler data; a request that was not queued has no stream to export
+    if not crawler.start():
+        return None, filename, crawler.df
 
     # Create exporter with optimized settings
+    excel_buffer = None
     try:
         exporter = ExcelImageExporter(
             image_size=(100, 100),
             row_height=100,
             timeout=15,
-            max_workers=3
+            max_workers=3,
+            max_images=EXCEL_MAX_IMAGES or None
         )
-        
-        excel_buffer = exporter.export_to_excel(
-            df=crawler.df,
+        excel_buffer = exporter.export_rows(
+            crawler.iter_clean_rows(),
+            columns=crawler.EXPORT_COLUMNS,
             image_column='thumbnail_url'
         )
-        return excel_buffer, f"{crawler.keyword.replace('.', '-')}_{today}_results.xlsx", crawler.df
     except Exception as e:
         logging.error(f"Excel generation failed: {str(e)}")
-        return None, f"{crawler.keyword.replace('.', '-')}_{today}_results.xlsx", crawler.df
     finally:
+        # The stream can end on cancel before the worker is done; wait for it
+        while crawler.queue_manager.get_job_position(crawler) is not None:
+            time.sleep(0.5)
+
         # Ensure crawler resources are cleaned up
         if hasattr(crawler, 'driver') and crawler.driver:
             try:
-                crawler.driver.quit()
+                crawler.release_driver()
             except:
                 pass
+
+    crawler.data_to_dataframe()
+    if crawler.df.empty:
+        if excel_buffer:
+            excel_buffer.close()
+        return None, filename, crawler.df
+    return excel_buffer, filename, crawler.df
@@ -246,6 +246,7 @@ class LarkAPI:
                             "🌐 **/add_domain** - **/remove_domain** domain.com : add or remove domains to crawl\n"
                             "🕒 **/add_schedule** - **/remove_schedule** HH:MM : add or remove schedules (time in GMT+7)\n"
                             "ℹ️ **/list** : Show saved domains and schedules\n"
+                            "📊 **/metrics** [N | domain.com] : Crawl timing and volume stats\n"
                         )
                     }
                 },
@@ -0,0 +1,181 @@
+"""
+Short-lived cache of finished search results, keyed by normalized domain.
+
+Holds the cleaned DataFrame plus the generated Excel and media zip bytes so a
+repeat `/search` within RESULT_CACHE_TTL is answered without crawling.
+Entries are evicted least-recently-used once RESULT_CACHE_SIZE entries or
+RESULT_CACHE_MAX_MB of artifacts are exceeded.
+
+InflightSearches coalesces concurrent searches of a domain: the first request
+crawls, later ones follow its progress card and get the same result.
+"""
+from .config import RESULT_CACHE_TTL, RESULT_CACHE_SIZE, RESULT_CACHE_MAX_MB
+
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_domain(domain):
+    domain = (domain or "").strip().lower().rstrip("/.")
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+class CachedResult:
+    __slots__ = ("df", "filename", "excel", "media", "num_new", "page_stats", "cached_at", "nbytes")
+
+    def __init__(self, df, filename, excel, media, num_new=None, page_stats=None):
+        self.df = df
+        self.filename = filename
+        self.excel = excel          # xlsx bytes
+        self.media = media          # [(zip_name, zip_bytes), ...]; None when too large to keep
+        self.num_new = num_new
+        self.page_stats = page_stats
+        self.cached_at = time.time()
+        self.nbytes = len(excel) + sum(len(data) for _, data in media or ()) + int(df.memory_usage(deep=True).sum())
+
+
+class ResultCache:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.ttl = RESULT_CACHE_TTL
+                cls._instance.max_entries = RESULT_CACHE_SIZE
+                cls._instance.max_bytes = int(RESULT_CACHE_MAX_MB * 1024 * 1024)
+                cls._instance._entries = OrderedDict()
+                cls._instance._bytes = 0
+                cls._instance._entries_lock = threading.Lock()
+        return cls._instance
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+        return entry
+
+    def get(self, domain):
+        """Return the fresh CachedResult for `domain`, or None."""
+        if not self.enabled:
+            return None
+        key = normalize_domain(domain)
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.cached_at >= self.ttl:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, domain, entry):
+        if not self.enabled:
+            return
+        if entry.nbytes > self.max_bytes:
+            logger.info(f"Result for {domain} too large to cache ({entry.nbytes / 1e6:.1f} MB)")
+            return
+        key = normalize_domain(domain)
+        with self._entries_lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                logger.debug(f"Evicted cached result for {evicted_key}")
+
+    def invalidate(self, domain):
+        with self._entries_lock:
+            self._pop(normalize_domain(domain))
+
+
+class InflightSearch:
+    """One running crawl plus the requests waiting on its result."""
+
+    def __init__(self, domain):
+        self.domain = domain
+        self.done = threading.Event()
+        self.result = None          # CachedResult when the crawl produced rows, cacheable or not
+        self.empty = False          # crawl finished with no ads
+        self.page_stats = None
+        self._crawler = None
+        self._pending = []          # follower cards attached before the crawler existed
+        self._lock = threading.Lock()
+
+    def set_crawler(self, crawler):
+        with self._lock:
+            self._crawler = crawler
+            pending, self._pending = self._pending, []
+        for message_id in pending:
+            crawler.attach_follower(message_id)
+
+    def attach(self, message_id):
+        with self._lock:
+            crawler = self._crawler
+            if crawler is None:
+                self._pending.append(message_id)
+        if crawler is not None:
+            crawler.attach_follower(message_id)
+
+    def detach(self, message_id):
+        with self._lock:
+            crawler = self._crawler
+            if message_id in self._pending:
+                self._pending.remove(message_id)
+        if crawler is not None:
+            crawler.detach_follower(message_id)
+
+
+class SearchFollower:
+    """Registered with state_manager for a coalesced request so /cancel only detaches it."""
+
+    def __init__(self, flight, message_id):
+        self.flight = flight
+        self.message_id = message_id
+
+    def force_stop(self):
+        self.flight.detach(self.message_id)
+
+
+class InflightSearches:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._flights = {}
+                cls._instance._flights_lock = threading.Lock()
+        return cls._instance
+
+    def join(self, domain):
+        """Return (flight, leading); the leader must call finish() when done."""
+        key = normalize_domain(domain)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = InflightSearch(key)
+            return flight, True
+
+    def finish(self, flight, result=None, empty=False, page_stats=None):
+        """Publish the leader's outcome and wake every follower."""
+        with self._flights_lock:
+            if self._flights.get(flight.domain) is flight:
+                del self._flights[flight.domain]
+        flight.result = result
+        flight.empty = empty
+        flight.page_stats = page_stats
+        flight.done.set()
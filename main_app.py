@@ -1,12 +1,14 @@
 from flask import Flask, request, jsonify
 import json
 from lark_bot.core import handle_incoming_message
-from lark_bot.config import VERIFICATION_TOKEN
+from lark_bot.config import VERIFICATION_TOKEN, DRIVER_POOL_PREWARM, CRAWLER_ISOLATION, JOB_LEASE_SECONDS
 import logging
 import threading
 
 from lark_bot.command_handlers import command_handler
 from lark_bot.state_managers import state_manager
+from tools.driver_pool import DriverPool
+from tools.job_store import JobStore
 import datetime
 import time
 
@@ -138,11 +140,35 @@ def scheduler_loop():
         finally:
             time.sleep(10)  # check every 5s to be resilient to clock drifts
 
+def job_lease_loop():
+    """Keep this process's search jobs leased and replay jobs orphaned by a restart."""
+    logger.info("Job lease thread has started successfully.")
+    store = JobStore()
+    while True:
+        try:
+            store.renew()
+            for job in store.claim_orphans():
+                command_handler.resume_job(job)
+            store.prune()
+        except Exception as e:
+            logger.error(f"Job lease error: {e}")
+        finally:
+            time.sleep(max(1, JOB_LEASE_SECONDS // 3))
+
 # Start the scheduler thread when the module is loaded
 # This will be executed by Gunicorn
 scheduler_thread = threading.Thread(target=scheduler_loop, daemon=True)
 scheduler_thread.start()
 
+# Searches queued or running when the previous process stopped are picked up here
+job_thread = threading.Thread(target=job_lease_loop, daemon=True)
+job_thread.start()
+
+# Launch pooled Chrome drivers in the background so the first search skips startup
+# Isolated crawls launch their own browser in the child process
+if DRIVER_POOL_PREWARM and CRAWLER_ISOLATION != "process":
+    threading.Thread(target=DriverPool().warm, daemon=True).start()
+
 if __name__ == "__main__":
     
     app.run(port=5000, debug=True)
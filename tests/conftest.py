@@ -0,0 +1,9 @@
+"""Point every on-disk store at a scratch directory before the bot modules read their config."""
+import os
+import tempfile
+
+_SCRATCH = tempfile.mkdtemp(prefix="fbx_tests_")
+for _name, _file in (("AD_STORE_PATH", "ad_store.sqlite3"), ("JOB_STORE_PATH", "jobs.sqlite3"),
+                     ("METRICS_PATH", "crawl_metrics.jsonl")):
+    os.environ.setdefault(_name, os.path.join(_SCRATCH, _file))
+os.environ.setdefault("AD_BUFFER_DIR", _SCRATCH)
@@ -0,0 +1,61 @@
+"""AdBuffer keeps insertion order across the spill file and the in-memory tail, and cleans up."""
+import os
+
+from tools.ad_buffer import AdBuffer
+from tools.ad_record import AdRecord
+
+
+def _ids(rows):
+    return [r.library_id for r in rows]
+
+
+def _fill(buffer, n, start=0):
+    for i in range(start, start + n):
+        buffer.append({"library_id": str(i), "company": f"c{i}", "image_url": f"https://img/{i}.jpg"})
+
+
+def test_rows_stay_in_memory_below_the_threshold(tmp_path):
+    buffer = AdBuffer(memory_rows=5, directory=str(tmp_path))
+    _fill(buffer, 4)
+    assert (len(buffer), buffer.spilled, buffer.path) == (4, 0, None)
+    assert os.listdir(tmp_path) == []
+
+
+def test_spilled_rows_replay_first_in_insertion_order(tmp_path):
+    buffer = AdBuffer(memory_rows=3, directory=str(tmp_path))
+    _fill(buffer, 8)
+    assert (len(buffer), buffer.spilled) == (8, 6)
+    assert os.path.dirname(buffer.path) == str(tmp_path)
+    assert _ids(buffer) == [str(i) for i in range(8)]
+    assert [_ids(chunk) for chunk in buffer.iter_chunks(size=4)] == [
+        ["0", "1", "2", "3"], ["4", "5"], ["6", "7"]]
+
+    row = next(iter(buffer))
+    assert isinstance(row, AdRecord)
+    assert (row["company"], row["image_url"], row["video_url"]) == ("c0", "https://img/0.jpg", None)
+
+
+def test_iteration_is_a_snapshot(tmp_path):
+    buffer = AdBuffer(memory_rows=2, directory=str(tmp_path))
+    _fill(buffer, 3)
+    chunks = buffer.iter_chunks(size=1)
+    first = next(chunks)
+    _fill(buffer, 3, start=3)               # spills again mid-iteration
+    assert _ids(first + [r for chunk in chunks for r in chunk]) == ["0", "1", "2"]
+    assert _ids(buffer) == [str(i) for i in range(6)]
+
+
+def test_zero_threshold_never_spills(tmp_path):
+    buffer = AdBuffer(memory_rows=0, directory=str(tmp_path))
+    _fill(buffer, 50)
+    assert (buffer.spilled, buffer.path) == (0, None)
+
+
+def test_close_deletes_the_spill_file(tmp_path):
+    buffer = AdBuffer(memory_rows=2, directory=str(tmp_path))
+    _fill(buffer, 5)
+    path = buffer.path
+    assert os.path.exists(path)
+    buffer.close()
+    assert not os.path.exists(path)
+    assert (len(buffer), buffer.path, list(buffer)) == (0, None, [])
@@ -0,0 +1,37 @@
+"""Block profiles must hit creatives and trackers but never the pages the crawler reads."""
+import re
+
+import pytest
+
+from tools.driver_pool import BLOCK_PROFILES
+
+SEARCH_URL = ("https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&"
+              "is_targeted_country=false&media_type=all&q={q}&search_type=keyword_unordered")
+
+
+def _blocked(url, profile="strict"):
+    # Network.setBlockedURLs semantics: '*' matches any run of characters over the whole URL
+    return any(re.fullmatch(".*".join(map(re.escape, p.split("*"))), url) for p in BLOCK_PROFILES[profile])
+
+
+@pytest.mark.parametrize("query", ["shop.gifts.com", "x.mp4store.com", "fonts.woff.io", "icons.png.shop",
+                                   "google-analytics.com", "doubleclick.net", "scontent.example.com"])
+def test_search_pages_never_blocked(query):
+    assert not _blocked(SEARCH_URL.format(q=query))
+    assert not _blocked(f"https://www.facebook.com/api/graphql/?q={query}")
+
+
+@pytest.mark.parametrize("url", [
+    "https://scontent-sin6-1.xx.fbcdn.net/v/t39.35426-6/img.jpg?stp=dst-jpg&oh=1",
+    "https://video-sin6-2.xx.fbcdn.net/v/t42.1790-2/clip.mp4?_nc_cat=1",
+    "https://static.xx.fbcdn.net/rsrc.php/v3/yX/r/font.woff2",
+    "https://www.facebook.com/tr/?id=1&ev=PageView",
+    "https://connect.facebook.net/en_US/fbevents.js",
+])
+def test_media_and_trackers_blocked(url):
+    assert _blocked(url)
+
+
+def test_bundles_not_blocked():
+    assert not _blocked("https://static.xx.fbcdn.net/rsrc.php/v3/yX/r/bundle.js")
+    assert not _blocked("https://static.xx.fbcdn.net/rsrc.php/v3/yX/l/0,cross/styles.css")
@@ -0,0 +1,36 @@
+"""crawl() reports why it ended, so a failed search is never shown as one without ads."""
+import pandas as pd
+import pytest
+
+from tools.crawl_planner import PAGE_ADS, PAGE_EMPTY, PAGE_ERROR
+from tools.fb_scrape_bot import FacebookAdsCrawler
+
+
+@pytest.fixture
+def crawler(monkeypatch):
+    crawler = FacebookAdsCrawler("example-shop.com", chat_id=None)
+    crawler.http_fast_path = False
+    crawler.emit_metrics = False
+    monkeypatch.setattr(crawler, "initialize_driver", lambda: True)
+    monkeypatch.setattr(crawler, "release_driver", lambda: None)
+    return crawler
+
+
+@pytest.mark.parametrize("state, outcome", [(PAGE_ERROR, "page_error"), (PAGE_EMPTY, "empty")])
+def test_initial_page(crawler, monkeypatch, state, outcome):
+    monkeypatch.setattr(crawler, "fetch_ads_page", lambda: state)
+    crawler.crawl()
+    assert crawler.outcome == outcome
+
+
+def test_empty_advertiser_list(crawler, monkeypatch):
+    monkeypatch.setattr(crawler, "fetch_ads_page", lambda: PAGE_ADS)
+    monkeypatch.setattr(crawler, "get_dim_keyword", lambda: pd.DataFrame(columns=["id", "name"]))
+    crawler.crawl()
+    assert crawler.outcome == "no_advertisers"
+
+
+def test_no_driver(crawler, monkeypatch):
+    monkeypatch.setattr(crawler, "initialize_driver", lambda: False)
+    crawler.crawl()
+    assert crawler.outcome == "no_driver"
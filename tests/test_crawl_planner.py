@@ -0,0 +1,64 @@
+"""CrawlPlan ordering, retries with backoff, and time/ad budget stops."""
+import time
+
+from tools.crawl_planner import CrawlPlan, PAGE_ADS, PAGE_EMPTY, PAGE_ERROR
+
+
+def test_highest_yield_first_unknown_pages_get_the_median():
+    plan = CrawlPlan(["low", "new", "high", "low"], yields={"low": 1, "mid": 5, "high": 9})
+    assert plan.total == 3
+    assert [plan.next(), plan.next(), plan.next(), plan.next()] == ["high", "new", "low", None]
+
+
+def test_failed_page_is_retried_after_backoff_then_counted_failed():
+    plan = CrawlPlan(["a"], max_retries=2, backoff=0.05)
+    page = plan.next()
+    plan.record(page, PAGE_ERROR)
+    assert plan.next(block=False) is None            # still backing off
+    started = time.time()
+    assert plan.next() == "a"
+    assert time.time() - started >= 0.04
+    plan.record("a", PAGE_ERROR)
+    assert plan.next() == "a"                        # second retry, after 0.1s
+    plan.record("a", PAGE_ERROR)
+    assert plan.next() is None
+    coverage = plan.coverage()
+    assert (coverage[PAGE_ERROR], coverage["retries"], coverage["stopped"]) == (1, 2, None)
+    assert plan.yields() == {}
+
+
+def test_retry_that_succeeds_counts_its_ads():
+    plan = CrawlPlan(["a", "b"], max_retries=1, backoff=0)
+    plan.record(plan.next(), PAGE_ERROR)
+    plan.record(plan.next(), PAGE_EMPTY)
+    plan.record(plan.next(), PAGE_ADS, 4)
+    assert plan.next() is None
+    assert plan.yields() == {"a": 4, "b": 0}
+    assert plan.coverage()[PAGE_ADS] == 1
+
+
+def test_ad_budget_stops_the_plan():
+    plan = CrawlPlan(["a", "b", "c"], max_ads=5)
+    plan.record(plan.next(), PAGE_ADS, 3)
+    plan.record(plan.next(), PAGE_ADS, 3)
+    assert plan.next() is None
+    coverage = plan.coverage()
+    assert (coverage["stopped"], coverage["skipped"], coverage[PAGE_ADS]) == ("ad_budget", 1, 2)
+
+
+def test_deadline_stops_the_plan_and_pending_retries_count_failed():
+    plan = CrawlPlan(["a", "b"], time_budget=0.1, backoff=10)
+    plan.record(plan.next(), PAGE_ERROR)
+    time.sleep(0.12)
+    assert plan.next() is None
+    coverage = plan.coverage()
+    assert (coverage["stopped"], coverage["skipped"], coverage[PAGE_ERROR]) == ("deadline", 1, 1)
+
+
+def test_blocking_wait_for_a_retry_ends_at_the_deadline():
+    plan = CrawlPlan(["a"], time_budget=0.1, backoff=10)
+    plan.record(plan.next(), PAGE_ERROR)
+    started = time.time()
+    assert plan.next() is None
+    assert time.time() - started < 1
+    assert plan.coverage()["stopped"] == "deadline"
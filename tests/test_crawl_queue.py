@@ -0,0 +1,46 @@
+"""CrawlerQueue admission, without starting its worker threads."""
+import threading
+
+from tools.crawl_scheduler import FairQueue, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED
+from tools.fb_scrape_bot import CrawlerQueue
+
+
+class Job:
+    def __init__(self, chat_id, keyword, priority=PRIORITY_INTERACTIVE):
+        self.chat_id, self.keyword, self.priority = chat_id, keyword, priority
+
+
+def _queue():
+    q = object.__new__(CrawlerQueue)
+    q.queue = FairQueue(weights={})
+    q._cond = threading.Condition()
+    q._positions_dirty = threading.Event()
+    return q
+
+
+def test_identical_waiting_request_is_not_queued_twice():
+    q = _queue()
+    assert q.add_request(Job("c", "d.com")) is None
+    assert q.add_request(Job("c", "e.com")) is None
+    assert q.add_request(Job("c", "e.com")) == 2
+    assert len(q.queue) == 2
+
+
+def test_interactive_request_is_queued_ahead_of_scheduled_duplicate():
+    q = _queue()
+    scheduled = Job("c", "d.com", PRIORITY_SCHEDULED)
+    interactive = Job("c", "d.com")
+    assert q.add_request(scheduled) is None
+    assert q.add_request(interactive) is None
+    assert list(q.queue) == [interactive, scheduled]
+
+
+def test_background_refresh_waits_behind_crawls():
+    q = _queue()
+    refresh = Job(None, "d.com", PRIORITY_BACKGROUND)
+    crawl = Job("c", "d.com")
+    q.add_request(refresh)
+    q.add_request(crawl)
+    assert q.queue.pop(PRIORITY_INTERACTIVE) is crawl
+    assert q.queue.pop(PRIORITY_INTERACTIVE) is None
+    assert q.queue.pop() is refresh
@@ -0,0 +1,80 @@
+"""FairQueue dispatch order: priority classes, weighted fair queuing across chats, reserved workers."""
+from tools.crawl_scheduler import (FairQueue, parse_chat_weights, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE,
+                                   PRIORITY_SCHEDULED)
+
+
+class Job:
+    def __init__(self, chat_id, name, priority=PRIORITY_INTERACTIVE):
+        self.chat_id, self.name, self.priority = chat_id, name, priority
+
+    def __repr__(self):
+        return self.name
+
+
+def _drain(queue, max_priority=None):
+    order = []
+    while (job := queue.pop(max_priority)) is not None:
+        order.append(job.name)
+    return order
+
+
+def test_chats_interleave_instead_of_first_come_first_served():
+    queue = FairQueue(weights={})
+    for i in range(3):
+        queue.push(Job("a", f"a{i}"))
+    queue.push(Job("b", "b0"))
+    queue.push(Job("b", "b1"))
+    assert [job.name for job in queue] == ["a0", "b0", "a1", "b1", "a2"]
+    assert _drain(queue) == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_weights_scale_a_chats_share():
+    queue = FairQueue(weights={"a": 2.0})
+    for i in range(4):
+        queue.push(Job("a", f"a{i}"))
+    for i in range(2):
+        queue.push(Job("b", f"b{i}"))
+    assert _drain(queue) == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+def test_late_arrival_is_not_behind_the_whole_backlog():
+    queue = FairQueue(weights={})
+    for i in range(4):
+        queue.push(Job("a", f"a{i}"))
+    assert queue.pop().name == "a0"
+    queue.push(Job("b", "b0"))
+    assert _drain(queue) == ["b0", "a1", "a2", "a3"]
+
+
+def test_priority_classes_go_first():
+    queue = FairQueue(weights={})
+    queue.push(Job("a", "refresh", PRIORITY_BACKGROUND))
+    queue.push(Job("a", "scheduled", PRIORITY_SCHEDULED))
+    queue.push(Job("b", "search"))
+    assert _drain(queue) == ["search", "scheduled", "refresh"]
+
+
+def test_reserved_worker_only_takes_interactive_jobs():
+    queue = FairQueue(weights={})
+    queue.push(Job("a", "scheduled", PRIORITY_SCHEDULED))
+    assert queue.pop(PRIORITY_INTERACTIVE) is None
+    queue.push(Job("b", "search"))
+    assert queue.pop(PRIORITY_INTERACTIVE).name == "search"
+    assert queue.pop(PRIORITY_INTERACTIVE) is None
+    assert queue.pop().name == "scheduled"
+
+
+def test_iteration_order_tracks_changes():
+    queue = FairQueue(weights={})
+    queue.push(Job("a", "a0"))
+    assert [job.name for job in queue] == ["a0"]
+    queue.push(Job("b", "b0", PRIORITY_SCHEDULED))
+    queue.push(Job("c", "c0"))
+    assert [job.name for job in queue] == ["a0", "c0", "b0"]
+    queue.pop()
+    assert [job.name for job in queue] == ["c0", "b0"]
+    assert len(queue) == 2
+
+
+def test_parse_chat_weights_skips_bad_entries():
+    assert parse_chat_weights("a:3, b:0.5,c:x,d:0,:2,") == {"a": 3.0, "b": 0.5}
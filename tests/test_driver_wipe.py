@@ -0,0 +1,35 @@
+"""Releasing a driver keeps Facebook's cookies and drops everything else a page left behind."""
+from tools.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self, cookies):
+        self.cookies = cookies
+        self.commands = []
+        self.url = None
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((cmd, params))
+        if cmd == "Network.getAllCookies":
+            return {"cookies": self.cookies}
+        return {}
+
+    def get(self, url):
+        self.url = url
+
+
+def test_wipe_keeps_facebook_cookies_only():
+    driver = FakeDriver([
+        {"name": "datr", "domain": ".facebook.com", "path": "/"},
+        {"name": "wd", "domain": "www.facebook.com", "path": "/"},
+        {"name": "_ga", "domain": ".example-shop.com", "path": "/"},
+        {"name": "x", "domain": "notfacebook.com", "path": "/p"},
+    ])
+    object.__new__(DriverPool)._wipe(driver)
+
+    deleted = [params for cmd, params in driver.commands if cmd == "Network.deleteCookies"]
+    assert deleted == [{"name": "_ga", "domain": ".example-shop.com", "path": "/"},
+                       {"name": "x", "domain": "notfacebook.com", "path": "/p"}]
+    assert not any(cmd == "Network.clearBrowserCookies" for cmd, _ in driver.commands)
+    assert any(cmd == "Storage.clearDataForOrigin" for cmd, _ in driver.commands)
+    assert driver.url == "about:blank"
@@ -0,0 +1,88 @@
+"""HTTP fast path against recorded pages served by benchmarks.replay.FixtureAdapter."""
+import json
+import os
+
+import pytest
+
+from benchmarks.replay import FixtureAdapter
+from tools.crawl_planner import PAGE_ADS, PAGE_EMPTY, PAGE_ERROR
+from tools.fb_scrape_bot import FacebookAdsCrawler
+from tools.http_fetch import AdsLibraryHttpClient, parse_search_html
+
+FIXTURE = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures", "minimal")
+
+
+def _fixture_without_pagination(tmp_path):
+    """Copy of the minimal fixture whose keyword page has no page_info."""
+    with open(os.path.join(FIXTURE, "pages", "0.html"), encoding="utf-8") as f:
+        html = f.read().replace('"page_info": {"has_next_page": false}, ', "")
+    assert "has_next_page" not in html
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "pages" / "0.html").write_text(html, encoding="utf-8")
+    (tmp_path / "manifest.json").write_text(json.dumps({
+        "keyword": "example-shop.com", "advertisers": [],
+        "pages": {"example-shop.com": {"html": "pages/0.html", "responses": []}},
+    }), encoding="utf-8")
+    return str(tmp_path)
+
+
+@pytest.fixture
+def client():
+    client = AdsLibraryHttpClient()
+    yield client
+    client.session = client._build_session()
+
+
+def _serve(client, fixture_dir):
+    client.session.mount("https://", FixtureAdapter(fixture_dir))
+
+
+def _search(client, query):
+    return client.search(f"{FacebookAdsCrawler.ads_library_url}?q={query}&search_type=keyword_unordered")
+
+
+def test_complete_page_is_trusted(client):
+    _serve(client, FIXTURE)
+    result = _search(client, "example-shop.com")
+    assert result.state == PAGE_ADS
+    assert result.complete
+    assert [r["library_id"] for r in result.records] == ["1000000000000001", "1000000000000002"]
+
+
+def test_no_results_page_is_complete(client):
+    _serve(client, FIXTURE)
+    result = _search(client, "nothing.example")
+    assert (result.state, result.complete) == (PAGE_EMPTY, True)
+
+
+def test_page_without_pagination_info_is_not_trusted(client, tmp_path):
+    _serve(client, _fixture_without_pagination(tmp_path))
+    result = _search(client, "example-shop.com")
+    assert result.state == PAGE_ADS
+    assert not result.complete
+    assert result.reason == "no pagination info"
+
+
+def test_more_pages_and_unparseable_pages():
+    html = '<script type="application/json">{"ad_archive_id": "1", "snapshot": {}, "has_next_page": true}</script>'
+    result = parse_search_html(html)
+    assert (result.state, result.complete) == (PAGE_ADS, False)
+    assert parse_search_html("<html><body>Loading</body></html>").state == PAGE_ERROR
+
+
+def test_crawler_answers_complete_search_without_browser(client):
+    _serve(client, FIXTURE)
+    crawler = FacebookAdsCrawler("example-shop.com", chat_id=None)
+    crawler.http_client = client
+    assert crawler._crawl_http()
+    assert crawler.coverage["engine"] == "http"
+    assert len(crawler.ads_data) == 2
+    assert len(crawler.df) == 2
+
+
+def test_crawler_falls_back_to_browser(client, tmp_path):
+    _serve(client, _fixture_without_pagination(tmp_path))
+    crawler = FacebookAdsCrawler("example-shop.com", chat_id=None)
+    crawler.http_client = client
+    assert not crawler._crawl_http()
+    assert len(crawler.ads_data) == 0
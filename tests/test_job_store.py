@@ -0,0 +1,122 @@
+"""Job leases: takeover of expired or dead owners, the attempt limit and the claim compare-and-set."""
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from lark_bot.config import JOB_MAX_ATTEMPTS
+from tools.job_store import JobStore, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+
+
+def _store(path, owner):
+    # Two JobStore "processes" on one database file
+    store = object.__new__(JobStore)
+    store._db_lock = threading.Lock()
+    store.owner = owner
+    store.conn = store._connect(str(path))
+    return store
+
+
+@pytest.fixture
+def db(tmp_path):
+    return tmp_path / "jobs.sqlite3"
+
+
+def _job(store, job_id):
+    return dict(store.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def _expire(store, job_id):
+    store.conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+    store.conn.commit()
+
+
+def test_live_lease_of_another_host_is_left_alone(db):
+    owner = _store(db, "otherhost:1:a")
+    job_id = owner.enqueue("u", "c", "m", "card", "a.com")
+    assert _store(db, "thishost:2:b").claim_orphans() == []
+    assert _job(owner, job_id)["owner"] == "otherhost:1:a"
+
+
+def test_expired_lease_is_taken_over(db):
+    owner = _store(db, "otherhost:1:a")
+    job_id = owner.enqueue("u", "c", "m", "card", "a.com")
+    owner.mark_running(job_id)
+    _expire(owner, job_id)
+
+    taker = _store(db, "thishost:2:b")
+    claimed = taker.claim_orphans()
+    assert [(j["id"], j["state"]) for j in claimed] == [(job_id, JOB_QUEUED)]
+    row = _job(taker, job_id)
+    assert row["owner"] == taker.owner and row["lease_until"] > time.time()
+
+    # The old owner no longer controls the job
+    owner.finish(job_id, ok=True)
+    assert _job(taker, job_id)["state"] == JOB_QUEUED
+
+
+def test_dead_owner_on_this_host_is_taken_over_before_expiry(db):
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    owner = _store(db, f"{socket.gethostname()}:{child.pid}:a")
+    job_id = owner.enqueue("u", "c", "m", "card", "a.com")
+    assert [j["id"] for j in _store(db, "thishost:2:b").claim_orphans()] == [job_id]
+
+
+def test_job_past_attempt_limit_is_failed(db):
+    owner = _store(db, "otherhost:1:a")
+    job_id = owner.enqueue("u", "c", "m", "card", "a.com")
+    for _ in range(JOB_MAX_ATTEMPTS):
+        owner.mark_running(job_id)
+    _expire(owner, job_id)
+
+    claimed = _store(db, "thishost:2:b").claim_orphans()
+    assert claimed[0]["state"] == JOB_FAILED
+    assert claimed[0]["error"] == f"gave up after {JOB_MAX_ATTEMPTS} attempts"
+    assert _job(owner, job_id)["state"] == JOB_FAILED
+
+
+def test_running_job_below_limit_is_replayed(db):
+    owner = _store(db, "otherhost:1:a")
+    job_id = owner.enqueue("u", "c", "m", "card", "a.com")
+    owner.mark_running(job_id)
+    assert _job(owner, job_id)["state"] == JOB_RUNNING
+    _expire(owner, job_id)
+    assert _store(db, "thishost:2:b").claim_orphans()[0]["state"] == JOB_QUEUED
+
+
+def test_concurrent_claim_only_one_wins(db):
+    owner = _store(db, "otherhost:1:a")
+    job_id = owner.enqueue("u", "c", "m", "card", "a.com")
+    _expire(owner, job_id)
+
+    first, second = _store(db, "thishost:2:b"), _store(db, "thishost:3:c")
+    orphaned = second._orphaned
+
+    def claim_in_between(*args):
+        # `first` claims after `second` has read the row but before it updates it
+        second._orphaned = orphaned
+        assert [j["id"] for j in first.claim_orphans()] == [job_id]
+        return orphaned(*args)
+
+    second._orphaned = claim_in_between
+    assert second.claim_orphans() == []
+    assert _job(owner, job_id)["owner"] == first.owner
+
+
+def test_renew_extends_only_own_open_jobs(db):
+    mine, other = _store(db, "thishost:2:b"), _store(db, "otherhost:1:a")
+    open_id = mine.enqueue("u", "c", "m", "card", "a.com")
+    done_id = mine.enqueue("u", "c", "m", "card", "b.com")
+    mine.finish(done_id)
+    other_id = other.enqueue("u", "c", "m", "card", "c.com")
+    for job_id in (open_id, other_id):
+        _expire(mine, job_id)
+
+    mine.renew()
+    assert _job(mine, open_id)["lease_until"] > time.time()
+    assert _job(mine, done_id)["lease_until"] == 0
+    assert _job(mine, other_id)["lease_until"] < time.time()
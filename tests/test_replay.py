@@ -0,0 +1,84 @@
+"""
+Smoke tests for the offline replay harness against the checked-in minimal fixture.
+
+The fixture (benchmarks/fixtures/minimal) is hand-built in the layout
+`python -m benchmarks.replay record` writes: a keyword page with two ads in
+its embedded JSON plus one GraphQL payload, and one advertiser page.
+"""
+import os
+import shutil
+
+import pytest
+import requests
+
+from benchmarks.replay import Fixture, ReplayServer
+from tools.network_capture import parse_ads_html, parse_ads_payload
+
+FIXTURE = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures", "minimal")
+
+
+@pytest.fixture(scope="module")
+def server():
+    with ReplayServer(FIXTURE) as server:
+        yield server
+
+
+def _get(server, query):
+    return requests.get(server.ads_library_url, params={"q": query}, timeout=5)
+
+
+def test_fixture_manifest():
+    fixture = Fixture(FIXTURE)
+    assert fixture.keyword == "example-shop.com"
+    assert fixture.advertisers == ["Example"]
+    assert "No ads match" in fixture.search_page("unknown.example")
+
+
+def test_keyword_page_replays_embedded_ads(server):
+    response = _get(server, "example-shop.com")
+    assert response.status_code == 200
+
+    records = parse_ads_html(response.text)
+    assert [r["library_id"] for r in records] == ["1000000000000001", "1000000000000002"]
+    first = records[0]
+    assert first["company"] == "Example Shop"
+    assert first["ad_start_date"] == "14 Nov 2023"
+    assert first["pixel_id"] == "123456789"
+    assert first["image_url"] == first["thumbnail_url"]
+    assert first["video_url"] is None
+    assert first["primary_text"] == "Spring sale: 50% off"
+    assert first["headline_text"] == "Shop the sale"
+
+
+def test_keyword_page_replays_graphql_payloads(server):
+    html = _get(server, "example-shop.com").text
+    assert '"/api/graphql/?r=responses/0_0.json"' in html
+
+    body = requests.get(server.url + "/api/graphql/", params={"r": "responses/0_0.json"}, timeout=5).text
+    records = parse_ads_payload(body)
+    assert len(records) == 1
+    assert records[0]["library_id"] == "1000000000000003"
+    assert records[0]["video_url"].endswith(".mp4?oh=3&oe=ABC")
+    assert records[0]["image_url"] is None
+    assert records[0]["thumbnail_url"].startswith("https://video.xx.fbcdn.net/v/clip3.jpg")
+
+
+def test_advertiser_and_unknown_queries(server):
+    assert len(parse_ads_html(_get(server, "Example-Shop.com  example").text)) == 1
+    assert parse_ads_html(_get(server, "nothing.example").text) == []
+
+
+def test_fixture_paths_stay_inside_fixture(server):
+    response = requests.get(server.url + "/api/graphql/", params={"r": "../../replay.py"}, timeout=5)
+    assert response.status_code == 404
+
+
+@pytest.mark.skipif(not any(shutil.which(b) for b in ("google-chrome", "chromium", "chromium-browser")),
+                    reason="needs a local Chrome")
+def test_extraction_benchmark_runs():
+    from benchmarks.bench_extraction import run_strategy
+
+    with ReplayServer(FIXTURE) as server:
+        result = run_strategy(server, "network", runs=1, block_profile="strict")
+    assert result.states.get("ads") == 1
+    assert result.ads == 1
@@ -0,0 +1,85 @@
+"""ResultCache TTL expiry, LRU order and byte-limit eviction."""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+from lark_bot.result_cache import CachedResult, ResultCache, normalize_domain
+
+
+def _cache(ttl=60, max_entries=3, max_bytes=10_000):
+    cache = object.__new__(ResultCache)
+    cache.ttl, cache.max_entries, cache.max_bytes = ttl, max_entries, max_bytes
+    cache._entries, cache._bytes, cache._entries_lock = OrderedDict(), 0, threading.Lock()
+    return cache
+
+
+def _result(excel_bytes=100, media=()):
+    return CachedResult(pd.DataFrame({"library_id": ["1"]}), "r.xlsx", b"x" * excel_bytes, list(media))
+
+
+def test_domains_are_normalized():
+    cache = _cache()
+    entry = _result()
+    cache.put("WWW.Example.com/", entry)
+    assert cache.get("example.com") is entry
+    assert normalize_domain(" www.a.com. ") == "a.com"
+
+
+def test_entries_expire_after_ttl():
+    cache = _cache(ttl=60)
+    entry = _result()
+    cache.put("a.com", entry)
+    entry.cached_at -= 59
+    assert cache.get("a.com") is entry
+    entry.cached_at -= 1
+    assert cache.get("a.com") is None
+    assert cache._bytes == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _cache(max_entries=2)
+    a, b, c = _result(), _result(), _result()
+    cache.put("a.com", a)
+    cache.put("b.com", b)
+    assert cache.get("a.com") is a          # b.com is now least recently used
+    cache.put("c.com", c)
+    assert cache.get("b.com") is None
+    assert (cache.get("a.com"), cache.get("c.com")) == (a, c)
+
+
+def test_byte_limit_evicts_oldest_and_rejects_oversized():
+    small = _result(excel_bytes=100).nbytes
+    cache = _cache(max_entries=10, max_bytes=small * 2 + small // 2)
+    for domain in ("a.com", "b.com", "c.com"):
+        cache.put(domain, _result(excel_bytes=100))
+    assert cache.get("a.com") is None
+    assert cache.get("b.com") is not None and cache.get("c.com") is not None
+    assert cache._bytes == small * 2
+
+    cache.put("big.com", _result(excel_bytes=cache.max_bytes))
+    assert cache.get("big.com") is None
+    assert cache._bytes == small * 2
+
+
+def test_replacing_an_entry_keeps_the_byte_count():
+    cache = _cache()
+    cache.put("a.com", _result(excel_bytes=100))
+    entry = _result(excel_bytes=300, media=[("m.zip", b"z" * 50)])
+    cache.put("a.com", entry)
+    assert cache._bytes == entry.nbytes
+    cache.invalidate("a.com")
+    assert (cache.get("a.com"), cache._bytes) == (None, 0)
+
+
+def test_uncacheable_result_has_no_media():
+    entry = CachedResult(pd.DataFrame(), "r.xlsx", b"x" * 10, None)
+    assert entry.media is None and entry.nbytes >= 10
+
+
+@pytest.mark.parametrize("ttl, max_entries", [(0, 3), (60, 0)])
+def test_disabled_cache_stores_nothing(ttl, max_entries):
+    cache = _cache(ttl=ttl, max_entries=max_entries)
+    cache.put("a.com", _result())
+    assert cache.get("a.com") is None
@@ -0,0 +1,123 @@
+"""
+Bounded-memory accumulator for a crawl's ad rows.
+
+Rows stay in memory until AD_BUFFER_MEMORY_ROWS are held, then the batch is
+spilled to a per-crawl SQLite file (one column per AdRecord field) under
+AD_BUFFER_DIR. Iteration and iter_chunks() replay spilled rows first, in
+insertion order, then the in-memory tail, so exporters can walk any number
+of ads a chunk at a time. The file is deleted by close().
+"""
+from lark_bot.config import AD_BUFFER_MEMORY_ROWS, AD_BUFFER_DIR
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+from .ad_record import AdRecord, AD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ", ".join(AD_FIELDS)
+
+
+class AdBuffer:
+    def __init__(self, memory_rows=None, directory=None):
+        self.memory_rows = AD_BUFFER_MEMORY_ROWS if memory_rows is None else memory_rows
+        self.directory = directory or AD_BUFFER_DIR or None
+        self.path = None
+        self._rows = []
+        self._spilled = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._spilled + len(self._rows)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    @property
+    def spilled(self):
+        return self._spilled
+
+    def append(self, record):
+        with self._lock:
+            self._rows.append(AdRecord.from_dict(record))
+            if self.memory_rows and len(self._rows) >= self.memory_rows:
+                self._spill()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def _open(self):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="fbx_ads_", suffix=".sqlite3", dir=self.directory)
+        os.close(fd)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # Scratch data: losing it on a crash is fine, so skip durability
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(f"CREATE TABLE ads (seq INTEGER PRIMARY KEY, {_COLUMNS})")
+        logger.info(f"Spilling ad rows to {self.path}")
+        return conn
+
+    def _spill(self):
+        if self._conn is None:
+            self._conn = self._open()
+        self._conn.executemany(
+            f"INSERT INTO ads ({_COLUMNS}) VALUES ({', '.join('?' * len(AD_FIELDS))})",
+            [tuple(getattr(r, f) for f in AD_FIELDS) for r in self._rows]
+        )
+        self._conn.commit()
+        self._spilled += len(self._rows)
+        self._rows = []
+
+    def iter_chunks(self, size=1000):
+        """Lists of up to `size` AdRecords, in insertion order."""
+        with self._lock:
+            spilled, tail = self._spilled, list(self._rows)
+        if spilled:
+            last_seq = 0
+            while True:
+                with self._lock:
+                    rows = self._conn.execute(
+                        f"SELECT seq, {_COLUMNS} FROM ads WHERE seq > ? AND seq <= ? ORDER BY seq LIMIT ?",
+                        (last_seq, spilled, size)
+                    ).fetchall()
+                if not rows:
+                    break
+                last_seq = rows[-1][0]
+                yield [AdRecord(*row[1:]) for row in rows]
+        for i in range(0, len(tail), size):
+            yield tail[i:i + size]
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def close(self):
+        with self._lock:
+            self._rows = []
+            self._spilled = 0
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+            if self.path:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+                self.path = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
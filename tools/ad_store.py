@@ -0,0 +1,194 @@
+"""
+Persistent ad store (SQLite) indexed by library_id and keyword.
+
+Remembers every ad a crawl has seen (first_seen / last_seen, last extracted
+row and when it was extracted) plus whether its media was already
+downloaded, so repeat crawls can skip card details and media for ads that
+are already known. Stored rows are only reused while younger than
+AD_DETAIL_TTL_HOURS, since the signed fbcdn media URLs in them expire. Also
+keeps each advertiser query's ads-per-run yield for the crawl planner.
+"""
+from lark_bot.config import AD_STORE_PATH, AD_DETAIL_TTL_HOURS
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MEDIA_COLUMNS = ("ad_url", "thumbnail_url")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ads (
+    keyword TEXT NOT NULL,
+    library_id TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    record TEXT,
+    fetched_at REAL NOT NULL DEFAULT 0,
+    ad_url_status TEXT NOT NULL DEFAULT 'pending',
+    thumbnail_url_status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (keyword, library_id)
+);
+CREATE INDEX IF NOT EXISTS idx_ads_library_id ON ads(library_id);
+CREATE TABLE IF NOT EXISTS advertiser_yield (
+    keyword TEXT NOT NULL,
+    advertiser TEXT NOT NULL,
+    yield REAL NOT NULL,
+    runs INTEGER NOT NULL,
+    last_run REAL NOT NULL,
+    PRIMARY KEY (keyword, advertiser)
+);
+"""
+
+
+class AdStore:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._db_lock = threading.Lock()
+                cls._instance.conn = cls._instance._connect(AD_STORE_PATH)
+        return cls._instance
+
+    def _connect(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(ads)")}
+        if "fetched_at" not in columns:
+            # Stores created before rows were dated: treat every row as stale
+            conn.execute("ALTER TABLE ads ADD COLUMN fetched_at REAL NOT NULL DEFAULT 0")
+        conn.commit()
+        return conn
+
+    def known_ids(self, keyword, max_age_hours=None):
+        """
+        (every library_id seen under this keyword, library_ids whose stored row
+        is younger than `max_age_hours` and can be reused). Only ids are read.
+        """
+        max_age_hours = AD_DETAIL_TTL_HOURS if max_age_hours is None else max_age_hours
+        cutoff = time.time() - max_age_hours * 3600
+        with self._db_lock:
+            rows = self.conn.execute(
+                "SELECT library_id, record IS NOT NULL AND fetched_at >= ? FROM ads WHERE keyword = ?",
+                (cutoff, keyword)
+            ).fetchall()
+        return {r[0] for r in rows}, {r[0] for r in rows if r[1]}
+
+    def records(self, keyword, library_ids) -> dict:
+        """library_id -> stored row, for just the given ids."""
+        library_ids = list(library_ids)
+        known = {}
+        for i in range(0, len(library_ids), 500):
+            chunk = library_ids[i:i + 500]
+            with self._db_lock:
+                rows = self.conn.execute(
+                    f"SELECT library_id, record FROM ads WHERE keyword = ? AND library_id IN ({','.join('?' * len(chunk))})",
+                    (keyword, *chunk)
+                ).fetchall()
+            for library_id, record in rows:
+                try:
+                    known[library_id] = json.loads(record) if record else {}
+                except ValueError:
+                    known[library_id] = {}
+        return known
+
+    def upsert(self, keyword, records, reused=()) -> set:
+        """
+        Record a crawl's rows; returns the library_ids seen for the first time.
+        Rows in `reused` came from the store unchanged, so only their last_seen
+        moves and they keep their original fetched_at.
+        """
+        now = time.time()
+        rows, seen = {}, []
+        for record in records:
+            library_id = record.get("library_id")
+            if not library_id:
+                continue
+            if library_id in reused:
+                seen.append(library_id)
+            else:
+                rows[library_id] = json.dumps(dict(record), ensure_ascii=False)
+        ids = list(rows) + seen
+        if not ids:
+            return set()
+
+        with self._db_lock:
+            existing = {
+                r[0] for r in self.conn.execute(
+                    f"SELECT library_id FROM ads WHERE keyword = ? AND library_id IN ({','.join('?' * len(ids))})",
+                    (keyword, *ids)
+                )
+            }
+            self.conn.executemany(
+                """
+                INSERT INTO ads (keyword, library_id, first_seen, last_seen, record, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(keyword, library_id)
+                DO UPDATE SET last_seen = excluded.last_seen, record = excluded.record,
+                              fetched_at = excluded.fetched_at
+                """,
+                [(keyword, library_id, now, now, record, now) for library_id, record in rows.items()]
+            )
+            self.conn.executemany(
+                "UPDATE ads SET last_seen = ? WHERE keyword = ? AND library_id = ?",
+                [(now, keyword, library_id) for library_id in seen]
+            )
+            self.conn.commit()
+        return set(ids) - existing
+
+    def media_fetched(self, keyword, col) -> set:
+        """library_ids whose `col` media was already downloaded for this keyword."""
+        if col not in MEDIA_COLUMNS:
+            return set()
+        with self._db_lock:
+            return {
+                r[0] for r in self.conn.execute(
+                    f"SELECT library_id FROM ads WHERE keyword = ? AND {col}_status = 'fetched'",
+                    (keyword,)
+                )
+            }
+
+    def mark_media(self, keyword, col, library_ids, status="fetched"):
+        if col not in MEDIA_COLUMNS or not library_ids:
+            return
+        with self._db_lock:
+            self.conn.executemany(
+                f"UPDATE ads SET {col}_status = ? WHERE keyword = ? AND library_id = ?",
+                [(status, keyword, library_id) for library_id in library_ids]
+            )
+            self.conn.commit()
+
+    def advertiser_yields(self, keyword) -> dict:
+        """advertiser query -> smoothed ads per run from earlier crawls."""
+        with self._db_lock:
+            return dict(self.conn.execute(
+                "SELECT advertiser, yield FROM advertiser_yield WHERE keyword = ?", (keyword,)
+            ).fetchall())
+
+    def record_yields(self, keyword, yields, alpha=0.5):
+        """Blend this run's ads per advertiser query into the stored yield (EWMA)."""
+        if not yields:
+            return
+        now = time.time()
+        with self._db_lock:
+            self.conn.executemany(
+                """
+                INSERT INTO advertiser_yield (keyword, advertiser, yield, runs, last_run)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(keyword, advertiser)
+                DO UPDATE SET yield = (1 - ?) * yield + ? * excluded.yield,
+                              runs = runs + 1, last_run = excluded.last_run
+                """,
+                [(keyword, page, float(n), now, alpha, alpha) for page, n in yields.items()]
+            )
+            self.conn.commit()
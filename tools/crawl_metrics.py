@@ -0,0 +1,145 @@
+"""
+Per-crawl telemetry: phase durations and counters, one JSON line per crawl.
+
+Records go to METRICS_PATH (rotated at METRICS_MAX_MB, METRICS_BACKUPS
+files kept) and are read back by the `/metrics` bot command:
+
+    {"ts", "keyword", "chat_id", "scheduled", "engine", "isolation", "outcome",
+     "seconds", "phases": {"driver_init": s, "initial_page": s, "dim_keyword": s,
+     "advertiser_loop": s, "store": s, "dataframe": s, ...},
+     "pages": n, "empty_pages": n, "error_pages": n, "timeouts": n,
+     "ads_extracted": n, "ads_deduped": n, "ads": n, "bytes": n,
+     "peak_rss_mb": x, "coverage": {...}, "timings": {...}}
+
+`bytes` is the transfer size the pages report through Resource Timing, so
+responses served from Chrome's disk cache count as zero.
+"""
+from lark_bot.config import METRICS_PATH, METRICS_MAX_MB, METRICS_BACKUPS
+
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = ("pages", "empty_pages", "error_pages", "timeouts", "ads_extracted", "ads_deduped", "bytes")
+
+
+class CrawlMetrics:
+    """Lap timer over a crawl's phases plus its counters."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+        self.peak_rss = 0
+        self._phase = None
+        self._phase_started = None
+        self._lock = threading.Lock()
+
+    def enter(self, phase):
+        """Close the running phase and start timing `phase` (None just closes)."""
+        now = time.perf_counter()
+        if self._phase:
+            self.phases[self._phase] = round(self.phases.get(self._phase, 0.0) + now - self._phase_started, 3)
+        self._phase, self._phase_started = phase, now
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] += n
+
+    def sample_rss(self, rss):
+        self.peak_rss = max(self.peak_rss, rss or 0)
+
+    def record(self, **fields):
+        self.enter(None)
+        record = {"ts": round(time.time(), 3), **fields,
+                  "seconds": round(time.time() - self.started, 3), "phases": dict(self.phases)}
+        record.update(self.counters)
+        record["peak_rss_mb"] = round(self.peak_rss / 1e6, 1)
+        return record
+
+
+class MetricsLog:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.path = METRICS_PATH
+                cls._instance.backups = METRICS_BACKUPS
+                os.makedirs(os.path.dirname(METRICS_PATH) or ".", exist_ok=True)
+                handler = RotatingFileHandler(METRICS_PATH, maxBytes=int(METRICS_MAX_MB * 1024 * 1024),
+                                              backupCount=METRICS_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                # Own logger so records stay out of bot.log and the root handlers
+                cls._instance._logger = logging.getLogger("crawl_metrics.records")
+                cls._instance._logger.propagate = False
+                cls._instance._logger.setLevel(logging.INFO)
+                cls._instance._logger.addHandler(handler)
+        return cls._instance
+
+    def write(self, record):
+        try:
+            self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.warning(f"Could not write crawl metrics: {e}")
+
+    def recent(self, n=50, keyword=None):
+        """Last `n` records (optionally for one keyword), oldest first, across rotated files."""
+        records = []
+        for path in [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in reversed(lines):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if keyword and record.get("keyword") != keyword:
+                    continue
+                records.append(record)
+                if len(records) >= n:
+                    return records[::-1]
+        return records[::-1]
+
+
+def _pct(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(records):
+    """Aggregate records for capacity planning (durations, per-phase means, volume)."""
+    if not records:
+        return {"crawls": 0}
+    seconds = [r.get("seconds", 0) for r in records]
+    phases = {}
+    for r in records:
+        for phase, s in (r.get("phases") or {}).items():
+            phases.setdefault(phase, []).append(s)
+    outcomes = {}
+    for r in records:
+        outcomes[r.get("outcome")] = outcomes.get(r.get("outcome"), 0) + 1
+    return {
+        "crawls": len(records),
+        "outcomes": outcomes,
+        "p50_seconds": round(_pct(seconds, 50), 1),
+        "p95_seconds": round(_pct(seconds, 95), 1),
+        "phase_mean_seconds": {p: round(statistics.mean(v), 1) for p, v in phases.items()},
+        "pages": sum(r.get("pages", 0) for r in records),
+        "empty_pages": sum(r.get("empty_pages", 0) for r in records),
+        "timeouts": sum(r.get("timeouts", 0) for r in records),
+        "ads": sum(r.get("ads", 0) for r in records),
+        "mb_downloaded": round(sum(r.get("bytes", 0) for r in records) / 1e6, 1),
+        "peak_rss_mb": max(r.get("peak_rss_mb", 0) for r in records),
+    }
@@ -0,0 +1,108 @@
+"""
+Time- and ad-budgeted ordering of a crawl's advertiser queries.
+
+Pages are visited highest historical yield (ads per query, from AdStore)
+first; pages without history get the median known yield so they are neither
+starved nor favoured. Failed loads are retried with exponential backoff.
+When the deadline or ad budget is hit the plan stops handing out pages and
+coverage() reports what was and was not reached.
+"""
+import heapq
+import logging
+import statistics
+import time
+
+logger = logging.getLogger(__name__)
+
+PAGE_ADS, PAGE_EMPTY, PAGE_ERROR = "ads", "empty", "error"
+
+
+class CrawlPlan:
+    def __init__(self, pages, yields=None, time_budget=None, max_ads=None,
+                 max_retries=2, backoff=2.0, started_at=None):
+        self.deadline = (started_at or time.time()) + time_budget if time_budget else None
+        self.max_ads = max_ads
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.ads = 0
+        self.retries = 0
+        self.stopped = None                 # "deadline" / "ad_budget" once a budget ran out
+        self.outcomes = {}                  # page -> final state
+        self.page_ads = {}                  # page -> ads found
+        self._attempts = {}
+
+        yields = yields or {}
+        prior = statistics.median(yields.values()) if yields else 0.0
+        # Stable sort keeps the advertiser list order among equal yields
+        self._ready = sorted(dict.fromkeys(pages), key=lambda p: -yields.get(p, prior))
+        self._ready.reverse()               # pop() from the end = highest yield
+        self.total = len(self._ready)
+        self._waiting = []                  # (retry_at, seq, page)
+        self._seq = 0
+
+    # --- budget ---
+    def _check_budget(self):
+        if self.stopped:
+            return True
+        if self.max_ads and self.ads >= self.max_ads:
+            self.stopped = "ad_budget"
+        elif self.deadline and time.time() >= self.deadline:
+            self.stopped = "deadline"
+        return bool(self.stopped)
+
+    @property
+    def done(self):
+        return len(self.outcomes)
+
+    def next(self, block=True):
+        """
+        Next page to load, or None when the plan is finished or out of budget.
+        With block=False, also returns None while only backed-off retries remain.
+        """
+        while not self._check_budget():
+            if self._ready:
+                return self._ready.pop()
+            if not self._waiting:
+                return None
+            retry_at, _, page = self._waiting[0]
+            wait = retry_at - time.time()
+            if wait <= 0:
+                heapq.heappop(self._waiting)
+                return page
+            if not block:
+                return None
+            if self.deadline:
+                wait = min(wait, max(0.0, self.deadline - time.time()))
+            time.sleep(wait)
+        return None
+
+    def record(self, page, state, ads_added=0):
+        """Report the outcome of loading `page`; failed loads are re-queued with backoff."""
+        self.ads += ads_added
+        self.page_ads[page] = self.page_ads.get(page, 0) + ads_added
+        attempts = self._attempts[page] = self._attempts.get(page, 0) + 1
+        if state == PAGE_ERROR and attempts <= self.max_retries:
+            self.retries += 1
+            self._seq += 1
+            heapq.heappush(self._waiting, (time.time() + self.backoff * 2 ** (attempts - 1), self._seq, page))
+            return
+        self.outcomes[page] = state
+
+    # --- results ---
+    def yields(self):
+        """Ads per query for pages that loaded (failures say nothing about yield)."""
+        return {page: self.page_ads.get(page, 0) for page, state in self.outcomes.items() if state != PAGE_ERROR}
+
+    def coverage(self):
+        states = list(self.outcomes.values())
+        # Pages still waiting for a retry when the budget ran out count as failed
+        failed = states.count(PAGE_ERROR) + len(self._waiting)
+        return {
+            PAGE_ADS: states.count(PAGE_ADS),
+            PAGE_EMPTY: states.count(PAGE_EMPTY),
+            PAGE_ERROR: failed,
+            "skipped": len(self._ready),
+            "pages": self.total,
+            "retries": self.retries,
+            "stopped": self.stopped,
+        }
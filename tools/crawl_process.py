@@ -0,0 +1,116 @@
+"""
+Child-process entry point for isolated crawls (CRAWLER_ISOLATION=process).
+
+FacebookAdsCrawler.crawl_isolated() starts `python -m tools.crawl_process`
+in its own session and reads JSON lines from an inherited pipe:
+
+    {"t": "card", "card": {...}}                          progress/queue card
+    {"t": "rows", "columns": [...], "rows": [[...], ...]}  new ads_data rows
+    {"t": "done", "page_stats": {...}, "coverage": {...},
+     "new_library_ids": [...], "browser_rss": n, "timings": {...},
+     "metrics": {...}}                                     crawl_metrics record
+
+Rows travel as column-name header + value lists to keep the pipe compact.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def encode_rows(records):
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    return {"t": "rows", "columns": columns, "rows": [[r.get(c) for c in columns] for r in records]}
+
+
+def decode_rows(message):
+    columns = message["columns"]
+    return [dict(zip(columns, row)) for row in message["rows"]]
+
+
+class _Channel:
+    def __init__(self, fd):
+        self._out = os.fdopen(fd, "w", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        line = json.dumps(message, ensure_ascii=False, default=str)
+        with self._lock:
+            self._out.write(line + "\n")
+
+    def card(self, card):
+        self.send({"t": "card", "card": card})
+
+
+class _RowBatcher:
+    """Stands in for the crawler's record stream: buffers rows, sends them as one table per flush."""
+
+    def __init__(self, channel, end_marker):
+        self.channel = channel
+        self.end_marker = end_marker
+        self._rows = []
+
+    def put(self, record):
+        if record is self.end_marker:
+            self.flush()
+            return
+        self._rows.append(record)
+
+    def flush(self):
+        rows, self._rows = self._rows, []
+        if rows:
+            self.channel.send(encode_rows(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one crawl and stream its results to the parent")
+    parser.add_argument("keyword")
+    parser.add_argument("--fd", type=int, required=True, help="Inherited pipe to write messages to")
+    parser.add_argument("--chat-id", default=None)
+    parser.add_argument("--scheduled", action="store_true")
+    parser.add_argument("--profile-slot", type=int, default=0, help="Persistent Chrome profile slot (queue worker id)")
+    args = parser.parse_args()
+
+    from tools.fb_scrape_bot import FacebookAdsCrawler, _STREAM_END
+    from tools.driver_pool import DriverPool
+    from tools.dim_store import AdvertiserDimStore
+
+    DriverPool().profile_slot_base = args.profile_slot
+    channel = _Channel(args.fd)
+    crawler = FacebookAdsCrawler(args.keyword, args.chat_id, scheduled=args.scheduled)
+    crawler.update_card = channel.card
+    crawler._stream = _RowBatcher(channel, _STREAM_END)
+    crawler.emit_metrics = False            # the parent writes the record
+
+    # Ship each page's rows as soon as they are added
+    add_records = crawler._add_records
+
+    def add_and_flush(records):
+        added = add_records(records)
+        crawler._stream.flush()
+        return added
+
+    crawler._add_records = add_and_flush
+
+    try:
+        crawler.crawl()
+        channel.send({
+            "t": "done",
+            "page_stats": crawler.page_stats,
+            "coverage": crawler.coverage,
+            "new_library_ids": sorted(crawler.new_library_ids),
+            "browser_rss": crawler.browser_rss,
+            "timings": crawler.timings,
+            "metrics": crawler.metrics_record,
+        })
+    finally:
+        # A stale advertiser list may be refreshing in the background; let it land
+        AdvertiserDimStore().wait_for_refreshes(timeout=120)
+        DriverPool().shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Dispatch order for waiting crawls: priority classes, then weighted fair
+queuing across chats.
+
+Interactive /search jobs always go before scheduled runs, which go before
+background refreshes. Within a class each chat gets a share of dispatches
+proportional to its weight (QUEUE_CHAT_WEIGHTS, default 1): a job's
+virtual finish tag is max(class clock, chat's last tag) + 1 / weight, and
+the smallest tag runs first (start-time fair queuing). A chat that enqueues
+15 domains therefore interleaves with other chats instead of going ahead of
+them. Iterating the queue yields the exact dispatch order, which is what
+queue cards show as positions.
+"""
+from lark_bot.config import QUEUE_CHAT_WEIGHTS
+
+import heapq
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, PRIORITY_BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_SCHEDULED: "scheduled",
+                  PRIORITY_BACKGROUND: "background"}
+
+
+def parse_chat_weights(spec):
+    """ "chat_a:3,chat_b:0.5" -> {"chat_a": 3.0, "chat_b": 0.5} (bad entries ignored)."""
+    weights = {}
+    for item in (spec or "").split(","):
+        chat_id, _, weight = item.strip().rpartition(":")
+        try:
+            if chat_id and float(weight) > 0:
+                weights[chat_id] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring queue weight {item!r}")
+    return weights
+
+
+class FairQueue:
+    """Not thread-safe; CrawlerQueue guards it with its condition lock."""
+
+    def __init__(self, weights=None):
+        self.weights = parse_chat_weights(QUEUE_CHAT_WEIGHTS) if weights is None else weights
+        self._heap = []                     # (priority, finish_tag, seq, crawler)
+        self._seq = itertools.count()
+        self._clock = {}                    # priority -> tag of the last dispatched job
+        self._last_tag = {}                 # (priority, chat_id) -> finish tag of its newest job
+        self._order = None                  # cached dispatch order, reset on change
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def __iter__(self):
+        if self._order is None:
+            self._order = [entry[-1] for entry in sorted(self._heap)]
+        return iter(self._order)
+
+    def push(self, crawler):
+        priority = getattr(crawler, "priority", PRIORITY_INTERACTIVE)
+        key = (priority, crawler.chat_id)
+        start = max(self._clock.get(priority, 0.0), self._last_tag.get(key, 0.0))
+        tag = start + 1.0 / self.weights.get(str(crawler.chat_id), 1.0)
+        self._last_tag[key] = tag
+        heapq.heappush(self._heap, (priority, tag, next(self._seq), crawler))
+        self._order = None
+
+    def pop(self, max_priority=None):
+        """
+        Next crawler in dispatch order, or None. With `max_priority`, only a job
+        of that class or a more urgent one is taken (reserved workers).
+        """
+        if not self._heap or (max_priority is not None and self._heap[0][0] > max_priority):
+            return None
+        priority, tag, _, crawler = heapq.heappop(self._heap)
+        self._clock[priority] = max(self._clock.get(priority, 0.0), tag - 1.0 / self.weights.get(str(crawler.chat_id), 1.0))
+        self._order = None
+        if not self._heap:
+            # Idle again: forget history so an old backlog does not bias new arrivals
+            self._clock.clear()
+            self._last_tag.clear()
+        return crawler
@@ -0,0 +1,156 @@
+"""
+Advertiser dimension store (ref_data/dim_keyword_<keyword>.csv).
+
+Each keyword's advertiser list has a fetch time and TTL. Fresh lists are
+served as-is; stale ones are served immediately while a background refresh
+re-scrapes them, so searches rarely pay for the filter scrape and never stay
+stale for good. IDs are kept as exact strings and files are replaced
+atomically.
+"""
+from lark_bot.config import DIM_TTL_HOURS
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DIM_DIR = "ref_data"
+DIM_META_FILE = os.path.join(DIM_DIR, "dim_meta.json")
+DIM_COLUMNS = ["id", "name", "keyword"]
+
+# IDs that went through a spreadsheet come back as e.g. "7.13491E+14"
+_LOSSY_ID_RE = re.compile(r"^\d+(\.\d+)?[eE][+-]?\d+$")
+
+
+class AdvertiserDimStore:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.default_ttl = DIM_TTL_HOURS * 3600
+                cls._instance._meta_lock = threading.RLock()
+                cls._instance._refreshing = set()
+                cls._instance.meta = cls._instance._load_meta()
+        return cls._instance
+
+    # --- persistence helpers ---
+    def _csv_path(self, keyword):
+        return os.path.join(DIM_DIR, f"dim_keyword_{keyword}.csv")
+
+    def _load_meta(self):
+        if not os.path.exists(DIM_META_FILE):
+            return {}
+        try:
+            with open(DIM_META_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_meta(self):
+        os.makedirs(DIM_DIR, exist_ok=True)
+        tmp = DIM_META_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, DIM_META_FILE)
+
+    def read(self, keyword):
+        path = self._csv_path(keyword)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_csv(path, dtype=str)
+        except Exception as e:
+            logger.warning(f"Unreadable dim file {path}: {e}")
+            return None
+
+    def write(self, keyword, df, ttl=None):
+        """Atomically replace a keyword's advertiser list and stamp its fetch time."""
+        path = self._csv_path(keyword)
+        os.makedirs(DIM_DIR, exist_ok=True)
+        df = df[[c for c in DIM_COLUMNS if c in df.columns]]
+        tmp = path + ".tmp"
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+        with self._meta_lock:
+            entry = self.meta.setdefault(keyword, {})
+            entry["fetched_at"] = time.time()
+            entry["ttl"] = ttl if ttl is not None else entry.get("ttl", self.default_ttl)
+            self._save_meta()
+
+    # --- freshness ---
+    def has_lossy_ids(self, df):
+        return bool(df["id"].astype(str).str.match(_LOSSY_ID_RE).any()) if "id" in df else False
+
+    def is_stale(self, keyword, df):
+        if self.has_lossy_ids(df):
+            return True
+        with self._meta_lock:
+            entry = self.meta.get(keyword, {})
+        fetched_at = entry.get("fetched_at")
+        if fetched_at is None:
+            # Files written before the store existed: fall back to mtime
+            try:
+                fetched_at = os.path.getmtime(self._csv_path(keyword))
+            except OSError:
+                return True
+        return time.time() - fetched_at >= entry.get("ttl", self.default_ttl)
+
+    # --- lookup ---
+    def get(self, keyword, scrape, refresh=None):
+        """
+        Return the advertiser list for `keyword`.
+
+        `scrape()` runs synchronously (with the caller's browser) only when
+        nothing usable is cached. When the cached list is stale it is returned
+        as-is and `refresh(keyword)` is started in the background.
+        """
+        df = self.read(keyword)
+        if df is not None and not df.empty:
+            if self.is_stale(keyword, df) and refresh is not None:
+                self.refresh_async(keyword, refresh)
+            return df
+
+        df = scrape()
+        if df is not None and not df.empty:
+            self.write(keyword, df)
+        return df
+
+    def refresh_async(self, keyword, refresh):
+        with self._meta_lock:
+            if keyword in self._refreshing:
+                return
+            self._refreshing.add(keyword)
+
+        def _run():
+            try:
+                df = refresh(keyword)
+                if df is not None and not df.empty:
+                    self.write(keyword, df)
+                    logger.info(f"Refreshed advertiser list for {keyword} ({len(df)} rows)")
+            except Exception as e:
+                logger.error(f"Background dim refresh failed for {keyword}: {e}")
+            finally:
+                with self._meta_lock:
+                    self._refreshing.discard(keyword)
+
+        threading.Thread(target=_run, name=f"dim-refresh-{keyword}", daemon=True).start()
+
+    def wait_for_refreshes(self, timeout=None):
+        """Block until background refreshes finish (or `timeout` seconds pass)."""
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            with self._meta_lock:
+                if not self._refreshing:
+                    return True
+            if deadline and time.time() >= deadline:
+                return False
+            time.sleep(0.5)
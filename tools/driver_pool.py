@@ -0,0 +1,427 @@
+"""
+Warm pool of stealthed headless Chrome drivers shared across crawls.
+Crawlers lease a driver, use it, and hand it back wiped of storage and of
+every cookie outside Facebook's own domains.
+
+With CHROME_PROFILE_DIR set, each pool slot launches Chrome on its own
+persistent profile (<dir>/slot<n>), so the HTTP disk cache survives driver
+recycling; profiles older than CHROME_PROFILE_MAX_AGE_HOURS are reset.
+"""
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium_stealth import stealth
+
+from lark_bot.config import (DRIVER_POOL_SIZE, DRIVER_MAX_USES, DRIVER_MAX_AGE, CRAWLER_ENGINE,
+                             BLOCK_PROFILE, PAGE_LOAD_STRATEGY, CHROME_PROFILE_DIR,
+                             CHROME_DISK_CACHE_MB, CHROME_PROFILE_MAX_AGE_HOURS)
+from .network_capture import enable_performance_logging, ZERO_RESULTS_PATTERN
+from .proc_utils import process_alive
+
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Origins whose local/session storage is wiped when a driver comes back
+_WIPE_ORIGINS = ["https://www.facebook.com", "https://facebook.com"]
+# Cookies kept across leases: consent and browser-id (datr) cookies are the
+# session state a persistent slot profile exists to keep; dropping them makes
+# every crawl look like a new visitor and brings back the consent dialog.
+# They go with the profile after CHROME_PROFILE_MAX_AGE_HOURS or a recycle.
+_KEEP_COOKIE_DOMAINS = ("facebook.com",)
+
+# URL patterns blocked per profile. The crawler only reads img/video src
+# attributes, so the creatives themselves never need to be downloaded.
+# Network.setBlockedURLs globs over the whole URL, query included, so every
+# pattern starts with a literal scheme + host: a search for "shop.gifts.com"
+# puts that domain in the page URL and must never match.
+_MEDIA_PATTERNS = [
+    # Creative images, videos and avatars (scontent-*.xx.fbcdn.net, video-*.xx.fbcdn.net, ...)
+    "https://scontent*", "https://video*", "https://external*",
+    # Icons, sprites and fonts next to the JS/CSS bundles on the static host
+    "https://static.xx.fbcdn.net/*.png*", "https://static.xx.fbcdn.net/*.gif*",
+    "https://static.xx.fbcdn.net/*.ico*", "https://static.xx.fbcdn.net/*.woff*",
+    "https://static.xx.fbcdn.net/*.ttf*", "https://static.xx.fbcdn.net/*.otf*",
+]
+_TRACKING_PATTERNS = [
+    "https://www.facebook.com/tr?*", "https://www.facebook.com/tr/*",
+    "https://www.facebook.com/ajax/bz*", "https://www.facebook.com/ajax/bnzai*",
+    "https://connect.facebook.net/*", "https://www.google-analytics.com/*",
+    "https://www.googletagmanager.com/*", "https://stats.g.doubleclick.net/*",
+    "https://googleads.g.doubleclick.net/*",
+]
+BLOCK_PROFILES = {
+    "none": [],
+    "media": _MEDIA_PATTERNS,
+    "strict": _MEDIA_PATTERNS + _TRACKING_PATTERNS,
+}
+
+
+def apply_stealth(driver):
+    """
+    Hide automation markers (navigator.webdriver, HeadlessChrome user agent) in
+    the driver's current tab. The CDP overrides behind it are per tab, so every
+    tab a crawl opens needs its own call.
+    """
+    stealth(driver,
+            languages=["en-US", "en"],
+            vendor="Google Inc.",
+            platform="Win32",
+            webgl_vendor="Intel Inc.",
+            renderer="Intel Iris OpenGL Engine",
+            fix_hairline=True)
+
+
+def apply_block_profile(driver, profile=None):
+    """Block the profile's URL patterns in the driver's current tab via CDP."""
+    patterns = BLOCK_PROFILES.get(profile or BLOCK_PROFILE, [])
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        logger.warning(f"Could not apply block profile '{profile or BLOCK_PROFILE}': {e}")
+
+
+# Flags window.__fbxNoResults once a GraphQL/async response reports a results
+# connection with zero hits, so the crawler can tell "nothing to show" from
+# "still rendering", and enlarges the Resource Timing buffer the crawler reads
+# transfer sizes from
+_REQUEST_TRACKER_JS = """
+(() => {
+  if (performance.setResourceTimingBufferSize) performance.setResourceTimingBufferSize(2000);
+  const zero = new RegExp(__ZERO_RESULTS__);
+  const check = (url, text) => {
+    if (/\\/api\\/graphql|\\/ads\\/library\\/async\\//.test(url || '') && zero.test(text || ''))
+      window.__fbxNoResults = true;
+  };
+  const fetch0 = window.fetch;
+  if (fetch0) window.fetch = function () {
+    return fetch0.apply(this, arguments).then(r => {
+      r.clone().text().then(t => check(r.url, t), () => {});
+      return r;
+    });
+  };
+  const send0 = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    this.addEventListener('loadend', () => {
+      try { check(this.responseURL, this.responseText); } catch (e) {}
+    }, {once: true});
+    return send0.apply(this, arguments);
+  };
+})();
+""".replace("__ZERO_RESULTS__", json.dumps(ZERO_RESULTS_PATTERN))
+
+
+def install_request_tracker(driver):
+    """Inject the zero-results watcher into every document the current tab loads."""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _REQUEST_TRACKER_JS})
+    except Exception as e:
+        logger.warning(f"Could not install request tracker: {e}")
+
+
+# Written when a slot profile is created; its mtime dates the profile
+_PROFILE_MARKER = ".fbx_profile"
+PROFILE_OFF, PROFILE_COLD, PROFILE_WARM = "off", "cold", "warm"
+
+
+def _profile_in_use(path):
+    """Chrome's SingletonLock points at "<host>-<pid>" of the browser holding the profile."""
+    try:
+        target = os.readlink(os.path.join(path, "SingletonLock"))
+    except OSError:
+        return False
+    host, _, pid = target.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    return process_alive(int(pid))
+
+
+def prepare_profile_dir(slot, root=None, max_age_hours=None):
+    """
+    Directory for a slot's persistent profile and whether it holds a usable cache.
+    Returns (None, PROFILE_OFF) when persistent profiles are disabled or the
+    slot's profile is still held by another Chrome (e.g. a crawl process
+    finishing a background refresh); that launch gets a throwaway profile.
+    """
+    root = CHROME_PROFILE_DIR if root is None else root
+    if not root:
+        return None, PROFILE_OFF
+    max_age_hours = CHROME_PROFILE_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    path = os.path.abspath(os.path.join(root, f"slot{slot}"))
+    if _profile_in_use(path):
+        logger.info(f"Chrome profile {path} is in use, launching with a throwaway profile")
+        return None, PROFILE_OFF
+    marker = os.path.join(path, _PROFILE_MARKER)
+    if os.path.exists(marker):
+        age = time.time() - os.path.getmtime(marker)
+        if not max_age_hours or age < max_age_hours * 3600:
+            return path, PROFILE_WARM
+        logger.info(f"Resetting Chrome profile {path} ({age / 3600:.1f}h old)")
+    reset_profile_dir(path)
+    return path, PROFILE_COLD
+
+
+def reset_profile_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, _PROFILE_MARKER), "w") as f:
+        f.write(str(time.time()))
+
+
+def build_chrome_driver(block_profile=None, page_load_strategy=None, performance_log=None, user_data_dir=None):
+    """Launch a headless Chrome tuned for the mini server and apply stealth."""
+    options = Options()
+    options.page_load_strategy = page_load_strategy or PAGE_LOAD_STRATEGY
+    # Optimization flags for mini server
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-infobars")
+    options.add_argument("--mute-audio")
+
+    # Memory savers
+    options.add_argument("--renderer-process-limit=2")
+    options.add_argument("--window-size=1024,768")
+
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+        options.add_argument(f"--disk-cache-size={CHROME_DISK_CACHE_MB * 1024 * 1024}")
+
+    if performance_log if performance_log is not None else CRAWLER_ENGINE == "network":
+        enable_performance_logging(options)
+
+    driver = webdriver.Chrome(service=Service(), options=options)
+    apply_stealth(driver)
+    apply_block_profile(driver, block_profile)
+    install_request_tracker(driver)
+    return driver
+
+
+class _PoolEntry:
+    __slots__ = ("driver", "slot", "created_at", "uses", "profile", "startup_seconds")
+
+    def __init__(self, driver, slot, profile=PROFILE_OFF, startup_seconds=0.0):
+        self.driver = driver
+        self.slot = slot
+        self.created_at = time.time()
+        self.uses = 0
+        self.profile = profile              # profile cache state when the driver launched
+        self.startup_seconds = startup_seconds
+
+
+class DriverPool:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.size = max(1, DRIVER_POOL_SIZE)
+                cls._instance.max_uses = DRIVER_MAX_USES
+                cls._instance.max_age = DRIVER_MAX_AGE
+                cls._instance._cond = threading.Condition()
+                cls._instance._idle = []
+                cls._instance._leased = {}
+                cls._instance._free_slots = set(range(cls._instance.size))
+                # Offset for profile directories, so isolated crawl processes
+                # (one pool each) do not share a profile
+                cls._instance.profile_slot_base = 0
+        return cls._instance
+
+    def _launch(self, slot):
+        """Start a driver for `slot`, on the slot's persistent profile when enabled."""
+        started = time.perf_counter()
+        path, profile = prepare_profile_dir(self.profile_slot_base + slot)
+        try:
+            driver = build_chrome_driver(user_data_dir=path)
+        except Exception as e:
+            if not path:
+                raise
+            # A crawl killed mid-write can leave a profile Chrome refuses to open
+            logger.warning(f"Chrome failed on profile {path}, starting it fresh: {e}")
+            reset_profile_dir(path)
+            profile = PROFILE_COLD
+            driver = build_chrome_driver(user_data_dir=path)
+        return _PoolEntry(driver, slot, profile, time.perf_counter() - started)
+
+    def _is_expired(self, entry):
+        if self.max_uses and entry.uses >= self.max_uses:
+            return True
+        return bool(self.max_age) and time.time() - entry.created_at >= self.max_age
+
+    def _is_healthy(self, entry):
+        try:
+            return entry.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _quit(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+
+    def _drop(self, entry):
+        """Quit a driver and give its slot back (caller must not hold _cond)."""
+        self._quit(entry)
+        with self._cond:
+            self._free_slots.add(entry.slot)
+            self._cond.notify()
+
+    def lease(self, timeout=None, should_stop=None):
+        """
+        Borrow a ready driver, launching one if the pool has a free slot.
+
+        Blocks while every slot is leased. Returns None on timeout, when
+        `should_stop()` turns true, or when Chrome fails to start.
+        """
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            entry, slot = None, None
+            with self._cond:
+                while entry is None and slot is None:
+                    if self._idle:
+                        entry = self._idle.pop()
+                    elif self._free_slots:
+                        slot = min(self._free_slots)
+                        self._free_slots.discard(slot)
+                    else:
+                        if should_stop and should_stop():
+                            return None
+                        if deadline and time.time() >= deadline:
+                            return None
+                        self._cond.wait(0.5)
+
+            if entry is not None:
+                # Idle drivers can die or age out while parked; replace them
+                if self._is_expired(entry) or not self._is_healthy(entry):
+                    logger.info(f"Recycling pooled driver in slot {entry.slot}")
+                    self._drop(entry)
+                    continue
+            else:
+                try:
+                    entry = self._launch(slot)
+                except Exception as e:
+                    logger.error(f"Driver initialization failed: {e}")
+                    with self._cond:
+                        self._free_slots.add(slot)
+                        self._cond.notify()
+                    return None
+
+            with self._cond:
+                self._leased[id(entry.driver)] = entry
+            return entry.driver
+
+    def lease_info(self, driver):
+        """Profile cache state and launch time of a leased driver (for crawl timings)."""
+        with self._cond:
+            entry = self._leased.get(id(driver))
+        if entry is None:
+            return {"profile": PROFILE_OFF, "driver_start_s": 0.0}
+        # A relaunched driver's start cost is paid by the crawl that gets it first
+        info = {"profile": entry.profile, "driver_start_s": round(entry.startup_seconds, 2) if entry.uses == 0 else 0.0}
+        if entry.profile == PROFILE_COLD and entry.uses:
+            info["profile"] = PROFILE_WARM
+        return info
+
+    def _wipe(self, driver):
+        for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", []):
+            domain = cookie["domain"].lstrip(".")
+            if any(domain == keep or domain.endswith("." + keep) for keep in _KEEP_COOKIE_DOMAINS):
+                continue
+            driver.execute_cdp_cmd("Network.deleteCookies", {
+                "name": cookie["name"], "domain": cookie["domain"], "path": cookie.get("path", "/"),
+            })
+        for origin in _WIPE_ORIGINS:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                "origin": origin,
+                "storageTypes": "local_storage,session_storage,indexeddb,websql,service_workers,cache_storage",
+            })
+        driver.get("about:blank")
+
+    def release(self, driver):
+        """Return a leased driver; it is wiped, or recycled if past its limits."""
+        with self._cond:
+            entry = self._leased.pop(id(driver), None)
+        if entry is None:
+            return
+
+        entry.uses += 1
+        if self._is_expired(entry):
+            self._drop(entry)
+            return
+        try:
+            self._wipe(driver)
+        except Exception as e:
+            logger.warning(f"Driver reset failed, recycling slot {entry.slot}: {e}")
+            self._drop(entry)
+            return
+
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def discard(self, driver):
+        """Quit a leased driver without returning it (cancel / broken session)."""
+        with self._cond:
+            entry = self._leased.pop(id(driver), None)
+        if entry is None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            return
+        self._drop(entry)
+
+    def warm(self):
+        """Pre-launch drivers for every free slot so the first crawls skip startup."""
+        started = 0
+        while True:
+            with self._cond:
+                if not self._free_slots:
+                    break
+                slot = min(self._free_slots)
+                self._free_slots.discard(slot)
+            try:
+                entry = self._launch(slot)
+            except Exception as e:
+                logger.error(f"Driver pre-warm failed: {e}")
+                with self._cond:
+                    self._free_slots.add(slot)
+                    self._cond.notify()
+                break
+            entry.startup_seconds = 0.0     # launched ahead of any crawl
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+            started += 1
+        logger.info(f"Driver pool warmed: {started} new driver(s)")
+
+    def shutdown(self):
+        with self._cond:
+            entries = self._idle + list(self._leased.values())
+            self._idle = []
+            self._leased = {}
+            self._free_slots = set(range(self.size))
+        for entry in entries:
+            self._quit(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+            }
@@ -1,28 +1,54 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from selenium_stealth import stealth
 
 from lark_bot import LarkAPI
 from lark_bot.state_managers import state_manager
+from lark_bot.config import (CRAWLER_WORKERS, CRAWL_ETA_DEFAULT, QUEUE_INTERACTIVE_WORKERS, QUEUE_NOTIFY_INTERVAL,
+                             CRAWLER_ENGINE, PAGINATE_SCROLL,
+                             PAGINATE_MAX_ADS, PAGINATE_TIME_BUDGET, PAGINATE_IDLE_ROUNDS, CRAWLER_TABS,
+                             CRAWL_TIME_BUDGET_INTERACTIVE, CRAWL_TIME_BUDGET_SCHEDULED,
+                             CRAWL_MAX_ADS_INTERACTIVE, CRAWL_MAX_ADS_SCHEDULED, CRAWL_PAGE_RETRIES,
+                             CRAWL_RETRY_BACKOFF, CRAWLER_ISOLATION, CRAWL_MAX_RSS_MB, CRAWL_MAX_CPU_SECONDS,
+                             CRAWL_WALL_GRACE, HTTP_FAST_PATH)
 from .interactive_card_library import *
+from .driver_pool import DriverPool, apply_stealth, apply_block_profile, install_request_tracker
+from .dim_store import AdvertiserDimStore
+from .ad_store import AdStore
+from .proc_utils import driver_rss, process_tree_pids, process_tree_rss, process_tree_cpu_seconds
+from .network_capture import PayloadCapture, parse_ads_html, ZERO_RESULTS_PATTERN
+from .crawl_planner import CrawlPlan, PAGE_ADS, PAGE_EMPTY, PAGE_ERROR
+from .http_fetch import AdsLibraryHttpClient
+from .crawl_metrics import CrawlMetrics, MetricsLog
+from .ad_record import AdRecord, records_to_frame
+from .ad_buffer import AdBuffer
+from .crawl_scheduler import (FairQueue, PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, PRIORITY_BACKGROUND,
+                              PRIORITY_NAMES)
+from .job_store import JobStore
 
+import json
 import logging
-import re
+import os
+import signal
+import subprocess
+import sys
+import numpy as np
 import pandas as pd
 import time
 import threading
+import heapq
 import queue
-import os
+from collections import deque
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Marks the end of a crawler's record stream
+_STREAM_END = object()
+
+
 class CrawlerQueue:
     _instance = None
     _lock = threading.Lock()
@@ -31,70 +57,158 @@ class CrawlerQueue:
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super().__new__(cls)
-                cls._instance.queue = queue.Queue()
-                cls._instance.active = False
-                cls._instance.current_chat_id = None
-                cls._instance.queue_list = [] 
-        return cls._instance
-    
-    def add_request(self, crawler):
-        with self._lock:
-            self.queue.put(crawler)
-            self.queue_list.append(crawler.chat_id)
-            
-            position = len(self.queue_list)
-            # Only send queue update if there is already an active process
-            if self.active:
-                try:
-                    crawler.lark_api.update_card_message(crawler.message_id, 
-                                            card=queue_card(search_word=crawler.keyword,
-                                            position=position))
-                except:
-                    pass
-        
-        if not self.active:
-            self._process_next()
-
-    def _process_next(self):
-        with self._lock:
-            if not self.queue.empty():
-                self.active = True
-                next_crawler = self.queue.get()
-                self.current_chat_id = next_crawler.chat_id
-                
-                if next_crawler.chat_id in self.queue_list:
-                    self.queue_list.remove(next_crawler.chat_id)
-                
-                self._update_queue_positions()
-                
+                cls._instance.queue = FairQueue()   # iterates in dispatch order
+                cls._instance.running = {}          # worker_id -> crawler
+                cls._instance.num_workers = max(1, CRAWLER_WORKERS)
+                # Workers [0, n) skip scheduled/background jobs; at least one worker takes everything
+                cls._instance.interactive_workers = max(0, min(QUEUE_INTERACTIVE_WORKERS,
+                                                               cls._instance.num_workers - 1))
+                cls._instance.avg_duration = float(CRAWL_ETA_DEFAULT)
+                cls._instance._cond = threading.Condition(cls._lock)
+                # Set whenever queue order changes; the notifier refreshes queue cards off the lock
+                cls._instance._positions_dirty = threading.Event()
+                cls._instance.worker_stats = {
+                    i: {"jobs": 0, "failed": 0, "busy_seconds": 0.0, "cpu_seconds": 0.0,
+                        "browser_rss_mb": 0.0, "first_load_s": None, "profile": None,
+                        "keyword": None, "started_at": None}
+                    for i in range(cls._instance.num_workers)
+                }
+                for i in range(cls._instance.num_workers):
+                    threading.Thread(
+                        target=cls._instance._worker_loop,
+                        args=(i,),
+                        name=f"crawler-worker-{i}",
+                        daemon=True
+                    ).start()
                 threading.Thread(
-                    target=self._run_crawler, 
-                    args=(next_crawler,),
+                    target=cls._instance._notifier_loop,
+                    name="crawler-queue-notifier",
                     daemon=True
                 ).start()
-            else:
-                self.active = False
-                self.current_chat_id = None
+        return cls._instance
     
-    def _update_queue_positions(self):
-        # Notify others in queue about their new position
-        for i, chat_id in enumerate(self.queue_list, 1):
-            temp_queue = list(self.queue.queue)
-            for crawler in temp_queue:
-                if crawler.chat_id == chat_id:
-                    try:
-                        crawler.lark_api.update_card_message(crawler.message_id, 
-                            card=queue_card(search_word=crawler.keyword, position=i))
-                    except:
-                        pass
-                    break
+    def add_request(self, crawler):
+        """
+        Queue `crawler`; returns the place of an identical waiting request (same
+        chat, keyword and priority class) instead, in which case nothing is queued.
+        A request of another class is always queued, so an interactive search
+        never waits behind a scheduled run of the same keyword.
+        """
+        with self._cond:
+            for position, queued in enumerate(self.queue, 1):
+                if (queued.chat_id == crawler.chat_id and queued.keyword == crawler.keyword
+                        and queued.priority == crawler.priority):
+                    return position
+            self.queue.push(crawler)
+            # Reserved workers may pass on this job, so wake every idle worker
+            self._cond.notify_all()
+        # Queue cards are sent by the notifier, never while holding the lock
+        self._positions_dirty.set()
+        return None
+
+    def _estimate_starts(self):
+        """Seconds until each waiting job starts, assuming average crawl duration."""
+        now = time.time()
+        free_at = []
+        for worker_id in range(self.num_workers):
+            started = self.worker_stats[worker_id]["started_at"]
+            if worker_id in self.running and started:
+                free_at.append(max(0.0, self.avg_duration - (now - started)))
+            else:
+                free_at.append(0.0)
+        heapq.heapify(free_at)
+
+        starts = []
+        for _ in self.queue:
+            start = heapq.heappop(free_at)
+            starts.append(start)
+            heapq.heappush(free_at, start + self.avg_duration)
+        return starts
+
+    def _worker_loop(self, worker_id):
+        stats = self.worker_stats[worker_id]
+        while True:
+            max_priority = PRIORITY_INTERACTIVE if worker_id < self.interactive_workers else None
+            with self._cond:
+                while (crawler := self.queue.pop(max_priority)) is None:
+                    self._cond.wait()
+                crawler.worker_id = worker_id
+                self.running[worker_id] = crawler
+                stats["keyword"] = crawler.keyword
+                stats["started_at"] = time.time()
+            self._positions_dirty.set()
+            if crawler.job_id is not None:
+                try:
+                    JobStore().mark_running(crawler.job_id)
+                except Exception as e:
+                    logger.warning(f"Could not mark job {crawler.job_id} running: {e}")
+
+            started, cpu_started = time.time(), time.thread_time()
+            ok = self._run_crawler(crawler)
+            elapsed = time.time() - started
+
+            with self._cond:
+                self.running.pop(worker_id, None)
+                stats["jobs"] += 1
+                stats["failed"] += 0 if ok else 1
+                stats["busy_seconds"] += elapsed
+                stats["cpu_seconds"] += time.thread_time() - cpu_started
+                stats["browser_rss_mb"] = round(getattr(crawler, "browser_rss", 0) / 1e6, 1)
+                if "first_load_s" in crawler.timings:
+                    stats["first_load_s"] = crawler.timings["first_load_s"]
+                    stats["profile"] = crawler.timings.get("profile")
+                stats["keyword"] = None
+                stats["started_at"] = None
+                # Cancelled crawls end early and background refreshes are short;
+                # both would skew the ETA downward
+                if ok and not crawler.should_stop() and crawler.priority != PRIORITY_BACKGROUND:
+                    self.avg_duration = 0.7 * self.avg_duration + 0.3 * elapsed
+            timings = crawler.timings
+            first_load = (f", first load {timings['first_load_s']}s on {timings.get('profile')} profile"
+                          f" + {timings.get('driver_start_s', 0)}s driver start") if "first_load_s" in timings else ""
+            logger.info(f"[worker {worker_id}] {crawler.keyword} finished in {elapsed:.1f}s "
+                        f"(chrome rss {stats['browser_rss_mb']} MB{first_load})")
     
+    def _notifier_loop(self):
+        shown = {}      # crawler -> position last shown on its queue card
+        while True:
+            self._positions_dirty.wait()
+            # Let a burst of enqueues/dispatches settle into one batch of updates
+            time.sleep(QUEUE_NOTIFY_INTERVAL)
+            self._positions_dirty.clear()
+            with self._cond:
+                waiting = list(self.queue)
+                starts = self._estimate_starts()
+
+            positions = {}
+            for i, (crawler, eta) in enumerate(zip(waiting, starts), 1):
+                positions[crawler] = i
+                # Unchanged positions are not re-sent; a crawl already picked up by a
+                # worker keeps its progress card, and background jobs have no card
+                if shown.get(crawler) == i or crawler.worker_id is not None or not crawler.message_id:
+                    continue
+                try:
+                    # A worker may pick the job up meanwhile; once it has, its progress card wins
+                    crawler.update_card(queue_card(search_word=crawler.keyword, position=i, eta_seconds=eta),
+                                        only_if=lambda c=crawler: self._still_queued(c))
+                except Exception as e:
+                    logger.warning(f"Queue card update failed for {crawler.keyword}: {e}")
+            shown = positions
+
+    def _still_queued(self, crawler):
+        with self._cond:
+            return crawler.worker_id is None
+
     def _run_crawler(self, crawler):
         try:
-            crawler.crawl()
+            if crawler.isolation == "process":
+                crawler.crawl_isolated()
+            else:
+                crawler.crawl()
+            return True
         except Exception as e:
             logger.error(f"Queue execution error: {e}")
-            if not crawler.should_stop():
+            if not crawler.should_stop() and crawler.message_id:
                 try:
                     crawler.lark_api.reply_to_message(
                         crawler.message_id, 
@@ -102,41 +216,189 @@ class CrawlerQueue:
                     )
                 except:
                     pass
-        finally:
-            with self._lock:
-                self.active = False
-                self.current_chat_id = None
-            self._process_next()
-    
-    def get_queue_position(self, chat_id):
-        with self._lock:
-            if self.current_chat_id == chat_id:
+            return False
+
+    def get_job_position(self, crawler):
+        """0 while running, 1-based place while waiting, None once finished."""
+        with self._cond:
+            if any(c is crawler for c in self.running.values()):
                 return 0
-            try:
-                return self.queue_list.index(chat_id) + 1
-            except ValueError:
-                return None
+            for i, queued in enumerate(self.queue, 1):
+                if queued is crawler:
+                    return i
+            return None
+    
+    def get_stats(self):
+        with self._cond:
+            return {
+                "workers": self.num_workers,
+                "running": len(self.running),
+                "waiting": len(self.queue),
+                "waiting_by_class": {name: sum(c.priority == p for c in self.queue)
+                                     for p, name in PRIORITY_NAMES.items()},
+                "interactive_workers": self.interactive_workers,
+                "avg_duration": round(self.avg_duration, 1),
+                "per_worker": {i: dict(s) for i, s in self.worker_stats.items()},
+            }
 
 class FacebookAdsCrawler:
-    _LIBRARY_ID_PATTERN = re.compile(r'Library ID:\s*(\d+)')
-    _DATE_PATTERN = re.compile(r'\b\d{1,2}\s\w{3}\s\d{4}\b')
+    # Columns of the cleaned report, in order (see data_to_dataframe / iter_clean_rows)
+    EXPORT_COLUMNS = ["library_id", "ad_status", "ad_start_date", "company", "pixel_id", "destination_url", 
+                      "ad_type", "ad_url", "thumbnail_url", "primary_text", "headline_text"]
+    # Overridden per instance to point crawls at a local replay server (benchmarks/replay.py)
+    ads_library_url = "https://www.facebook.com/ads/library/"
+    AD_CARD_CLASS = "x1plvlek xryxfnj x1gzqxud x178xt8z x1lun4ml xso031l xpilrb4 xb9moi8 xe76qn7 x21b0me x142aazg x1i5p2am x1whfx0g xr2y4jy x1ihp6rs x1kmqopl x13fuv20 x18b5jzi x1q0q8m5 x1t7ytsu x9f619"
+
+    # Polled while a search page loads: "ads" once a card exists, "empty" only on
+    # the Ads Library's no-results message or a results payload with zero hits
+    # (a GraphQL/async response seen by install_request_tracker, or the
+    # server-rendered JSON), "error" on login/checkpoint walls, otherwise null,
+    # so a slow render keeps waiting for cards until the timeout
+    _PAGE_STATE_JS = """
+        const sel=arguments[0];
+        if(window.__fbxNav)return null;
+        if(document.querySelector(sel))return 'ads';
+        if(/\\/(login|checkpoint)\\b/.test(location.pathname))return 'error';
+        const txt=document.body?document.body.innerText:'';
+        if(/No ads match|(^|\\s)~?0 results/i.test(txt))return 'empty';
+        if(window.__fbxNoResults)return 'empty';
+        if(document.readyState==='loading')return null;
+        if(window.__fbxSsrEmpty===undefined){
+            const zero=new RegExp(arguments[1]);
+            window.__fbxSsrEmpty=Array.from(document.querySelectorAll('script[type="application/json"]'))
+                .some(s=>zero.test(s.textContent));
+        }
+        return window.__fbxSsrEmpty?'empty':null;
+    """
 
-    def __init__(self, keyword, chat_id, message_id=False):
+    # Bytes the current document and its subresources came over the wire with
+    # (cache hits and cross-origin entries without Timing-Allow-Origin report 0)
+    _TRANSFER_BYTES_JS = "return performance.getEntries().reduce((n, e) => n + (e.transferSize || 0), 0);"
+
+    # Async: scrolls the advertiser listbox, gathering [id, name] of every option until
+    # no new option or DOM mutation has been seen for quiet_ms (or max_ms elapses)
+    _COLLECT_ADVERTISERS_JS = """
+        const [maxMs,quietMs,done]=arguments;
+        const box=document.querySelector("div[role='listbox']");
+        if(!box){done([]);return;}
+        const seen=new Map();const started=Date.now();let last=Date.now();
+        const obs=new MutationObserver(()=>{last=Date.now()});
+        obs.observe(box,{childList:true,subtree:true});
+        const timer=setInterval(()=>{
+            const opts=box.querySelectorAll("div[role='option']");const before=seen.size;
+            for(const o of opts){if(o.id&&!seen.has(o.id))seen.set(o.id,(o.textContent||'').trim())}
+            if(seen.size!==before){
+                last=Date.now();
+                opts[opts.length-1].scrollIntoView(true);box.scrollTop=box.scrollHeight;
+            }
+            if(Date.now()-last>quietMs||Date.now()-started>maxMs){
+                clearInterval(timer);obs.disconnect();done(Array.from(seen.entries()));
+            }
+        },100);
+    """
+
+    # Minified JS for speed: defines x(card) -> {lid,sd,c,a,i,v,t,d,p,pt,ht}.
+    # window.__fbxKnown (set once per page by _publish_known_ids) holds library_ids
+    # with a fresh row in the ad store; those cards only return {known}.
+    _AD_CARD_JS = """
+        const known=window.__fbxKnown||new Set();
+        const x=el=>{
+            const txt=el.innerText;
+            const m=txt.match(/Library ID:\\s*(\\d+)/);
+            if(!m)return null;
+            if(known.has(m[1]))return {known:m[1]};
+            const sd=txt.match(/\\b\\d{1,2}\\s\\w{3}\\s\\d{4}\\b/);
+            let c=null,a=null,i=null,v=null,t=null,d=null,p=null,pt=null,ht=null;
+            const imgs=el.querySelectorAll('img');
+            for(const img of imgs){
+                if(img.alt&&!c){c=img.alt.trim();a=img.src}
+                else if(!i){i=img.src;t=img.src}
+            }
+            const vid=el.querySelector('video');
+            if(vid){v=vid.src;t=vid.poster||t}
+            const as=el.querySelectorAll('a');
+            for(const lnk of as){
+                const u=lnk.href;
+                if(u&&u.includes('l.facebook.com')){
+                    if(u.includes('pixelId')){p=u.split('pixelId')[1].split('&')[0].replace('%3D','');d=u}
+                    else{d=u;break}
+                }
+            }
+            const e1=el.querySelector("._7jyr._a25-");if(e1)pt=e1.innerText;
+            const e2=el.querySelector(".x6s0dn4.x2izyaf.x78zum5.x1qughib.x15mokao.x1ga7v0g.xde0f50.x15x8krk.xexx8yu.xf159sx.xwib8y2.xmzvs34");if(e2)ht=e2.innerText;
+            return {lid:m[1],sd:sd&&sd[0],c,a,i,v,t,d,p,pt,ht};
+        };
+    """
+
+    def __init__(self, keyword, chat_id, message_id=False, scheduled=False):
         self.keyword = keyword
-        self.ad_card_class = "x1plvlek xryxfnj x1gzqxud x178xt8z x1lun4ml xso031l xpilrb4 xb9moi8 xe76qn7 x21b0me x142aazg x1i5p2am x1whfx0g xr2y4jy x1ihp6rs x1kmqopl x13fuv20 x18b5jzi x1q0q8m5 x1t7ytsu x9f619"
+        self.ad_card_class = self.AD_CARD_CLASS
         self.driver = None
-        self.ads_data = []
-        self.lark_api = LarkAPI()
+        self.ads_data = AdBuffer()          # spills to disk past AD_BUFFER_MEMORY_ROWS
+        self._lark_api = None
         self.chat_id = chat_id
         self._stop_event = threading.Event()
         self.queue_manager = CrawlerQueue()
+        self.driver_pool = DriverPool()
+        self.dim_store = AdvertiserDimStore()
+        self.ad_store = AdStore()
+        self._known_ids = set()             # library_ids seen by earlier crawls of this keyword
+        self._fresh_ids = []                # ...whose stored row is recent enough to reuse
+        self._reused_ids = set()            # rows this crawl filled from the ad store
+        self.new_library_ids = set()
+        self.browser_rss = 0
+        self.timings = {}                   # driver_start_s, first_load_s, profile (cold/warm/off)
+        self.worker_id = None               # set by the queue worker running this crawl
+        self.job_id = None                  # durable search job (tools/job_store.py), if any
         self.message_id = message_id
+        self.followers = []                 # card message_ids of coalesced requests
+        self._last_card = None
+        self._followers_lock = threading.Lock()
+        self._card_lock = threading.Lock()
         self.df = pd.DataFrame()
+        self.engine = CRAWLER_ENGINE
+        self.paginate = PAGINATE_SCROLL
+        self._captured = []
+        self._capture = None
+        self._seen_library_ids = set()
+        self._data_lock = threading.Lock()
+        self._stream = queue.Queue()
+        self.tabs = max(1, CRAWLER_TABS)
+        self.page_stats = {PAGE_ADS: 0, PAGE_EMPTY: 0, PAGE_ERROR: 0}
+        # Scheduled runs have nobody waiting on them, so they get a looser budget
+        self.time_budget = CRAWL_TIME_BUDGET_SCHEDULED if scheduled else CRAWL_TIME_BUDGET_INTERACTIVE
+        self.max_ads = CRAWL_MAX_ADS_SCHEDULED if scheduled else CRAWL_MAX_ADS_INTERACTIVE
+        self.coverage = {}
+        self._started_at = None
+        self.scheduled = scheduled
+        self.priority = PRIORITY_SCHEDULED if scheduled else PRIORITY_INTERACTIVE
+        self.isolation = CRAWLER_ISOLATION
+        self.kill_reason = None             # set when an isolated crawl was killed
+        # How the crawl ended: "ok", "empty", "cancelled", a failure ("page_error",
+        # "no_advertisers", "no_driver", "error"), or "duplicate" when start() did not queue it
+        self.outcome = None
+        self.http_fast_path = HTTP_FAST_PATH
+        self.http_client = AdsLibraryHttpClient()
+        self.metrics = CrawlMetrics()
+        self.metrics_record = None
+        self.emit_metrics = True            # the isolated-crawl child leaves this to the parent
+
+    @property
+    def lark_api(self):
+        # Created on first use, so background refreshes and offline benchmarks
+        # never fetch a Lark token
+        if self._lark_api is None:
+            self._lark_api = LarkAPI()
+        return self._lark_api
 
     def __del__(self):
         try:
             if self.driver:
-                self.driver.quit()
+                self.driver_pool.discard(self.driver)
+        except:
+            pass
+        try:
+            self.ads_data.close()
         except:
             pass
 
@@ -148,132 +410,138 @@ class FacebookAdsCrawler:
         self._stop_event.set()
         try:
             if self.driver:
-                self.driver.quit()
-                self.driver = None
+                driver, self.driver = self.driver, None
+                self.driver_pool.discard(driver)
         except Exception:
             pass
     
+    def update_card(self, card, only_if=None):
+        """
+        Show `card` on this crawl's progress card and on every follower's card.
+
+        Card sends are serialized; `only_if()` is checked right before sending
+        and the card is dropped when it returns False.
+        """
+        with self._card_lock:
+            if only_if is not None and not only_if():
+                return
+            with self._followers_lock:
+                self._last_card = card
+                message_ids = [self.message_id] + self.followers
+            for message_id in message_ids:
+                try:
+                    self.lark_api.update_card_message(message_id, card=card)
+                except Exception:
+                    pass
+
+    def attach_follower(self, message_id):
+        """Mirror this crawl's progress onto another request's card."""
+        with self._followers_lock:
+            self.followers.append(message_id)
+            card = self._last_card
+        if card is not None:
+            try:
+                self.lark_api.update_card_message(message_id, card=card)
+            except Exception:
+                pass
+
+    def detach_follower(self, message_id):
+        with self._followers_lock:
+            if message_id in self.followers:
+                self.followers.remove(message_id)
+
     def initialize_driver(self):
+        """Lease an already-stealthed browser from the shared pool."""
         if self.should_stop(): return False
 
-        options = Options()
-        # Optimization flags for mini server
-        options.add_argument("--headless=new")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-infobars")
-        options.add_argument("--mute-audio")
-        
-        # Memory savers
-        options.add_argument("--renderer-process-limit=2")
-        options.add_argument("--window-size=1024,768")
+        self.driver = self.driver_pool.lease(should_stop=self.should_stop)
+        if self.driver is not None:
+            self.timings.update(self.driver_pool.lease_info(self.driver))
+        return self.driver is not None
 
-        service = Service()
-        try:
-            self.driver = webdriver.Chrome(service=service, options=options)
-            stealth(self.driver,
-                    languages=["en-US", "en"],
-                    vendor="Google Inc.",
-                    platform="Win32",
-                    webgl_vendor="Intel Inc.",
-                    renderer="Intel Iris OpenGL Engine",
-                    fix_hairline=True)
-            return True
-        except Exception as e:
-            logger.error(f"Driver initialization failed: {e}")
-            return False
+    def release_driver(self):
+        """Hand the leased browser back to the pool (wiped for the next crawl)."""
+        if self.driver:
+            driver, self.driver = self.driver, None
+            self.browser_rss = driver_rss(driver)
+            try:
+                if self.should_stop():
+                    self.driver_pool.discard(driver)
+                else:
+                    self.driver_pool.release(driver)
+            except Exception:
+                pass
 
-    def start(self):
-        position = self.queue_manager.get_queue_position(self.chat_id)
-        if position is not None and position != 0:
+    def start(self) -> bool:
+        """Queue this crawl; False when an identical request is already waiting."""
+        # Duplicate check and push happen under the queue lock in add_request
+        position = self.queue_manager.add_request(self)
+        if position is not None:
+            self.outcome = "duplicate"
             self.lark_api.reply_to_message(
                 self.message_id,
                 f"⏳ Your request is in waiting list (No #{position})"
             )
-            return
-        self.queue_manager.add_request(self)
+            return False
+        return True
 
-    def fetch_ads_page(self):
-        if self.should_stop(): return False
-        url = (f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&"
-               f"is_targeted_country=false&media_type=all&q={self.keyword}&search_type=keyword_unordered")
+    def _search_url(self, search_word):
+        return (f"{self.ads_library_url}?active_status=active&ad_type=all&country=ALL&"
+                f"is_targeted_country=false&media_type=all&q={search_word}&search_type=keyword_unordered")
+
+    def fetch_ads_page(self) -> str:
+        if self.should_stop(): return PAGE_ERROR
+        started = time.perf_counter()
+        state = self._load_search(self._search_url(self.keyword))
+        # First load of the crawl is where a warm profile's disk cache pays off
+        self.timings.setdefault("first_load_s", round(time.perf_counter() - started, 2))
+        self._record_page(state)
+        return state
+
+    def _record_page(self, state):
+        """Count a finished search page, its transfer size and the browser's RSS."""
+        self.metrics.count("pages")
+        if state == PAGE_EMPTY:
+            self.metrics.count("empty_pages")
+        elif state == PAGE_ERROR:
+            self.metrics.count("error_pages")
         try:
-            self.driver.get(url)
-            css_selector = "." + self.ad_card_class.replace(" ", ".")
-            WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
-            return True
+            self.metrics.count("bytes", int(self.driver.execute_script(self._TRANSFER_BYTES_JS) or 0))
         except Exception:
-            return False
+            pass
+        self.metrics.sample_rss(driver_rss(self.driver))
 
     def get_dim_keyword(self) -> pd.DataFrame:
-        csv_path = f"ref_data//dim_keyword_{self.keyword}.csv"
-        if os.path.exists(csv_path):
-            try:
-                return pd.read_csv(csv_path, dtype=str)
-            except:
-                pass
-
         try:
-            dim_keyword = self.scrape_advertiser_list_from_filters()
-            os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-            dim_keyword.to_csv(csv_path, index=False)
-            return dim_keyword
+            return self.dim_store.get(
+                self.keyword,
+                scrape=self.scrape_advertiser_list_from_filters,
+                refresh=refresh_dim_keyword
+            )
         except Exception as e:
             logger.error(f"Failed to get dim keyword: {e}")
             return pd.DataFrame(columns=["id", "name", "keyword", "name_clean"])
     
-    def scrape_advertiser_list_from_filters(self) -> pd.DataFrame:
+    def scrape_advertiser_list_from_filters(self, max_seconds=20, quiet_ms=1200) -> pd.DataFrame:
         wait = WebDriverWait(self.driver, 5)
         try:
-            # Open filter
+            # Open filter; the advertiser combobox turning clickable is the signal the panel is open
             filter_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//div[@role='button' and contains(., 'Filters')]")))
             filter_button.click()
-            time.sleep(1)
 
             # Open advertisers
             advertiser_dropdown = wait.until(EC.element_to_be_clickable((By.XPATH, "//div[@role='combobox' and .//text()='All advertisers']")))
             advertiser_dropdown.click()
-            time.sleep(1)
 
-            scrollable_container = wait.until(EC.presence_of_element_located((By.XPATH, "//div[@role='listbox']")))
-            option_locator = (By.XPATH, ".//div[@role='option']")
+            wait.until(EC.presence_of_element_located((By.XPATH, "//div[@role='listbox']")))
+            if self.should_stop():
+                return pd.DataFrame(columns=["id", "name"])
 
-            seen = set()
-            rows = []
-            
-            # Limit scrolling for safety
-            max_scrolls = 20
-            scroll_count = 0
-            last_count = -1
-
-            while scroll_count < max_scrolls:
-                if self.should_stop(): break
-                
-                options = scrollable_container.find_elements(*option_locator)
-                current_batch = []
-                for opt in options:
-                    opt_id = opt.get_attribute("id")
-                    if opt_id:
-                        current_batch.append((opt_id, opt))
-
-                for opt_id, opt in current_batch:
-                    if opt_id not in seen:
-                        opt_name = (opt.get_attribute("textContent") or "").strip()
-                        seen.add(opt_id)
-                        rows.append([opt_id, opt_name])
-
-                if len(options) == last_count:
-                    break
-                last_count = len(options)
-
-                try:
-                    self.driver.execute_script("arguments[0].scrollIntoView(true);", options[-1])
-                    time.sleep(0.8)
-                except:
-                    break
-                scroll_count += 1
+            # Scroll and collect inside the browser until the option list stops growing
+            self.driver.set_script_timeout(max_seconds + 5)
+            rows = self.driver.execute_async_script(
+                self._COLLECT_ADVERTISERS_JS, int(max_seconds * 1000), int(quiet_ms)
+            ) or []
 
             df = pd.DataFrame(rows, columns=["id", "name"])
             df["keyword"] = self.keyword
@@ -283,149 +551,605 @@ class FacebookAdsCrawler:
             logger.error(f"Error scraping filters: {e}")
             return pd.DataFrame(columns=["id", "name"])
 
-    def fetch_ads_page_by_id(self, page_name: str) -> bool:
+    def fetch_ads_page_by_id(self, page_name: str) -> str:
         """
         FIXED: Removed the progress update here to prevent progress bar jumping backward.
         """
-        if self.should_stop(): return False
-        search_word = f"{self.keyword} {page_name}"
-        url = (
-            "https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&"
-            f"is_targeted_country=false&media_type=all&q={search_word}&search_type=keyword_unordered"
-        )
+        if self.should_stop(): return PAGE_ERROR
+        url = self._search_url(f"{self.keyword} {page_name}")
+        # REMOVED: self.lark_api.update_card_message(...) 
+        # This was the cause of the glitch
+        return self._load_search(url)
+
+    def _load_search(self, url, timeout=10) -> str:
+        """Navigate to a search URL and return PAGE_ADS, PAGE_EMPTY or PAGE_ERROR."""
         try:
+            if self.engine == "network":
+                self._capture = PayloadCapture(self.driver)
+                self._capture.reset()
+                self.driver.get(url)
+                return self._wait_for_payload(self._capture, timeout)
+
             self.driver.get(url)
-            css_selector = "." + self.ad_card_class.replace(" ", ".")
-            WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
-            
-            # REMOVED: self.lark_api.update_card_message(...) 
-            # This was the cause of the glitch
-            
-            return True
+            return self._wait_for_page_state(timeout)
+        except Exception as e:
+            logger.warning(f"[{self.chat_id}] Search page failed: {e}")
+            return PAGE_ERROR
+
+    def _page_state(self):
+        css_selector = "." + self.ad_card_class.replace(" ", ".")
+        return self.driver.execute_script(self._PAGE_STATE_JS, css_selector, ZERO_RESULTS_PATTERN)
+
+    def _wait_for_page_state(self, timeout) -> str:
+        # Race the first ad card against an explicit no-results state
+        try:
+            state = WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                lambda d: self._page_state() or (PAGE_ERROR if self.should_stop() else None))
+            if state == PAGE_ADS:
+                self._publish_known_ids()
+            return state
         except TimeoutException:
-            return False
+            self.metrics.count("timeouts")
+            return PAGE_ERROR
+
+    def _wait_for_payload(self, capture, timeout) -> str:
+        # Ads arrive either embedded in the first HTML or in follow-up GraphQL
+        # responses; poll both instead of waiting for cards to render
+        records = {r["library_id"]: r for r in parse_ads_html(self.driver.page_source)}
+        deadline = time.time() + timeout
+        state = None
+        while not records and time.time() < deadline:
+            if self.should_stop(): return PAGE_ERROR
+            state = self._page_state()
+            if state in (PAGE_EMPTY, PAGE_ERROR):
+                break
+            time.sleep(0.1)
+            for r in capture.collect():
+                records.setdefault(r["library_id"], r)
+        if records:
+            # Pick up responses that were still in flight when the first ads landed
+            time.sleep(0.5)
+            for r in capture.collect():
+                records.setdefault(r["library_id"], r)
+        self._captured = list(records.values())
+        if self._captured:
+            return PAGE_ADS
+        if state in (PAGE_EMPTY, PAGE_ERROR):
+            return state
+        self.metrics.count("timeouts")
+        return PAGE_ERROR
         
     def scrape_current_page_ads(self):
+        """Extract every ad card on the page in a single WebDriver round trip."""
         if self.should_stop(): return
+        if self.paginate:
+            self.scrape_paginated_feed()
+            return
+        if self.engine == "network":
+            # Rows were already parsed from the page's responses in _load_search
+            self._add_records(self._captured)
+            self._captured = []
+            return
         css_selector = "." + self.ad_card_class.replace(" ", ".")
         try:
-            elements = self.driver.find_elements(By.CSS_SELECTOR, css_selector)
-            for ad in elements:
-                if self.should_stop(): break
-                ad_data = self.process_ad_element(ad)
-                if ad_data:
-                    self.ads_data.append(ad_data)
+            raw_cards = self.driver.execute_script(
+                self._AD_CARD_JS + "return Array.from(document.querySelectorAll(arguments[0])).map(x);",
+                css_selector
+            ) or []
+            self._add_records(self._build_ad_records(raw_cards))
         except Exception as e:
             logger.error(f"Error scraping page ads: {e}")
 
-    def extract_library_id(self, text):
-        match = self._LIBRARY_ID_PATTERN.search(text)
-        return match.group(1) if match else None
-        
-    def extract_date(self, text):
-        match = self._DATE_PATTERN.search(text)
-        return match.group() if match else None
-    
+    def _add_records(self, records) -> int:
+        """Append rows not seen before in this crawl (deduped on library_id)."""
+        added = deduped = 0
+        with self._data_lock:
+            for record in records:
+                if not record: continue
+                record = AdRecord.from_dict(record)
+                library_id = record.library_id
+                if library_id:
+                    if library_id in self._seen_library_ids:
+                        deduped += 1
+                        continue
+                    self._seen_library_ids.add(library_id)
+                record.ad_status = "returning" if library_id in self._known_ids else "new"
+                self.ads_data.append(record)
+                self._stream.put(record)
+                added += 1
+        self.metrics.count("ads_extracted", added + deduped)
+        self.metrics.count("ads_deduped", deduped)
+        return added
+
+    def _close_stream(self):
+        self._stream.put(_STREAM_END)
+
+    def iter_records(self, poll=0.5):
+        """
+        Yield ad rows as the crawl appends them to ads_data.
+        Ends when the crawl finishes, is cancelled, or the job leaves the queue.
+        """
+        while True:
+            try:
+                item = self._stream.get(timeout=poll)
+            except queue.Empty:
+                if self.should_stop() or self.queue_manager.get_job_position(self) is None:
+                    break
+                continue
+            if item is _STREAM_END:
+                return
+            yield item
+
+        # Job ended without closing the stream: hand out whatever is left
+        while True:
+            try:
+                item = self._stream.get_nowait()
+            except queue.Empty:
+                return
+            if item is _STREAM_END:
+                return
+            yield item
+
+    def _clean_row(self, record):
+        # Per-row equivalent of data_to_dataframe's cleaning (exactly one of image/video)
+        has_image = pd.notna(record.get("image_url"))
+        has_video = pd.notna(record.get("video_url"))
+        if has_image == has_video:
+            return None
+        row = {c: record.get(c) for c in self.EXPORT_COLUMNS}
+        row["ad_url"] = record["image_url"] if has_image else record["video_url"]
+        row["ad_type"] = "image" if has_image else "video"
+        pixel_id = record.get("pixel_id")
+        row["pixel_id"] = pixel_id.replace("%3D", "") if isinstance(pixel_id, str) else pixel_id
+        return row
+
+    def iter_clean_rows(self):
+        """Stream of report rows, cleaned and deduped the same way as data_to_dataframe."""
+        seen = set()
+        for record in self.iter_records():
+            row = self._clean_row(record)
+            if row is None:
+                continue
+            key = (row["library_id"], row["company"])
+            if key in seen:
+                continue
+            seen.add(key)
+            yield row
+
+    def _extract_new_cards(self):
+        # Cards are tagged once extracted so each step only returns newly appended ones
+        css_selector = "." + self.ad_card_class.replace(" ", ".")
+        raw_cards = self.driver.execute_script(
+            self._AD_CARD_JS + """
+            const fresh=Array.from(document.querySelectorAll(arguments[0]+':not([data-fbx])'));
+            fresh.forEach(el=>el.setAttribute('data-fbx','1'));
+            return fresh.map(x);
+            """,
+            css_selector
+        ) or []
+        return [r for r in self._build_ad_records(raw_cards) if r]
+
+    def _wait_for_new_cards(self, deadline) -> bool:
+        css_selector = "." + self.ad_card_class.replace(" ", ".")
+        while time.time() < deadline and not self.should_stop():
+            time.sleep(0.3)
+            if self.driver.execute_script(
+                    "return document.querySelectorAll(arguments[0]+':not([data-fbx])').length;", css_selector):
+                return True
+        return False
+
+    def scrape_paginated_feed(self, max_ads=None, time_budget=None, idle_rounds=None) -> int:
+        """
+        Scroll the result feed, extracting only newly appended ads each step.
+
+        Stops after `max_ads` new ads, after `time_budget` seconds, or after
+        `idle_rounds` consecutive scrolls that load nothing new.
+        """
+        max_ads = max_ads or PAGINATE_MAX_ADS
+        deadline = time.time() + (time_budget or PAGINATE_TIME_BUDGET)
+        idle_rounds = idle_rounds or PAGINATE_IDLE_ROUNDS
+
+        added, idle = 0, 0
+        captured, self._captured = self._captured, []
+        try:
+            while not self.should_stop() and added < max_ads and time.time() < deadline:
+                if self.engine == "network":
+                    fresh = captured + self._capture.collect()
+                    captured = []
+                else:
+                    fresh = self._extract_new_cards()
+                step_added = self._add_records(fresh)
+                added += step_added
+
+                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+
+                if self.engine == "network":
+                    # Next page's response is collected at the top of the next step
+                    time.sleep(1)
+                    grew = False
+                else:
+                    # Wait for the feed to grow instead of sleeping a fixed amount
+                    grew = self._wait_for_new_cards(min(deadline, time.time() + 3))
+
+                idle = 0 if (step_added or grew) else idle + 1
+                if idle >= idle_rounds:
+                    break
+        except Exception as e:
+            logger.error(f"Error paginating feed: {e}")
+        return added
+
+    def _build_ad_records(self, raw_cards):
+        # Maps the raw {lid,sd,c,a,...} objects returned by _AD_CARD_JS to ads_data rows.
+        # Library ID and start date are matched in the browser, so the card's full
+        # text never crosses the WebDriver connection. {known} cards are filled from
+        # their stored rows, read in one query per batch
+        known = [c["known"] for c in raw_cards if c and c.get("known")]
+        stored = self.ad_store.records(self.keyword, known) if known else {}
+        records = []
+        for ad_data in raw_cards:
+            if not ad_data:
+                records.append(None)
+            elif ad_data.get("known"):
+                row = stored.get(ad_data["known"])
+                if row:
+                    self._reused_ids.add(ad_data["known"])
+                    records.append(AdRecord.from_dict(row))
+                else:
+                    records.append(None)
+            else:
+                records.append(AdRecord(
+                    library_id=ad_data['lid'],
+                    ad_start_date=ad_data['sd'],
+                    company=ad_data['c'],
+                    avatar_url=ad_data['a'],
+                    image_url=ad_data['i'],
+                    video_url=ad_data['v'],
+                    thumbnail_url=ad_data['t'],
+                    destination_url=ad_data['d'],
+                    pixel_id=ad_data['p'],
+                    primary_text=ad_data['pt'],
+                    headline_text=ad_data['ht'],
+                ))
+        return records
+
+    def _build_ad_record(self, ad_data):
+        return self._build_ad_records([ad_data])[0]
+
+    def _publish_known_ids(self):
+        """Hand the reusable library_ids to the loaded page once, for _AD_CARD_JS."""
+        if self.engine != "dom" or not self._fresh_ids:
+            return
+        try:
+            self.driver.execute_script("window.__fbxKnown=new Set(arguments[0]);", self._fresh_ids)
+        except Exception as e:
+            logger.warning(f"[{self.chat_id}] Could not publish known ids: {e}")
+
     def process_ad_element(self, ad_element):
         # Executes minified JS inside the browser to scrape data from the specific Ad Card
         if self.should_stop(): return None
         try:
-            # Minified JS for speed
-            ad_data = self.driver.execute_script("""
-                const el=arguments[0];const txt=el.innerText;
-                let c=null,a=null,i=null,v=null,t=null,d=null,p=null,pt=null,ht=null;
-                const imgs=el.querySelectorAll('img');
-                for(const img of imgs){
-                    if(img.alt&&!c){c=img.alt.trim();a=img.src}
-                    else if(!i){i=img.src;t=img.src}
-                }
-                const vid=el.querySelector('video');
-                if(vid){v=vid.src;t=vid.poster||t}
-                const as=el.querySelectorAll('a');
-                for(const lnk of as){
-                    const u=lnk.href;
-                    if(u&&u.includes('l.facebook.com')){
-                        if(u.includes('pixelId')){p=u.split('pixelId')[1].split('&')[0].replace('%3D','');d=u}
-                        else{d=u;break}
-                    }
-                }
-                const e1=el.querySelector("._7jyr._a25-");if(e1)pt=e1.innerText;
-                const e2=el.querySelector(".x6s0dn4.x2izyaf.x78zum5.x1qughib.x15mokao.x1ga7v0g.xde0f50.x15x8krk.xexx8yu.xf159sx.xwib8y2.xmzvs34");if(e2)ht=e2.innerText;
-                return {txt,c,a,i,v,t,d,p,pt,ht};
-            """, ad_element)
-
-            if not ad_data or "Library ID" not in ad_data['txt']: return None
-
-            return {
-                "text_snippet": ad_data['txt'][:100].replace("\n", " ") + "...",
-                "library_id": self.extract_library_id(ad_data['txt']),
-                "ad_start_date": self.extract_date(ad_data['txt']),
-                "company": ad_data['c'],
-                "avatar_url": ad_data['a'],
-                "image_url": ad_data['i'],
-                "video_url": ad_data['v'],
-                "thumbnail_url": ad_data['t'],
-                "destination_url": ad_data['d'],
-                "pixel_id": ad_data['p'],
-                "primary_text": ad_data['pt'],
-                "headline_text": ad_data['ht']
-            }
+            ad_data = self.driver.execute_script(self._AD_CARD_JS + "return x(arguments[0]);", ad_element)
+            return self._build_ad_record(ad_data)
         except:
             return None
 
     def crawl(self):
         logger.info(f"[{self.chat_id}] Start crawl: {self.keyword}")
+        self._started_at = time.time()
+        self.metrics = CrawlMetrics()
+        outcome = "error"
         try:
+            # Phase 0: small searches are answered without starting a browser
+            if self.http_fast_path:
+                self.metrics.enter("http")
+                if self._crawl_http():
+                    outcome = "ok"
+                    return
+
             # Phase 1: Initialize (0-10%)
-            if not self.initialize_driver(): return
-            if not self.fetch_ads_page():
-                raise RuntimeError("Failed load initial page")
+            self.metrics.enter("driver_init")
+            if not self.initialize_driver():
+                outcome = "no_driver"
+                return
+            self.metrics.enter("initial_page")
+            state = self.fetch_ads_page()
+            if state == PAGE_EMPTY:
+                logger.info(f"[{self.chat_id}] No ads for {self.keyword}")
+                outcome = "empty"
+                return
+            if state != PAGE_ADS:
+                logger.error(f"[{self.chat_id}] Failed to load initial page for {self.keyword}")
+                outcome = "page_error"
+                return
 
             # Phase 2: Get Dimensions (10%)
+            self.metrics.enter("dim_keyword")
             dim_keyword = self.get_dim_keyword()
             if dim_keyword is None or dim_keyword.empty:
-                raise RuntimeError("Empty advertiser list")
+                logger.error(f"[{self.chat_id}] Empty advertiser list for {self.keyword}")
+                outcome = "no_advertisers"
+                return
 
             dim_keyword["name_clean"] = dim_keyword["name"].str.split(" ").str[0].str.strip()
             list_name = dim_keyword["name_clean"].dropna().astype(str).unique().tolist()
-            total = len(list_name)
 
-            # Phase 3: Loop Advertisers (10% -> 90%)
-            for idx, page_name in enumerate(list_name, start=1):
-                if self.should_stop(): break
-
-                # SMOOTH PROGRESS: Map iteration directly to 10-90% range
-                pct = int(10 + 80 * idx / max(1, total))
-                
-                # Update Lark Card periodically (every 3 items or at the end)
-                if idx % 3 == 0 or idx == total:
-                    try:
-                        self.lark_api.update_card_message(
-                            self.message_id,
-                            card=domain_processing_card(search_word=self.keyword, 
-                                                      progress_percent=pct)
-                        )
-                    except: pass
+            # Ads extracted recently by earlier crawls skip detail extraction
+            self._known_ids, fresh_ids = self.ad_store.known_ids(self.keyword)
+            self._fresh_ids = list(fresh_ids)
 
+            # Phase 3: Loop Advertisers (10% -> 90%)
+            pages = []
+            for page_name in list_name:
                 page = page_name.split(" ")[0]
                 if "All" in page: page = ""
+                pages.append(page)
 
-                if self.fetch_ads_page_by_id(page):
-                    self.scrape_current_page_ads()
-                    
-                    if len(self.ads_data) > 500:
-                        logger.warning(f"[{self.chat_id}] Reached ad limit (500) for safety.")
-                        break
+            # Highest-yield advertisers first, within the crawl's time/ad budget
+            self.metrics.enter("advertiser_loop")
+            plan = CrawlPlan(pages, self.ad_store.advertiser_yields(self.keyword),
+                             time_budget=self.time_budget, max_ads=self.max_ads,
+                             max_retries=CRAWL_PAGE_RETRIES, backoff=CRAWL_RETRY_BACKOFF,
+                             started_at=self._started_at)
+            if self.tabs > 1 and self.engine == "dom":
+                self._crawl_advertisers_pipelined(plan)
+            else:
+                self._crawl_advertisers(plan)
+
+            self.coverage = plan.coverage()
+            self.page_stats = {k: self.coverage[k] for k in (PAGE_ADS, PAGE_EMPTY, PAGE_ERROR, "skipped")}
+            self.metrics.enter("store")
+            if not self.should_stop():
+                self.new_library_ids = self._store_records()
+                self.ad_store.record_yields(self.keyword, plan.yields())
 
+            self.metrics.enter("dataframe")
             self.data_to_dataframe()
+            outcome = "ok"
+            logger.info(f"[{self.chat_id}] {self.keyword}: {self.coverage['pages']} advertiser pages, "
+                        f"{self.coverage[PAGE_ADS]} with ads, {self.coverage[PAGE_EMPTY]} empty, "
+                        f"{self.coverage[PAGE_ERROR]} failed, {self.coverage['skipped']} skipped, "
+                        f"{self.coverage['retries']} retries"
+                        + (f", stopped on {self.coverage['stopped']}" if self.coverage["stopped"] else ""))
 
         except Exception as e:
             logger.exception(f"[{self.chat_id}] Crawl error: {e}")
         finally:
-            if self.driver:
-                try: self.driver.quit()
-                except: pass
-                self.driver = None
+            self.release_driver()
+            self.metrics.sample_rss(self.browser_rss)
+            self.metrics_record = self.metrics.record(**self._metrics_fields(outcome))
+            self.outcome = self.metrics_record["outcome"]
+            if self.emit_metrics:
+                MetricsLog().write(self.metrics_record)
+            self._close_stream()
+
+    def _metrics_fields(self, outcome):
+        return {
+            "keyword": self.keyword, "chat_id": self.chat_id, "scheduled": self.scheduled,
+            "engine": self.coverage.get("engine", self.engine), "isolation": self.isolation,
+            "outcome": "cancelled" if self.should_stop() else outcome,
+            "ads": len(self.ads_data), "coverage": self.coverage, "timings": self.timings,
+        }
+
+    def _crawl_http(self) -> bool:
+        """Answer the search from one plain HTTP fetch; False means use the browser."""
+        result = self.http_client.search(self._search_url(self.keyword))
+        if not result.complete or self.should_stop():
+            logger.info(f"[{self.chat_id}] HTTP fast path falls back to browser: {result.reason}")
+            return False
+        logger.info(f"[{self.chat_id}] HTTP fast path: {len(result.records)} ads for {self.keyword}")
+
+        self._known_ids, _ = self.ad_store.known_ids(self.keyword)
+        self._add_records(result.records)
+        self.coverage = {"pages": 1, PAGE_ADS: int(result.state == PAGE_ADS),
+                         PAGE_EMPTY: int(result.state == PAGE_EMPTY), PAGE_ERROR: 0,
+                         "skipped": 0, "retries": 0, "stopped": None, "engine": "http"}
+        self.new_library_ids = self._store_records()
+        self.data_to_dataframe()
+        return True
+
+    def _store_records(self) -> set:
+        """Upsert the crawl's rows into the ad store a chunk at a time; returns new library_ids."""
+        new_ids = set()
+        for chunk in self.ads_data.iter_chunks():
+            new_ids |= self.ad_store.upsert(self.keyword, chunk, reused=self._reused_ids)
+        return new_ids
+
+    def crawl_isolated(self):
+        """
+        Run crawl() in a child process (tools/crawl_process.py) in its own
+        session. Cards and rows are relayed as they arrive; the child and its
+        Chrome are killed as a group on cancel, on exceeding CRAWL_MAX_RSS_MB or
+        CRAWL_MAX_CPU_SECONDS, or CRAWL_WALL_GRACE seconds past the time budget.
+        """
+        logger.info(f"[{self.chat_id}] Start isolated crawl: {self.keyword}")
+        read_fd, write_fd = os.pipe()
+        cmd = [sys.executable, "-m", "tools.crawl_process", self.keyword, "--fd", str(write_fd)]
+        if self.chat_id:
+            cmd += ["--chat-id", str(self.chat_id)]
+        if self.scheduled:
+            cmd.append("--scheduled")
+        if self.worker_id is not None:
+            cmd += ["--profile-slot", str(self.worker_id)]
+        try:
+            proc = subprocess.Popen(cmd, pass_fds=(write_fd,), start_new_session=True,
+                                    cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        finally:
+            os.close(write_fd)
+
+        done = threading.Event()
+        reader = threading.Thread(target=self._read_child, args=(read_fd, done),
+                                  name=f"crawl-child-{proc.pid}", daemon=True)
+        reader.start()
+
+        wall_limit = (self.time_budget + CRAWL_WALL_GRACE) if self.time_budget else None
+        started = time.time()
+        self.metrics = CrawlMetrics()
+        try:
+            while reader.is_alive() and not done.is_set():
+                reader.join(0.5)
+                rss = process_tree_rss(proc.pid)
+                self.metrics.sample_rss(rss)
+                if self.should_stop():
+                    self.kill_reason = "cancelled"
+                elif CRAWL_MAX_RSS_MB and rss > CRAWL_MAX_RSS_MB * 1024 * 1024:
+                    self.kill_reason = "memory"
+                elif CRAWL_MAX_CPU_SECONDS and process_tree_cpu_seconds(proc.pid) > CRAWL_MAX_CPU_SECONDS:
+                    self.kill_reason = "cpu"
+                elif wall_limit and time.time() - started > wall_limit:
+                    self.kill_reason = "timeout"
+                if self.kill_reason:
+                    logger.warning(f"[{self.chat_id}] Killing crawl child {proc.pid}: {self.kill_reason}")
+                    self._kill_child(proc)
+                    break
+        finally:
+            self._write_isolated_metrics()
+            self._close_stream()
+            # The child may still be finishing a background dim refresh after "done"
+            threading.Thread(target=self._reap_child, args=(proc, wall_limit or 600),
+                             name=f"crawl-reaper-{proc.pid}", daemon=True).start()
+
+    def _write_isolated_metrics(self):
+        # The child's record when it finished; otherwise what the parent saw of it
+        record = self.metrics_record
+        if record is None:
+            outcome = self.kill_reason or "error"
+            record = self.metrics.record(**self._metrics_fields(outcome))
+        else:
+            record["peak_rss_mb"] = max(record.get("peak_rss_mb", 0), round(self.metrics.peak_rss / 1e6, 1))
+        record["kill_reason"] = self.kill_reason
+        self.metrics_record = record
+        self.outcome = record.get("outcome")
+        MetricsLog().write(record)
+
+    def _read_child(self, read_fd, done):
+        from .crawl_process import decode_rows
+        with os.fdopen(read_fd, "r", encoding="utf-8") as pipe:
+            for line in pipe:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                kind = message.get("t")
+                if kind == "rows":
+                    with self._data_lock:
+                        for record in map(AdRecord.from_dict, decode_rows(message)):
+                            self.ads_data.append(record)
+                            self._stream.put(record)
+                elif kind == "card":
+                    self.update_card(message["card"])
+                elif kind == "done":
+                    self.page_stats = message.get("page_stats") or self.page_stats
+                    self.coverage = message.get("coverage") or {}
+                    self.new_library_ids = set(message.get("new_library_ids") or [])
+                    self.browser_rss = message.get("browser_rss", 0)
+                    self.timings = message.get("timings") or {}
+                    self.metrics_record = message.get("metrics")
+                    done.set()
+                    return
+
+    def _kill_child(self, proc, grace=3):
+        pids = process_tree_pids(proc.pid)
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(grace)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            pass
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        # Descendants that left the session (Chrome helpers can) go by pid
+        for pid in pids[1:]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        proc.wait()
+
+    def _reap_child(self, proc, timeout):
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._kill_child(proc)
+
+    def _report_progress(self, idx, total):
+        # SMOOTH PROGRESS: Map iteration directly to 10-90% range
+        pct = int(10 + 80 * idx / max(1, total))
+        
+        # Update Lark Card periodically (every 3 items or at the end)
+        if idx % 3 == 0 or idx == total:
+            self.update_card(domain_processing_card(search_word=self.keyword, 
+                                                    progress_percent=pct))
+
+    def _crawl_advertisers(self, plan):
+        while not self.should_stop():
+            page = plan.next()
+            if page is None: break
+
+            state = self.fetch_ads_page_by_id(page)
+            before = len(self.ads_data)
+            if state == PAGE_ADS:
+                self.scrape_current_page_ads()
+            self._record_page(state)
+            plan.record(page, state, len(self.ads_data) - before)
+            self._report_progress(plan.done, plan.total)
+
+    def _crawl_advertisers_pipelined(self, plan):
+        """
+        Same as _crawl_advertisers, but keeps up to `self.tabs` advertiser queries
+        loading in sibling tabs of one browser, so advertiser N+1 loads while
+        advertiser N is being extracted.
+        """
+        main_handle = self.driver.current_window_handle
+        handles = [main_handle]
+        try:
+            for _ in range(self.tabs - 1):
+                self.driver.switch_to.new_window("tab")
+                # Stealth, blocking and the tracker are per tab; a new tab starts without them
+                apply_stealth(self.driver)
+                apply_block_profile(self.driver)
+                install_request_tracker(self.driver)
+                handles.append(self.driver.current_window_handle)
+
+            free_tabs = deque(handles)
+            in_flight = deque()
+            while not self.should_stop():
+                # Start a navigation in every idle tab; assigning location returns immediately.
+                # __fbxNav marks the old document so stale cards are never mistaken for new ones.
+                # Only block for a backed-off retry when no other tab is loading.
+                while free_tabs:
+                    page = plan.next(block=not in_flight)
+                    if page is None: break
+                    handle = free_tabs.popleft()
+                    self.driver.switch_to.window(handle)
+                    self.driver.execute_script(
+                        "window.__fbxNav=1;window.location.href=arguments[0];",
+                        self._search_url(f"{self.keyword} {page}")
+                    )
+                    in_flight.append((handle, page))
+                if not in_flight: break
+
+                handle, page = in_flight.popleft()
+                self.driver.switch_to.window(handle)
+                try:
+                    state = self._wait_for_page_state(10)
+                except Exception:
+                    state = PAGE_ERROR
+                before = len(self.ads_data)
+                if state == PAGE_ADS:
+                    self.scrape_current_page_ads()
+                self._record_page(state)
+                plan.record(page, state, len(self.ads_data) - before)
+                self._report_progress(plan.done, plan.total)
+                free_tabs.append(handle)
+        finally:
+            try:
+                for handle in handles[1:]:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+                self.driver.switch_to.window(main_handle)
+            except Exception:
+                pass
 
     def data_to_dataframe(self):  
         if self.should_stop():
@@ -433,35 +1157,66 @@ class FacebookAdsCrawler:
             return
             
         # Phase 4: Processing (Set to 95%)
-        try:
-             self.lark_api.update_card_message(
-                self.message_id,
-                card=domain_processing_card(search_word=self.keyword, 
-                                          progress_percent=95)
-            )
-        except: pass
+        self.update_card(domain_processing_card(search_word=self.keyword, 
+                                                progress_percent=95))
 
-        df = pd.DataFrame(self.ads_data)
-        if df.empty:
-            self.df = df
+        if not len(self.ads_data):
+            self.df = pd.DataFrame()
             return
-        
-        try:
-            filter_conditions = (df["image_url"].notnull() & df["video_url"].notnull()) | (~df["image_url"].notnull() & ~df["video_url"].notnull())
-            df_cleaned = df[~filter_conditions].reset_index(drop=True)
-            
-            df_cleaned["ad_url"] = df_cleaned["image_url"].fillna(df_cleaned["video_url"])
-            df_cleaned["ad_type"] = df_cleaned["image_url"].notnull().replace({True: "image", False: "video"})
-            if "pixel_id" in df_cleaned.columns:
-                df_cleaned["pixel_id"] = df_cleaned["pixel_id"].astype(str).str.replace("%3D", "")
 
-            cols = ["library_id", "ad_start_date", "company", "pixel_id", "destination_url", 
-                    "ad_type", "ad_url", "thumbnail_url", "primary_text", "headline_text"]
-            
-            existing_cols = [c for c in cols if c in df_cleaned.columns]
-            df_cleaned = df_cleaned[existing_cols]
+        try:
+            # Clean chunk by chunk so only report columns of kept rows are held at once
+            frames = [self._clean_frame(records_to_frame(chunk)) for chunk in self.ads_data.iter_chunks()]
+            df_cleaned = pd.concat(frames, ignore_index=True)
             df_cleaned.drop_duplicates(subset=["library_id", "company"], inplace=True)
-            self.df = df_cleaned
+            self.df = df_cleaned.reset_index(drop=True)
         except Exception as e:
             logger.error(f"DataFrame conversion error: {e}")
-            self.df = df
+            self.df = records_to_frame(self.ads_data)
+
+    def _clean_frame(self, df):
+        # Exactly one of image/video
+        has_image = df["image_url"].notna()
+        df = df[has_image != df["video_url"].notna()].reset_index(drop=True)
+        has_image = df["image_url"].notna()
+
+        df["ad_url"] = df["image_url"].where(has_image, df["video_url"])
+        df["ad_type"] = np.where(has_image, "image", "video")
+        df["pixel_id"] = df["pixel_id"].str.replace("%3D", "", regex=False)
+        return df[self.EXPORT_COLUMNS]
+
+
+class DimRefreshJob(FacebookAdsCrawler):
+    """Background-class queue job that re-scrapes a keyword's advertiser list."""
+
+    def __init__(self, keyword):
+        super().__init__(keyword, chat_id=None)
+        self.priority = PRIORITY_BACKGROUND
+        # Runs on the worker's thread even under CRAWLER_ISOLATION=process: it is short
+        # and crawl_isolated would run a full keyword crawl instead
+        self.isolation = "thread"
+        self.result = None
+        self.done = threading.Event()
+
+    def crawl(self):
+        try:
+            if self.initialize_driver() and self.fetch_ads_page() == PAGE_ADS:
+                self.result = self.scrape_advertiser_list_from_filters()
+        finally:
+            self.release_driver()
+            self.done.set()
+
+
+def refresh_dim_keyword(keyword) -> pd.DataFrame:
+    """
+    Re-scrape a keyword's advertiser list (AdvertiserDimStore background refresh).
+
+    The scrape is queued at PRIORITY_BACKGROUND instead of leasing a browser
+    directly, so it never takes a driver ahead of a waiting crawl. Blocks the
+    refresh thread until a worker has run it.
+    """
+    job = DimRefreshJob(keyword)
+    if job.queue_manager.add_request(job) is not None:
+        return None
+    job.done.wait()
+    return job.result
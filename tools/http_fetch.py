@@ -0,0 +1,98 @@
+"""
+Browser-free fast path for Ads Library keyword searches.
+
+Fetches the server-rendered search page over a pooled requests session and
+parses the ads embedded in its JSON <script> blocks (parse_ads_html, same
+row schema as the browser engines). Only a complete answer is trusted: ads
+with an explicit "has_next_page": false, or a no-results page. A
+login/checkpoint wall, an HTTP error, a page with more results behind
+pagination, a page without pagination info or a page with neither ads nor
+a no-results marker all come back as PAGE_ERROR / incomplete, and the
+crawler falls back to Selenium.
+"""
+from lark_bot.config import HTTP_TIMEOUT, CRAWLER_WORKERS
+
+import logging
+import re
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .crawl_planner import PAGE_ADS, PAGE_EMPTY, PAGE_ERROR
+from .network_capture import parse_ads_html, ZERO_RESULTS_PATTERN
+
+logger = logging.getLogger(__name__)
+
+_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Sec-Fetch-Mode": "navigate",
+}
+_NEXT_PAGE_RE = re.compile(r'"has_next_page"\s*:\s*(true|false)')
+_EMPTY_RE = re.compile(ZERO_RESULTS_PATTERN + r'|No ads match')
+_BLOCKED_PATH_RE = re.compile(r"/(login|checkpoint)\b")
+
+
+class HttpSearchResult:
+    __slots__ = ("state", "records", "complete", "reason")
+
+    def __init__(self, state, records=None, complete=False, reason=None):
+        self.state = state
+        self.records = records or []
+        self.complete = complete
+        self.reason = reason
+
+
+def parse_search_html(html):
+    """Classify a server-rendered search page and extract its ads."""
+    records = parse_ads_html(html)
+    if not records:
+        if _EMPTY_RE.search(html or ""):
+            return HttpSearchResult(PAGE_EMPTY, complete=True)
+        return HttpSearchResult(PAGE_ERROR, reason="no ads in page")
+
+    # The page size is the server's choice, so only an explicit end of results counts
+    flags = _NEXT_PAGE_RE.findall(html)
+    if not flags:
+        return HttpSearchResult(PAGE_ADS, records, False, "no pagination info")
+    complete = "true" not in flags
+    return HttpSearchResult(PAGE_ADS, records, complete, None if complete else "more pages")
+
+
+class AdsLibraryHttpClient:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.session = cls._instance._build_session()
+        return cls._instance
+
+    def _build_session(self):
+        session = requests.Session()
+        session.headers.update(_HEADERS)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(2, CRAWLER_WORKERS * 2), max_retries=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def search(self, url, timeout=None) -> HttpSearchResult:
+        try:
+            response = self.session.get(url, timeout=timeout or HTTP_TIMEOUT)
+        except requests.RequestException as e:
+            return HttpSearchResult(PAGE_ERROR, reason=f"request failed: {e}")
+        if response.status_code != 200:
+            return HttpSearchResult(PAGE_ERROR, reason=f"HTTP {response.status_code}")
+        if _BLOCKED_PATH_RE.search(urlparse(response.url).path):
+            return HttpSearchResult(PAGE_ERROR, reason="login wall")
+        try:
+            return parse_search_html(response.text)
+        except Exception as e:
+            logger.warning(f"Could not parse search page {url}: {e}")
+            return HttpSearchResult(PAGE_ERROR, reason="parse failed")
@@ -80,7 +80,17 @@ def domain_processing_card(search_word, progress_percent=0):
     }
 
 
-def search_complete_card(search_word, num_results, href):
+def _page_stats_text(page_stats):
+    """One-line crawl summary separating empty advertiser pages from failed loads."""
+    if not page_stats or not any(page_stats.values()):
+        return ""
+    skipped = page_stats.get('skipped', 0)
+    return (f"\nAdvertiser pages: {page_stats.get('ads', 0)} with ads · "
+            f"{page_stats.get('empty', 0)} empty · {page_stats.get('error', 0)} failed"
+            + (f" · {skipped} not reached (crawl budget)" if skipped else ""))
+
+
+def search_complete_card(search_word, num_results, href, num_new=None, cached_at=None, page_stats=None):
     """
     Creates a completion card showing successful search results.
     
@@ -88,10 +98,16 @@ def search_complete_card(search_word, num_results, href):
         search_word (str): The domain that was searched
         timestamp (str): Completion timestamp
         num_results (int): Number of results found
+        num_new (int): How many of the results were never seen before
+        cached_at (str): "HH:MM" of the crawl when served from the result cache
+        page_stats (dict): Advertiser page outcomes {"ads", "empty", "error", "skipped"}
     
     Returns:
         dict: Card configuration
     """
+    new_text = f" ({num_new} new)" if num_new is not None else ""
+    cached_text = f"\n_Cached at {cached_at}. Use /search! {search_word} for a fresh crawl._" if cached_at else ""
+
     return {
         "elements": [
             {
@@ -140,7 +156,7 @@ def search_complete_card(search_word, num_results, href):
             {
                 "tag": "div",
                 "text": {
-                    "content": f"**Search completed:** {num_results} results found [🔗 View details]({href})",
+                    "content": f"**Search completed:** {num_results} results found{new_text} [🔗 View details]({href}){_page_stats_text(page_stats)}{cached_text}",
                     "tag": "lark_md"
                 }
             }
@@ -155,7 +171,7 @@ def search_complete_card(search_word, num_results, href):
     }
 
 
-def search_no_result_card(search_word, href):
+def search_no_result_card(search_word, href, page_stats=None):
     """
     Creates a card for when no search results are found.
     
@@ -163,6 +179,7 @@ def search_no_result_card(search_word, href):
         search_word (str): The domain that was searched
         timestamp (str): Search completion timestamp
         href (str): URL link for manual checking
+        page_stats (dict): Advertiser page outcomes {"ads", "empty", "error", "skipped"}
     
     Returns:
         dict: Card configuration
@@ -215,7 +232,7 @@ def search_no_result_card(search_word, href):
             {
                 "tag": "div",
                 "text": {
-                    "content": f"**No result found:** [🔗 Click here to check]({href})",
+                    "content": f"**No result found:** [🔗 Click here to check]({href}){_page_stats_text(page_stats)}",
                     "tag": "lark_md"
                 }
             }
@@ -230,7 +247,7 @@ def search_no_result_card(search_word, href):
     }
 
 
-def queue_card(search_word, position):
+def queue_card(search_word, position, eta_seconds=None):
     """
     Creates a queue waiting card.
     
@@ -238,10 +255,15 @@ def queue_card(search_word, position):
         search_word (str): The domain waiting to be processed
         timestamp (str): Queue entry timestamp
         position (int): Position in queue
+        eta_seconds (float): Estimated seconds until the crawl starts
     
     Returns:
         dict: Card configuration
     """
+    eta_text = ""
+    if eta_seconds is not None:
+        eta_text = f" Estimated start in ~{max(1, round(eta_seconds / 60))} min."
+
     return {
         "elements": [
             {
@@ -290,7 +312,7 @@ def queue_card(search_word, position):
             {
                 "tag": "div",
                 "text": {
-                    "content": f"📍 Current position in queue: **#{position}**. I'll ping you when it starts.",
+                    "content": f"📍 Current position in queue: **#{position}**.{eta_text} I'll ping you when it starts.",
                     "tag": "lark_md"
                 }
             },
@@ -0,0 +1,169 @@
+"""
+Durable search jobs (SQLite, WAL) so queued and running searches survive restarts.
+
+Every /search request is recorded as a job (queued -> running -> done/failed)
+owned by the process that accepted it. The owner renews a lease on all of its
+open jobs; once a lease expires, or the owning process on this host is gone,
+another process claims the job and replays the search on the same card. A
+replayed job starts its crawl from scratch; jobs that were already started
+JOB_MAX_ATTEMPTS times are failed instead of replayed again.
+"""
+from lark_bot.config import JOB_STORE_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETENTION_HOURS
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .proc_utils import process_alive
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    message_id TEXT,
+    card_id TEXT,
+    keyword TEXT NOT NULL,
+    force INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, lease_until);
+"""
+
+
+class JobStore:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._db_lock = threading.Lock()
+                # host:pid:token, so a restarted process that reuses a pid is still a new owner
+                cls._instance.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                cls._instance.conn = cls._instance._connect(JOB_STORE_PATH)
+        return cls._instance
+
+    def _connect(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        return conn
+
+    def enqueue(self, user_id, chat_id, message_id, card_id, keyword, force=False) -> int:
+        now = time.time()
+        with self._db_lock:
+            cur = self.conn.execute(
+                """
+                INSERT INTO jobs (user_id, chat_id, message_id, card_id, keyword, force,
+                                  owner, lease_until, created, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (str(user_id), str(chat_id), message_id, card_id, keyword, int(bool(force)),
+                 self.owner, now + JOB_LEASE_SECONDS, now, now)
+            )
+            self.conn.commit()
+        return cur.lastrowid
+
+    def mark_running(self, job_id):
+        now = time.time()
+        with self._db_lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_until = ?, updated = ? "
+                "WHERE id = ? AND owner = ?",
+                (JOB_RUNNING, now + JOB_LEASE_SECONDS, now, job_id, self.owner)
+            )
+            self.conn.commit()
+
+    def finish(self, job_id, ok=True, error=None):
+        with self._db_lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, lease_until = 0, updated = ? WHERE id = ? AND owner = ?",
+                (JOB_DONE if ok else JOB_FAILED, error, time.time(), job_id, self.owner)
+            )
+            self.conn.commit()
+
+    def renew(self):
+        """Extend the lease on every open job this process owns (one statement)."""
+        now = time.time()
+        with self._db_lock:
+            self.conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND state IN (?, ?)",
+                (now + JOB_LEASE_SECONDS, self.owner, JOB_QUEUED, JOB_RUNNING)
+            )
+            self.conn.commit()
+
+    def _orphaned(self, owner, lease_until, now):
+        if owner == self.owner:
+            return False
+        if lease_until < now:
+            return True
+        try:
+            host, pid, _ = owner.rsplit(":", 2)
+            pid = int(pid)
+        except (AttributeError, ValueError):
+            return True
+        # Same host: no need to wait out the lease once the owner is gone
+        return host == socket.gethostname() and (pid == os.getpid() or not process_alive(pid))
+
+    def claim_orphans(self) -> list:
+        """
+        Take over open jobs whose owner is gone. Returns the claimed jobs as
+        dicts: state "queued" ones are to be replayed, "failed" ones ran out
+        of attempts.
+        """
+        now = time.time()
+        claimed = []
+        with self._db_lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE state IN (?, ?) ORDER BY id", (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+            for row in rows:
+                if not self._orphaned(row["owner"], row["lease_until"], now):
+                    continue
+                job = dict(row)
+                if job["state"] == JOB_RUNNING and job["attempts"] >= JOB_MAX_ATTEMPTS:
+                    job["state"], job["error"] = JOB_FAILED, f"gave up after {job['attempts']} attempts"
+                else:
+                    job["state"] = JOB_QUEUED
+                # Compare-and-set on the old owner/lease so two processes cannot both claim it
+                cur = self.conn.execute(
+                    "UPDATE jobs SET state = ?, error = ?, owner = ?, lease_until = ?, updated = ? "
+                    "WHERE id = ? AND owner IS ? AND lease_until = ?",
+                    (job["state"], job["error"], self.owner, now + JOB_LEASE_SECONDS, now,
+                     job["id"], row["owner"], row["lease_until"])
+                )
+                if cur.rowcount:
+                    claimed.append(job)
+            self.conn.commit()
+        if claimed:
+            logger.info(f"Claimed {len(claimed)} orphaned search job(s)")
+        return claimed
+
+    def prune(self):
+        """Forget finished jobs older than JOB_RETENTION_HOURS."""
+        with self._db_lock:
+            self.conn.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND updated < ?",
+                (JOB_DONE, JOB_FAILED, time.time() - JOB_RETENTION_HOURS * 3600)
+            )
+            self.conn.commit()
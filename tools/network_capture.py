@@ -0,0 +1,215 @@
+"""
+Network-based extraction engine for the Ads Library.
+
+Instead of scraping rendered ad cards, read the JSON/GraphQL payloads the page
+itself loads (via Chrome's performance log + CDP) and the JSON embedded in the
+server-rendered HTML, then map each ad to the same row schema the DOM engine
+produces. The parse functions take plain strings, so recorded responses can be
+fed straight in.
+"""
+import json
+import logging
+import re
+from datetime import datetime, timezone
+
+from .ad_record import AdRecord
+
+logger = logging.getLogger(__name__)
+
+_PAYLOAD_URL_MARKERS = ("/api/graphql", "/ads/library/async/")
+_JSON_SCRIPT_RE = re.compile(r'<script[^>]*type="application/json"[^>]*>(.*?)</script>', re.S)
+_PIXEL_RE = re.compile(r'pixelId(?:%3D|=)(\d+)')
+# A search results connection with no hits (count 0 or no edges). Plain enough
+# to be compiled by both Python and the browser's RegExp
+ZERO_RESULTS_PATTERN = r'"search_results_connection"\s*:\s*\{(?:[^{}]*"count"\s*:\s*0\b|[^{}]*"edges"\s*:\s*\[\s*\])'
+
+
+def enable_performance_logging(options):
+    """Ask chromedriver to buffer DevTools network events for get_log('performance')."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def _iter_json_documents(text):
+    # Facebook prefixes XHR bodies with "for (;;);" and may stream several
+    # JSON documents in one response separated by newlines
+    text = (text or "").strip()
+    if text.startswith("for (;;);"):
+        text = text[len("for (;;);"):]
+    try:
+        yield json.loads(text)
+        return
+    except ValueError:
+        pass
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def _iter_ad_nodes(obj):
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "ad_archive_id" in node and isinstance(node.get("snapshot"), dict):
+                yield node
+                continue
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def _format_start_date(value):
+    # DOM engine yields "12 Mar 2024"; keep the same shape for ad_start_date
+    try:
+        dt = datetime.fromtimestamp(int(value), tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    return f"{dt.day} {dt:%b %Y}"
+
+
+def _first(*values):
+    for value in values:
+        if value:
+            return value
+    return None
+
+
+def ad_node_to_record(node):
+    """Map one Ads Library ad object (has ad_archive_id + snapshot) to an ads_data row."""
+    snap = node.get("snapshot") or {}
+    cards = snap.get("cards") or []
+    card = cards[0] if cards else {}
+    images = snap.get("images") or []
+    videos = snap.get("videos") or []
+    image = images[0] if images else {}
+    video = videos[0] if videos else {}
+
+    library_id = str(node.get("ad_archive_id"))
+    start_date = _format_start_date(node.get("start_date"))
+    company = _first(snap.get("page_name"), node.get("page_name"))
+
+    video_url = _first(video.get("video_hd_url"), video.get("video_sd_url"),
+                       card.get("video_hd_url"), card.get("video_sd_url"))
+    image_url = None if video_url else _first(
+        image.get("original_image_url"), image.get("resized_image_url"),
+        card.get("original_image_url"), card.get("resized_image_url"))
+    thumbnail_url = _first(video.get("video_preview_image_url"),
+                           card.get("video_preview_image_url"), image_url)
+
+    body = (snap.get("body") or {}).get("text") if isinstance(snap.get("body"), dict) else snap.get("body")
+    # Dynamic creative ads carry "{{product.x}}" placeholders at the top level
+    if not body or "{{" in body:
+        body = _first(card.get("body"), body)
+    headline = _first(snap.get("title"), card.get("title"))
+    destination = _first(snap.get("link_url"), card.get("link_url"))
+
+    pixel_id = None
+    if destination:
+        match = _PIXEL_RE.search(destination)
+        pixel_id = match.group(1) if match else None
+
+    return AdRecord(
+        library_id=library_id,
+        ad_start_date=start_date,
+        company=company,
+        avatar_url=snap.get("page_profile_picture_url"),
+        image_url=image_url,
+        video_url=video_url,
+        thumbnail_url=thumbnail_url,
+        destination_url=destination,
+        pixel_id=pixel_id,
+        primary_text=body,
+        headline_text=headline,
+    )
+
+
+def parse_ads_payload(text):
+    """Parse a GraphQL/async response body into ads_data rows (deduped by library_id)."""
+    records, seen = [], set()
+    for doc in _iter_json_documents(text):
+        for node in _iter_ad_nodes(doc):
+            record = ad_node_to_record(node)
+            if record["library_id"] not in seen:
+                seen.add(record["library_id"])
+                records.append(record)
+    return records
+
+
+def parse_ads_html(html):
+    """Parse ads embedded in the server-rendered page's JSON <script> blocks."""
+    records, seen = [], set()
+    for blob in _JSON_SCRIPT_RE.findall(html or ""):
+        if "ad_archive_id" not in blob:
+            continue
+        for record in parse_ads_payload(blob):
+            if record["library_id"] not in seen:
+                seen.add(record["library_id"])
+                records.append(record)
+    return records
+
+
+class PayloadCapture:
+    """
+    Tracks Ads Library payload responses seen in a driver's performance log.
+    Reading the log clears chromedriver's buffer, so requests whose body has
+    not finished loading yet are remembered until a later collect().
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._pending = {}
+        self._finished = set()
+
+    def reset(self):
+        """Discard everything buffered so far (call right before navigating)."""
+        self._read_events()
+        self._pending.clear()
+        self._finished.clear()
+
+    def _read_events(self):
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            logger.debug(f"Performance log unavailable: {e}")
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError, TypeError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if any(marker in url for marker in _PAYLOAD_URL_MARKERS):
+                    self._pending[params.get("requestId")] = url
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                self._finished.add(params.get("requestId"))
+
+    def drain_bodies(self):
+        """Return bodies of payload responses that finished since the last call."""
+        self._read_events()
+        bodies = []
+        for request_id in [r for r in self._pending if r in self._finished]:
+            self._pending.pop(request_id, None)
+            self._finished.discard(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except Exception:
+                continue
+            if body.get("base64Encoded"):
+                continue
+            bodies.append(body.get("body", ""))
+        return bodies
+
+    def collect(self):
+        """Parse every newly finished payload into ads_data rows."""
+        records = []
+        for body in self.drain_bodies():
+            records.extend(parse_ads_payload(body))
+        return records
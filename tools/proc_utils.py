@@ -0,0 +1,98 @@
+"""
+Small /proc helpers for measuring browser process trees (Linux only).
+Return zero / empty results on platforms without /proc.
+"""
+import os
+
+
+def _ppid_map():
+    parents = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return parents
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            # The command name may contain spaces, so parse after the closing paren
+            fields = stat[stat.rindex(")") + 2:].split()
+            parents[int(entry)] = int(fields[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return parents
+
+
+def process_tree_pids(root_pid):
+    """Return root_pid plus all of its live descendants."""
+    if not root_pid:
+        return []
+    children = {}
+    for pid, ppid in _ppid_map().items():
+        children.setdefault(ppid, []).append(pid)
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def process_rss(pid):
+    """Resident set size of a single process in bytes."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def process_tree_rss(root_pid):
+    """Summed resident set size of a process and its descendants in bytes."""
+    return sum(process_rss(pid) for pid in process_tree_pids(root_pid))
+
+
+def driver_rss(driver):
+    """RSS of a Selenium Chrome session (chromedriver + every Chrome child)."""
+    try:
+        return process_tree_rss(driver.service.process.pid)
+    except Exception:
+        return 0
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU time of a single process in seconds."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        fields = stat[stat.rindex(")") + 2:].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def process_tree_cpu_seconds(root_pid):
+    """Summed CPU time of a process and its live descendants in seconds."""
+    return sum(process_cpu_seconds(pid) for pid in process_tree_pids(root_pid))
+
+
+def process_alive(pid):
+    """True while `pid` runs (zombies waiting to be reaped count as gone)."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        return stat[stat.rindex(")") + 2:].split()[0] != "Z"
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True